@@ -1,15 +1,25 @@
 from datetime import datetime
-import cv2
+import atexit
+import functools
 import glob
 import os
+import threading
+import time
 import numpy as np
-from time import sleep
 import src.mon as mon
+from src import frame_cache
+from src.composite import Canvas, add_text_to_image, fit_tile, label_thickness, layout_columns
+from src.decode import Decoded, FrameDecoder, latency_report
+from src.first_frame import read_first_frame
+from src.schedule import Ticker, tick_report
+from src.tiles import StampLog, TileCache, file_stamp, newest_mtime
+from src.video_index import name_start_epoch, parse_video_name, scan_latest, shared_index
 from zoneinfo import ZoneInfo
-from bb_binary.parsing import parse_video_fname
-
-config = mon.get_config()
 
+# Modules only the long-running loop needs (src.archive, src.control,
+# src.frame_writer, src.worker) are imported where they are first used, and the
+# config is loaded in main(): the one-shot BB_MONITOR_ONCE send starts without
+# them (see send_once).
 
 
 def find_most_recent_files(base_directory, sub_directories, file_type):
@@ -37,161 +47,419 @@ def find_most_recent_files(base_directory, sub_directories, file_type):
 
     return most_recent_files
 
-def extract_first_frame(video_path):
-    """Extracts the first frame from the given video file."""
-    cap = cv2.VideoCapture(video_path)
-    success, image = cap.read()
-    cap.release()
-    return image if success else None
-
-def join_images(images):
-    """Joins a list of images vertically."""
-    # Remove any None items from the list
-    images = [img for img in images if img is not None]
-    # Check if there are any images to join
-    if not images:
+
+# One supervised scan/decode child process per config, when isolate_scan_decode is on.
+_workers = {}
+_workers_lock = threading.Lock()
+_one_shot = False   # set by send_once
+
+
+def _worker(config):
+    """The config's ScanDecodeWorker, or None when scans and decodes run in-process.
+    The one-shot send never uses one: its process is itself the system check's
+    isolated child with a timeout."""
+    if _one_shot or not getattr(config, "isolate_scan_decode", False):
+        return None
+    from src.worker import ScanDecodeWorker
+    with _workers_lock:
+        if id(config) not in _workers:
+            worker = ScanDecodeWorker(
+                config.monitor_bot_name,
+                timeout_seconds=getattr(config, "worker_timeout_seconds", 120),
+            )
+            atexit.register(worker.close)  # unlink its shared memory
+            _workers[id(config)] = worker
+        return _workers[id(config)]
+
+
+def latest_videos(config):
+    """Newest video per camera (None where there is none), like find_most_recent_files
+    but answered from a long-lived index unless `video_index = "rescan"`."""
+    mode = getattr(config, "video_index", "auto")
+    order = getattr(config, "video_order", "mtime")
+    full_rescan_seconds = getattr(config, "video_index_full_rescan_seconds", 900)
+    worker = _worker(config)
+    if worker is not None:
+        from src.worker import WorkerUnavailable
+        try:
+            return worker.scan(config.input_basedir, config.input_subdir_names, config.file_type,
+                               mode, order, full_rescan_seconds)
+        except WorkerUnavailable as e:
+            print(f"[{config.monitor_bot_name}] scan failed: {e}", flush=True)
+            return [None] * len(config.input_subdir_names)
+    # One index per base directory for the life of the process, shared with every
+    # other config reading from it, so each tick only looks at what changed.
+    index = shared_index(config.input_basedir, config.file_type, mode=mode, order=order,
+                         full_rescan_seconds=full_rescan_seconds,
+                         refresh_seconds=getattr(config, "video_index_refresh_seconds", 5))
+    if index is not None:
+        return index.latest(config.input_subdir_names)
+    if order == "filename":
+        return scan_latest(config.input_basedir, config.input_subdir_names, config.file_type, order)
+    return (find_most_recent_files(config.input_basedir, config.input_subdir_names, config.file_type)
+            or [None] * len(config.input_subdir_names))
+
+# Per-camera decode deadline when decode_deadline_seconds is unset, or is a dict
+# that does not name the camera.
+DEFAULT_DECODE_DEADLINE_SECONDS = 20
+
+def _decode_settings(config):
+    """(workers, default deadline) for FrameDecoder from the config."""
+    deadline = getattr(config, "decode_deadline_seconds", DEFAULT_DECODE_DEADLINE_SECONDS)
+    if isinstance(deadline, dict):
+        deadline = DEFAULT_DECODE_DEADLINE_SECONDS
+    return getattr(config, "decode_workers", 0), deadline
+
+def _extract_options(config):
+    """Keyword arguments for read_first_frame: which backend reads the first frame,
+    and whether it is reduced to one channel."""
+    return {
+        "backend": getattr(config, "first_frame_backend", "opencv"),
+        "lowres": getattr(config, "first_frame_lowres", 0),
+        "grayscale": getattr(config, "grayscale", "auto"),
+    }
+
+# One FrameDecoder per config: its thread pool, if any, lives as long as the process.
+_decoders = {}
+
+def _decoder(config):
+    decoder = _decoders.get(id(config))
+    if decoder is None:
+        workers, deadline = _decode_settings(config)
+        options = _extract_options(config)
+        extract = functools.partial(read_first_frame, **options)
+        cache = frame_cache.shared(config)
+        if cache is not None:  # shared with every config of the process
+            extract = cache.wrap(extract, variant=tuple(sorted(options.items())))
+        decoder = _decoders.setdefault(id(config), FrameDecoder(
+            extract, workers=workers, deadline_seconds=deadline,
+        ))
+    return decoder
+
+def decode_first_frames(config, videos, decoded):
+    """Decode the first frame of every video in `videos` not yet in `decoded`.
+    `videos` has one entry per camera of input_subdir_names, in that order, with
+    None for a camera not to decode.
+
+    `decoded` maps path -> Decoded and lives for one tick, so saving the frames and
+    building the composite open each video only once. Prints each camera's decode
+    latency.
+    """
+    todo = [v for v in videos if v and v not in decoded]
+    if not todo:
+        return decoded
+    names = {v: s for v, s in zip(videos, config.input_subdir_names) if v}
+    deadline = getattr(config, "decode_deadline_seconds", DEFAULT_DECODE_DEADLINE_SECONDS)
+    deadlines = ({v: deadline.get(names[v]) for v in todo if names.get(v) in deadline}
+                 if isinstance(deadline, dict) else {})
+    worker = _worker(config)
+    if worker is None:
+        results = _decoder(config).decode(todo, deadlines)
+    else:
+        from src.worker import WorkerUnavailable
+        workers, default_deadline = _decode_settings(config)
+        try:
+            results = worker.decode({v: names[v] for v in todo}, workers, default_deadline,
+                                    deadlines, options=_extract_options(config))
+        except WorkerUnavailable as e:
+            print(f"[{config.monitor_bot_name}] decode failed: {e}", flush=True)
+            results = {v: Decoded(None, None, timed_out=True) for v in todo}
+    decoded.update(results)
+    cache = frame_cache.shared(config) if worker is None else None
+    print(f"[{config.monitor_bot_name}] decode: {latency_report(results, names)}"
+          + (f" ({cache.report()})" if cache is not None else ""), flush=True)
+    return decoded
+
+def first_frame_once(decoded, video_path):
+    """The frame decode_first_frames left in `decoded` for `video_path`, or None."""
+    result = decoded.get(video_path)
+    return result.frame if result is not None else None
+
+def video_label(videoname):
+    """Text stamped on a camera's tile: camera, start time and date from the file
+    name (Basler names are UTC and shown in Berlin time), else the bare file name."""
+    parsed = parse_video_name(videoname)
+    if parsed is None:
+        return os.path.splitext(os.path.basename(videoname))[0]
+    if parsed.utc:
+        start = parsed.start.replace(tzinfo=ZoneInfo("UTC")).astimezone(ZoneInfo("Europe/Berlin"))
+        return f"{parsed.camera}  {start:%H:%M}  {start:%d.%m}"
+    return f"{parsed.camera} {parsed.start:%H:%M}  {parsed.start:%d.%m}"
+
+
+def _columns(config):
+    return layout_columns(getattr(config, "layout", "vertical"), len(config.input_subdir_names),
+                          getattr(config, "grid_columns", 2))
+
+def tile_width(config):
+    """Width of one camera's tile: the composite is image_width wide whatever the layout."""
+    return config.image_width // _columns(config)
+
+
+def make_tile(config, image, videoname):
+    """Shrink and rotate one camera's frame to its tile, then stamp it with its camera
+    and start time at output resolution."""
+    tile, scale = fit_tile(image, tile_width(config), config.rotate)
+    return add_text_to_image(tile, video_label(videoname), font_thickness=label_thickness(scale))
+
+
+def placeholder_tile(config, text, like=None):
+    """A grey tile saying `text`, the size of `like` (the camera's previous tile)
+    when there is one, so a camera that is late does not reshape the composite."""
+    width = tile_width(config)
+    height = like.shape[0] if like is not None else width * 3 // 4
+    # Single-channel: the canvas widens it if the other tiles are in colour.
+    tile = np.full((height, width), 64, np.uint8)
+    return add_text_to_image(tile, text, font_thickness=2)
+
+
+# One TileCache per config, so a camera whose video has not changed since the last
+# tick is neither decoded nor re-stamped.
+_tile_caches = {}
+
+def _tile_cache(config):
+    return _tile_caches.setdefault(id(config), TileCache())
+
+# Per config, the video of each camera last saved (save_images, archive_dir) and last
+# sent in a composite, so a camera with no new video is not decoded, written or sent again.
+_saved_stamps = {}
+_sent_stamps = {}
+
+def _stamp_log(logs, config):
+    return logs.setdefault(id(config), StampLog())
+
+# One FrameWriter per config for save_images.
+_frame_writers = {}
+
+def _frame_writer(config):
+    writer = _frame_writers.get(id(config))
+    if writer is None:
+        from src.frame_writer import FrameWriter
+        writer = _frame_writers[id(config)] = FrameWriter(
+            getattr(config, "save_image_format", "png"),
+            getattr(config, "save_image_quality", None),
+            workers=getattr(config, "save_workers", 2),
+            queue_size=getattr(config, "save_queue_size", 8),
+            label=config.monitor_bot_name,
+        )
+        atexit.register(writer.flush, 60)  # finish the frames already taken
+    return writer
+
+# One thumbnail Archive per config with an archive_dir.
+_archives = {}
+
+def _archive(config):
+    directory = getattr(config, "archive_dir", None)
+    if not directory:
         return None
-    # Vertical stacking
-    return np.vstack(images)
-
-def rotate_image(image, angle):
-    if angle % 360 ==  90:
-        return cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE)
-    if angle % 360 == 270:
-        return cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE)
-    if abs(angle) % 360 == 180:
-        return cv2.rotate(image, cv2.ROTATE_180)
-    return image  # 0° or unrecognized multiple
-
-def resize_image(image, width):
-    """Resizes an image to a given width while maintaining aspect ratio."""
-    (height, original_width) = image.shape[:2]
-    # Calculate the ratio of the new width to the old width and apply it to the height
-    ratio = width / float(original_width)
-    new_height = int(height * ratio)
-    
-    # Resize the image
-    resized_image = cv2.resize(image, (width, new_height), interpolation=cv2.INTER_AREA)
-    return resized_image
-
-def add_text_to_image(image, text, position=(0.02,0.1), font_scale_relative=0.0015, font_thickness=6):
-    """Adds text to an image."""
-    # Calculate font scale based on image width
-    (height, width) = image.shape[:2]
-    font_scale = font_scale_relative * width
-    position_scaled = [int(position[0]*width), int(position[1]*height)]
-
-    cv2.putText(image, text, position_scaled, cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 255, 255), font_thickness, cv2.LINE_AA)
-    return image
+    if id(config) not in _archives:
+        from src.archive import Archive
+        _archives[id(config)] = Archive(directory, width=getattr(config, "archive_width", 320))
+    return _archives[id(config)]
+
+# One Canvas per config: the composite is written into the same array every tick.
+_canvases = {}
+
+def _canvas(config):
+    columns = _columns(config)
+    canvas = _canvases.get(id(config))
+    if canvas is None or canvas.columns != columns:
+        canvas = _canvases[id(config)] = Canvas(columns)
+    return canvas
 
 
 ######
-def send_composite_now(config) -> bool:
+def send_composite_now(config, videos=None, decoded=None, only_if_changed=False) -> bool:
     """Fetch the latest videos, build the stamped composite image, and send it.
 
-    Returns True if a composite image was sent, False if it sent the no-frames
-    "Error" fallback message (or no image could be built). Reused by both the
-    scheduled loop in wait_and_get_images and the one-shot BB_MONITOR_ONCE path.
+    Returns True if a composite image was built and handed to the notifier, False
+    if it sent the no-frames "Error" fallback message instead. Either goes out on
+    the notifier's thread (see src/notifier.py). Reused by both the scheduled loop
+    in wait_and_get_images and the one-shot BB_MONITOR_ONCE path.
+
+    The loop passes the tick's `videos` and already `decoded` frames so nothing is
+    looked up or decoded twice. Cameras whose video is unchanged reuse their tile.
+    With `only_if_changed`, a composite of the very videos sent last time is not
+    built again: depending on `unchanged_composite` a short "no new video" message
+    goes out instead, or nothing (False either way).
     """
-    latest_videos = find_most_recent_files(config.input_basedir, config.input_subdir_names, config.file_type)
-    images = [extract_first_frame(vid) for vid in latest_videos]
-
-    # Prepare to make a composite image
-    # Stamp each image with its filename before joining
-    stamped_images = []
-    for image, videoname in zip(images, latest_videos):
-        if image is not None:
-            filename = os.path.basename(videoname)
-            # get camtext by pasing the filename
-            # 1) try the Basler parser
-            try:
-                cam_id, start, end = parse_video_fname(filename, format='basler')
-                # tag it as UTC then convert to CEST
-                start = start.replace(tzinfo=ZoneInfo("UTC")).astimezone(ZoneInfo("Europe/Berlin"))
-                hour   = f"{start.hour:02d}"
-                minute = f"{start.minute:02d}"
-                day    = f"{start.day:02d}"
-                month  = f"{start.month:02d}"
-                camtext = f"cam{cam_id}  {hour}:{minute}  {day}.{month}"
-            except Exception:
-                # 2) try the Pi-h264 timestamp
-                try:
-                    fname = os.path.basename(filename)
-                    timestamp_str = fname.split('_')[-1].replace('.h264', '')
-                    camname = fname.split('_')[0]
-                    dt = datetime.strptime(timestamp_str, '%Y-%m-%d-%H-%M-%S')
-                    hour   = f"{dt.hour:02d}"
-                    minute = f"{dt.minute:02d}"
-                    day    = f"{dt.day:02d}"
-                    month  = f"{dt.month:02d}"
-                    camtext = f"{camname} {hour}:{minute}  {day}.{month}"
-                except Exception:
-                    # 3) fallback to bare filename
-                    camtext = os.path.splitext(os.path.basename(videoname))[0]
-
-            # rotate image
-            image = rotate_image(image,config.rotate)
-            # Add filename as text to the image
-            stamped_image = add_text_to_image(image, camtext)
-            stamped_images.append(stamped_image)
-        else:
-            stamped_images.append(None)
-    composite_image = join_images(stamped_images)
+    if videos is None:
+        videos = latest_videos(config)
+    if decoded is None:
+        decoded = {}
+    cache = _tile_cache(config)
+    recipe = (config.rotate, tile_width(config))
+
+    slots = list(zip(videos, config.input_subdir_names, map(file_stamp, videos)))
+    sent = _stamp_log(_sent_stamps, config)
+    policy = getattr(config, "unchanged_composite", "notice")
+    if only_if_changed and policy != "send" and sent.unchanged({s: st for _, s, st in slots}):
+        if policy == "notice":
+            since = datetime.fromtimestamp(newest_mtime(st for _, _, st in slots))
+            mon.send_message_async(config, f"no new video since {since:%H:%M}")
+        print(f"[{config.monitor_bot_name}] no new video; composite not sent", flush=True)
+        return False
+    tiles = [cache.get(subdir, stamp, recipe) for _, subdir, stamp in slots]
+    # Decode only the cameras whose video changed, all at once (see decode_workers).
+    decode_first_frames(config, [v if t is None else None for (v, _, _), t in zip(slots, tiles)], decoded)
+    timed_out = set()
+    for i, (videoname, subdir, stamp) in enumerate(slots):
+        if tiles[i] is not None or not videoname:
+            continue
+        result = decoded.get(videoname)
+        if result is not None and result.timed_out:
+            # Not cached or logged as sent: the next tick tries this camera again.
+            timed_out.add(subdir)
+            tiles[i] = placeholder_tile(config, f"{subdir} timed out", like=cache.last(subdir))
+            continue
+        image = first_frame_once(decoded, videoname)
+        tiles[i] = make_tile(config, image, videoname) if image is not None else None
+        cache.put(subdir, stamp, tiles[i], recipe)
+
+    # Tiles are already at their output size, so the composite needs no resize.
+    composite_image = _canvas(config).compose(tiles)
     if composite_image is not None:
-        composite_image = resize_image(composite_image,width=config.image_width)
         composite_image = add_text_to_image(composite_image,config.monitor_bot_name,position=(0.4,0.12),font_scale_relative=0.002)
-        # send image to message bot
-        mon.process_image_and_send(config,composite_image)
-        print(f"[{config.monitor_bot_name}] Sent image at",datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        for (_, subdir, stamp), tile in zip(slots, tiles):
+            sent.update(subdir, None if tile is None or subdir in timed_out else stamp)
+        # queue the image for the message bot; the tick does not wait for Telegram
+        sending = mon.process_image_and_send_async(config,composite_image)
+        sending.add_done_callback(functools.partial(_report_send, config))
         return True
     else:  # send an error message
-        mon.send_message(config,"Error: "+datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        mon.send_message_async(config,"Error: "+datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
         print(f"[{config.monitor_bot_name}] Error at",datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
         return False
 
 
+def _report_send(config, future):
+    if not future.cancelled() and future.exception() is None and future.result():
+        print(f"[{config.monitor_bot_name}] Sent image at",datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+
+
 ######
+def run_tick(config, tick, videos=None):
+    """One tick's work: save or archive the cameras' new frames, and on every
+    timer_messagebot_multiplier-th tick (counted from midnight), or the tick run in
+    place of a skipped one, send the composite.
+    `videos` are the newest videos if the caller has already looked them up."""
+    sendmsgnow = tick.every(config.timer_messagebot_multiplier)
+
+    archive = _archive(config)
+    keep_frames = config.save_images or archive is not None
+    if videos is None and (keep_frames or sendmsgnow):
+        videos = latest_videos(config)
+    decoded = {}  # first frames decoded this tick
+
+    if keep_frames:  # save and/or archive each new frame
+        kept = _stamp_log(_saved_stamps, config)
+        slots = list(zip(videos, config.input_subdir_names, map(file_stamp, videos)))
+        changed = [kept.changed(subdir, stamp) for _, subdir, stamp in slots]
+        new = [slot for slot, c in zip(slots, changed) if c]
+        decode_first_frames(config, [v if c else None for v, c in zip(videos, changed)], decoded)
+        for videoname, subdir, stamp in new:
+            image = first_frame_once(decoded, videoname)
+            if image is None:
+                continue
+            if config.save_images:  # encoded and written on the frame writer's threads
+                _frame_writer(config).save(subdir, os.path.join(config.output_basedir, subdir),
+                                           os.path.splitext(os.path.basename(videoname))[0], image)
+            if archive is not None:
+                # The recording's start from its name: copies and rsync rewrite mtimes.
+                taken = name_start_epoch(os.path.basename(videoname))
+                try:
+                    archive.append(subdir, stamp.mtime_ns / 1e9 if taken is None else taken, image)
+                except OSError as e:
+                    print(f"[{config.monitor_bot_name}] archive: {e}", flush=True)
+            kept.update(subdir, stamp)
+
+    if sendmsgnow:
+        send_composite_now(config, videos, decoded, only_if_changed=True)
+
+
+_tick_lock = threading.Lock()   # a tick and a control-socket send never run at once
+
+
+def handle_control(config, command, videos=None):
+    """The reply to a command on the config's control socket (see src/control.py).
+    "send" sends the composite now, whether or not its videos changed, from the
+    monitor's warm index and tile cache."""
+    from src import control
+    name, start_by, _ = control.parse(command)
+    if name == "ping":
+        return f"ok: {config.monitor_bot_name}"
+    if name != "send":
+        return f"error: unknown command {command!r}"
+    if not _tick_lock.acquire(timeout=-1 if start_by is None else max(0.0, start_by - time.time())):
+        return control.BUSY     # a tick ran too long for the asker to wait
+    try:
+        sent = send_composite_now(config, videos)
+    finally:
+        _tick_lock.release()
+    print(f"[{config.monitor_bot_name}] composite requested on the control socket", flush=True)
+    return "ok: composite sent" if sent else "error: no frames; sent an error message instead"
+
+
+def start_control(config, path, handler):
+    """Listen on the control socket of the config file at `path` (unless the config
+    sets control_socket = False); returns the ControlServer, or None."""
+    if not getattr(config, "control_socket", True):
+        return None
+    from src.control import ControlServer, socket_path
+    server = ControlServer(handler, label=config.monitor_bot_name)
+    return server if server.listen(path, socket_path(path)) else None
+
+
+def make_ticker(config):
+    """The config's tick schedule; ticks are due at fixed wall-clock times (see src/schedule.py)."""
+    return Ticker(config.timer_image_saving*60, policy=getattr(config, "tick_overrun", "skip"))
+
+
 def wait_and_get_images(config):
-    # initialize
-    messagebot_counter = 1
-
-    while True:
-        lasttime = datetime.now()
-        sendmsgnow = (messagebot_counter==config.timer_messagebot_multiplier)
-
-        if config.save_images:  # save each frame to its associated output directory
-            latest_videos = find_most_recent_files(config.input_basedir, config.input_subdir_names, config.file_type)
-            images = [extract_first_frame(vid) for vid in latest_videos]
-            for image,videoname,subdir in zip (images, latest_videos, config.input_subdir_names):
-                if image is not None:
-                    image_name = os.path.splitext(os.path.basename(videoname))[0] + ".png"
-                    savedir = os.path.join(config.output_basedir,subdir)
-                    if not os.path.exists(savedir):
-                        os.makedirs(savedir)
-                    cv2.imwrite(os.path.join(savedir,image_name), image)
-
-        if sendmsgnow:
-            send_composite_now(config)
-            messagebot_counter = 1
-        else:
-            messagebot_counter = messagebot_counter + 1
+    ticker = make_ticker(config)
+    for tick in ticker:
+        if tick.lag >= 1 or tick.skipped:  # the previous tick overran
+            print(f"[{config.monitor_bot_name}] {tick_report(tick, ticker.last_duration)}", flush=True)
+        with _tick_lock:
+            run_tick(config, tick)
+
+
+def send_once(config):
+    """Send one composite as fast as a fresh process can, then wait for it to go out.
+
+    The system check starts this on recovery when no monitor answers on its control
+    socket (see src/control.py), so its time to the first uploaded byte is its
+    whole cost. It skips what only pays off over many ticks: it scans the cameras'
+    directories once instead of building a video index, and decodes in-process
+    instead of in a scan/decode child. Meanwhile a thread imports the HTTP stack
+    and opens the connection to Telegram, while the decode, resize and encode, which
+    release the GIL, run on this one. benchmarks/bench_startup.py times it.
+    """
+    global _one_shot
+    _one_shot = True
+    threading.Thread(target=mon.connect, args=(config,), name="connect", daemon=True).start()
+    videos = scan_latest(config.input_basedir, config.input_subdir_names, config.file_type,
+                         getattr(config, "video_order", "mtime"))
+    send_composite_now(config, videos)
+    mon.wait_for_sends()  # the notifier's thread would die with the process
 
-        # correct time to wait by any script processing time
-        current_time = datetime.now()
-        time_to_wait = config.timer_image_saving*60 - (current_time-lasttime).total_seconds()
-        if time_to_wait>0:  # it could be <0 if processing takes a really long time
-            sleep(time_to_wait)
 
 def main():
     print("Starting...")
+    config = mon.get_config()
     # One-shot mode: send a single composite image and exit. Used by the system
     # check to push a fresh image on recovery (see bb_monitor_systemcheck.py).
     # An env var is used rather than a CLI flag because mon.get_config() treats
     # argv[1] as the config path.
     if os.environ.get("BB_MONITOR_ONCE"):
-        send_composite_now(config)
+        send_once(config)
         return
-    wait_and_get_images(config)
+    control = start_control(config, config.__file__, lambda _, command: handle_control(config, command))
+    try:
+        wait_and_get_images(config)
+    finally:
+        if control is not None:
+            control.close()
 
 
 if __name__ == "__main__":
@@ -1,32 +1,88 @@
-"""Run multiple bb_monitor configs in one process, one thread per config."""
+"""Run multiple bb_monitor configs in one launcher: one scheduler, one worker
+process per core (see src/dispatch.py)."""
+import concurrent.futures
+import functools
+import os
 import sys
-import threading
 import time
-import traceback
 
 import src.mon as mon
-from bb_monitor import wait_and_get_images
+from src import control, frame_cache
+from bb_monitor import handle_control, latest_videos, make_ticker, run_tick, start_control
+from src.dispatch import Dispatcher, default_workers, group_lanes, process_lane, sharing_lanes
 
 RESTART_BACKOFF_SECONDS = 10
+TICK_TIMEOUT_SECONDS = 900     # a tick running longer is hung: its worker process is killed
 
+# ----- in a worker process -----
 
-def _thread_runner(config):
-    label = getattr(config, "monitor_bot_name", "?")
-    while True:
+_lane = None
+_configs = {}   # path -> config, loaded once per worker process
+
+
+def _init_lane(number, cache_lanes=()):
+    global _lane
+    _lane = number
+    if number in cache_lanes:   # its configs include the same camera
+        frame_cache.share_by_default()
+
+
+def _config(path):
+    config = _configs.get(path)
+    if config is None:
+        config = mon.load_config_from_path(path)
+        spool = getattr(config, "notify_spool_dir", None)
+        if spool and _lane is not None:
+            # Each worker process has its own notifier, and a spool directory is
+            # one process's: give every lane its own.
+            config.notify_spool_dir = os.path.join(spool, f"lane{_lane}")
+        _configs[path] = config
+    return config
+
+
+def _run_tick(path, tick, videos):
+    """One tick of the config at `path`, in the worker process of its lane, with
+    the newest `videos` the launcher found (None: look them up here)."""
+    run_tick(_config(path), tick, videos)
+
+
+def _send_now(path, command, videos):
+    """A send asked for on the config's control socket, from the lane's warm state."""
+    _, start_by, _ = control.parse(command)
+    if start_by is not None and time.time() > start_by:
+        return control.BUSY     # queued behind a long tick; the asker has gone on without it
+    return handle_control(_config(path), command, videos)
+
+
+# ----- in the launcher -----
+
+_launcher_configs = {}  # path -> config
+
+
+def _latest_videos(path, tick):
+    """The config's newest videos, from the launcher's indexes: one per base
+    directory, shared by every config reading from it (src/video_index.py)."""
+    config = _launcher_configs[path]
+    if getattr(config, "isolate_scan_decode", False):
+        return None     # scanned by its lane's scan/decode child instead
+    return latest_videos(config)
+
+
+def _controller(dispatcher, lanes):
+    """The control-socket handler: "send" runs on the config's lane, between its
+    ticks, with videos found here as for a tick. A lane that does not get to it in
+    time is answered BUSY for (see src/control.py)."""
+    def handle(path, command):
+        name, _, answer_by = control.parse(command)
+        if name != "send":
+            return handle_control(_launcher_configs[path], command)
+        sending = dispatcher.call(lanes[path], _send_now, path, command, _latest_videos(path, None))
         try:
-            wait_and_get_images(config)
-        except Exception as e:
-            print(
-                f"[{label}] crashed: {e}; restarting in {RESTART_BACKOFF_SECONDS}s",
-                flush=True,
-            )
-            traceback.print_exc()
-        else:
-            print(
-                f"[{label}] returned; restarting in {RESTART_BACKOFF_SECONDS}s",
-                flush=True,
-            )
-        time.sleep(RESTART_BACKOFF_SECONDS)
+            return sending.result(timeout=None if answer_by is None else max(0.0, answer_by - time.time()))
+        except concurrent.futures.TimeoutError:
+            sending.cancel()
+            return control.BUSY
+    return handle
 
 
 def main():
@@ -36,26 +92,43 @@ def main():
         sys.exit(2)
 
     configs = [mon.load_config_from_path(p) for p in paths]
+    workers = int(os.environ.get("BB_MONITOR_WORKERS") or default_workers(len(configs)))
+    tick_timeout = float(os.environ.get("BB_MONITOR_TICK_TIMEOUT") or TICK_TIMEOUT_SECONDS)
     print(
-        f"[multi] starting {len(configs)} monitors: "
+        f"[multi] starting {len(configs)} monitors on {workers} worker processes: "
         f"{', '.join(c.monitor_bot_name for c in configs)}",
         flush=True,
     )
 
-    for cfg in configs:
-        t = threading.Thread(
-            target=_thread_runner,
-            args=(cfg,),
-            name=cfg.monitor_bot_name,
-            daemon=True,
-        )
-        t.start()
+    # Configs that include the same camera share a lane where they can, and so its
+    # decoded frames. A scan/decode child decodes for one config only.
+    cameras = [set() if getattr(c, "isolate_scan_decode", False)
+               else {(os.path.abspath(c.input_basedir), s) for s in c.input_subdir_names}
+               for c in configs]
+    assigned = group_lanes(cameras, workers)
+    dispatcher = Dispatcher(_run_tick, workers,
+                            make_lane=lambda n: process_lane(n, functools.partial(
+                                _init_lane, cache_lanes=sharing_lanes(cameras, assigned))),
+                            prepare=_latest_videos,
+                            backoff_seconds=RESTART_BACKOFF_SECONDS,
+                            tick_timeout=tick_timeout if tick_timeout > 0 else None)
+    lanes = {}
+    for path, cfg, lane in zip(paths, configs, assigned):
+        path = os.path.abspath(path)
+        _launcher_configs[path] = cfg
+        lanes[path] = dispatcher.add(cfg.monitor_bot_name, make_ticker(cfg), path, lane=lane)
+    handle = _controller(dispatcher, lanes)
+    controls = [start_control(_launcher_configs[path], path, handle) for path in lanes]
 
     try:
-        while True:
-            time.sleep(60)
+        dispatcher.run()
     except KeyboardInterrupt:
         print("[multi] received interrupt; exiting", flush=True)
+    finally:
+        for control in controls:
+            if control is not None:
+                control.close()
+        dispatcher.close()
 
 
 if __name__ == "__main__":
@@ -31,6 +31,7 @@ import time
 from datetime import datetime, timedelta
 
 import src.mon as mon
+from src import control
 from src.systemcheck_core import (
     RESOLVE_GRACE_SECONDS,
     Finding,
@@ -52,6 +53,10 @@ config = mon.get_config(
     user_module="user_config_systemcheck",
 )
 
+# How long _notify waits for the notifier to confirm a send: a read timeout plus a
+# few rounds of Telegram's rate limit.
+NOTIFY_TIMEOUT_SECONDS = 300
+
 # Hostname -> IPv4, held for the life of the process. See HostAddresses for why a
 # resolver cache cannot do this job. Every add and drop is logged, so `tmux attach`
 # shows exactly what the monitor believes each camera's address to be.
@@ -763,20 +768,30 @@ def _warn_if_ping_budget_overruns_tick(fast_minutes):
 
 def _notify(text):
     """Send a Telegram message; return True only on a confirmed successful send.
-    Collapses both a raised exception and an `ok == False` API response to False.
+    Collapses a raised exception, an `ok == False` API response and a send still
+    not done after NOTIFY_TIMEOUT_SECONDS to False.
+
+    The send itself runs on the shared notifier's thread (src/notifier.py), which
+    splits long messages and waits out Telegram's rate limit; this waits for its
+    Future.
     """
     try:
-        return bool(mon.send_message(config, text))
+        return bool(mon.send_message_async(config, text).result(timeout=NOTIFY_TIMEOUT_SECONDS))
     except Exception as e:
         print(f"Failed to send Telegram message: {e}", flush=True)
         return False
 
 
 def _trigger_monitor_images():
-    """Spawn the monitor bot once per configured monitor config to push a fresh
-    image to each monitor's own Telegram feed. Used on recovery for visual
-    confirmation. Runs each send as an isolated subprocess with a timeout so a
-    hung video read (e.g. stale NFS) can never stall the system-check loop.
+    """Ask each configured monitor to push a fresh image to its own Telegram feed.
+    Used on recovery for visual confirmation.
+
+    A running monitor (bb_monitor or bb_monitor_multi) is asked on its control
+    socket, and answers from its warm state (see src/control.py). For a config no
+    monitor is running, or whose monitor is busy or does not answer within half the
+    timeout, the monitor bot is spawned once instead, for what is left of it, as an
+    isolated subprocess, so a hung video read (e.g. stale NFS) can never stall the
+    system-check loop.
     """
     paths = getattr(config, "systemcheck_trigger_monitor_configs", [])
     if not paths:
@@ -786,12 +801,26 @@ def _trigger_monitor_images():
     monitor_script = os.path.join(repo_dir, "bb_monitor.py")
     child_env = {**os.environ, "BB_MONITOR_ONCE": "1"}
     for cfg_path in paths:
+        deadline = time.monotonic() + timeout
+        try:
+            reply = control.request(control.socket_path(cfg_path), f"send {timeout / 2:g}", timeout / 2)
+        except OSError as e:
+            print(f"Monitor for {cfg_path} did not answer on its control socket: {e}", flush=True)
+        else:
+            if reply == control.BUSY:
+                print(f"Monitor for {cfg_path} is busy; it will not send", flush=True)
+            elif reply is not None:
+                # It answered: a one-shot would only fail the same way, e.g. send a
+                # second "Error:" for the same missing frames.
+                if not reply.startswith("ok"):
+                    print(f"Monitor image for {cfg_path}: {reply}", flush=True)
+                continue
         try:
             subprocess.run(
                 [sys.executable, monitor_script, cfg_path],  # same venv via sys.executable
                 cwd=repo_dir,                                # so `import src.mon` resolves
                 env=child_env,
-                timeout=timeout,
+                timeout=max(0.0, deadline - time.monotonic()),
                 stdout=subprocess.DEVNULL,
                 stderr=subprocess.PIPE,
             )
@@ -0,0 +1,62 @@
+"""Benchmark: first-frame backends on your own video files.
+
+    python benchmarks/bench_first_frame.py /mnt/nfs/2026-07-10/cam0/*.avi
+    python benchmarks/bench_first_frame.py --backends opencv ffmpeg --lowres 2 video.mp4
+
+For every file and backend, prints the time and the bytes read for one extraction.
+Before each run the file's pages are dropped from the page cache
+(posix_fadvise DONTNEED), so each read is cold, as it is for a freshly written video
+on NFS. Pass --warm to skip that.
+"""
+import argparse
+import os
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.decode import format_bytes  # noqa: E402
+from src.first_frame import BACKENDS, read_first_frame  # noqa: E402
+
+
+def drop_cache(path):
+    if not hasattr(os, "posix_fadvise"):
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("videos", nargs="+")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--lowres", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--warm", action="store_true", help="do not drop the page cache")
+    args = parser.parse_args()
+
+    print(f"{'file':<40}{'backend':<16}{'median ms':>10}{'read':>10}{'file size':>11}  frame")
+    totals = {b: [] for b in args.backends}
+    for path in args.videos:
+        size = os.path.getsize(path)
+        for backend in args.backends:
+            times, result = [], None
+            for _ in range(args.repeats):
+                if not args.warm:
+                    drop_cache(path)
+                result = read_first_frame(path, backend=backend, lowres=args.lowres)
+                times.append(result.seconds)
+            totals[backend].append(statistics.median(times))
+            read = format_bytes(result.bytes_read) if result.bytes_read is not None else "?"
+            shape = "x".join(map(str, result.frame.shape)) if result.frame is not None else "none"
+            print(f"{os.path.basename(path)[:39]:<40}{result.backend:<16}"
+                  f"{statistics.median(times) * 1e3:>10.1f}{read:>10}{format_bytes(size):>11}  {shape}")
+    for backend, times in totals.items():
+        print(f"{backend}: median {statistics.median(times) * 1e3:.1f}ms over {len(times)} files")
+
+
+if __name__ == "__main__":
+    main()
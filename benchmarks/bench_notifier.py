@@ -0,0 +1,107 @@
+"""Benchmark: the notifier path against the local fake Telegram Bot API.
+
+    python benchmarks/bench_notifier.py
+    python benchmarks/bench_notifier.py --latency 0.05 --messages 200 --photos 50 --format jpeg
+
+Starts src/fake_telegram.py on a free port and sends the same messages and
+composites three ways:
+
+  unpooled  requests.post per call, a new connection each time (the old mon.py)
+  pooled    telegram.post on the shared keep-alive session
+  notifier  mon-style sends through the Notifier, waiting on each Future
+
+and prints messages/s, payload MB/s and p50/p95/p99 latency for each. The
+composite is a synthetic 1024-wide image encoded with --format, so encoding
+changes show up in the photo rows. The fake server speaks plain HTTP: against
+api.telegram.org, pooling also saves a TLS handshake per call.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import telegram  # noqa: E402
+from src.encode import IMAGE_FORMATS, encode_image  # noqa: E402
+from src.fake_telegram import FakeTelegram  # noqa: E402
+from src.notifier import Notifier  # noqa: E402
+
+
+def composite(height=1365, width=1024, seed=0):
+    """Grey frames with sensor-like noise: about as hard to compress as real ones."""
+    rng = np.random.default_rng(seed)
+    base = np.linspace(60, 180, width, dtype=np.float32)[None, :].repeat(height, 0)
+    return np.clip(base + rng.normal(0, 6, (height, width)), 0, 255).astype(np.uint8)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def unpooled(settings, call):
+    files = {"photo": call.photo} if call.photo is not None else None
+    url = f"{settings['api_url']}/bot{settings['token']}/{call.method}"
+    return requests.post(url, data=call.data, files=files,
+                         timeout=(settings["connect_timeout"], settings["read_timeout"])).json()
+
+
+def run(name, send, calls):
+    latencies, nbytes = [], 0
+    t0 = time.perf_counter()
+    for call in calls:
+        t = time.perf_counter()
+        if not send(call):
+            raise SystemExit(f"{name}: a send failed")
+        latencies.append(time.perf_counter() - t)
+        nbytes += len(call.photo[1]) if call.photo is not None else len(call.data["text"])
+    elapsed = time.perf_counter() - t0
+    print(f"{name:<22} {len(calls) / elapsed:>9.1f} {nbytes / elapsed / 1e6:>8.2f} "
+          + " ".join(f"{percentile(latencies, q) * 1000:>8.1f}" for q in (50, 95, 99)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--photos", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds the fake server takes per request")
+    parser.add_argument("--format", default="png", choices=list(IMAGE_FORMATS))
+    parser.add_argument("--quality", type=int, default=None)
+    args = parser.parse_args()
+
+    with FakeTelegram(latency=args.latency) as server:
+        settings = {"api_url": server.url, "retries": 0, "token": "BENCH",
+                    "connect_timeout": 5, "read_timeout": 30}
+        t = time.perf_counter()
+        photo, extension, mime = encode_image(composite(), args.format, args.quality)
+        encode_ms = (time.perf_counter() - t) * 1000
+        print(f"composite: {args.format} {len(photo) / 1e6:.2f} MB, encoded in {encode_ms:.0f} ms; "
+              f"server latency {args.latency * 1000:.0f} ms")
+        messages = [telegram.ApiCall(settings, "sendMessage", {"chat_id": 1, "text": f"Hive X:  tick {i}"})
+                    for i in range(args.messages)]
+        photos = [telegram.ApiCall(settings, "sendPhoto", {"chat_id": 1, "caption": ""},
+                                   ("composite" + extension, photo, mime))
+                  for _ in range(args.photos)]
+
+        notifier = Notifier()
+        ways = {
+            "unpooled": lambda call: unpooled(settings, call)["ok"],
+            "pooled": lambda call: telegram.perform(call)["ok"],
+            "notifier": lambda call: notifier.submit([call]).result(),
+        }
+        print(f"{'':<22} {'sends/s':>9} {'MB/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for kind, calls in (("messages", messages), ("photos", photos)):
+            for way, send in ways.items():
+                before = server.connections
+                run(f"{kind} {way}", send, calls)
+                if way != "notifier":
+                    print(f"{'':<22} {server.connections - before} connections")
+
+
+if __name__ == "__main__":
+    main()
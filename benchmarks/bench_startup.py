@@ -0,0 +1,173 @@
+"""Benchmark: how fast the one-shot BB_MONITOR_ONCE monitor gets its image out.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --cameras 4 --size 4000x3000 --repeats 10
+    python benchmarks/bench_startup.py --videos /mnt/nfs/hive --subdirs cam0 cam1 --file-type avi
+    python benchmarks/bench_startup.py --max-seconds 3          # exit 1 if slower
+
+This is the path the system check falls back to on recovery when no monitor is
+running (see src/control.py). Starts src/fake_telegram.py on a free port, writes a
+config pointing at it, and runs `python bb_monitor.py <config>` with
+BB_MONITOR_ONCE=1 --repeats times, each a fresh interpreter. Prints, from the
+moment the process is started:
+
+  interpreter      `python -c pass`, the floor nothing here can go below
+  import           `python -c "import bb_monitor"`
+  connected        the first connection reaching the fake API
+  upload starts    the sendPhoto request reaching it
+  photo received   the whole photo received and answered
+  exit             the one-shot process gone
+
+By default the videos are made up: --cameras short MJPEG clips of --size, grey
+gradients with sensor-like noise, in a temporary <date>/<camera> tree. Files stay
+in the page cache, so this measures a warm disk; pass --videos to time your own,
+e.g. on NFS. With --max-seconds the
+exit status says whether the median time to the photo received stayed under it,
+so a regression shows up in a script.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from src.fake_telegram import FakeTelegram, _Handler  # noqa: E402
+
+
+class _TimedHandler(_Handler):
+    def do_POST(self):
+        if self.path.endswith("/sendPhoto"):    # its headers are in, its body is not
+            self.server.upload_at.append(time.time())
+        super().do_POST()
+
+
+class TimedTelegram(FakeTelegram):
+    """The fake API, noting when each connection was accepted, each photo upload
+    started and each photo was received."""
+
+    def __init__(self):
+        super().__init__()
+        self.RequestHandlerClass = _TimedHandler
+        self.connected_at = []
+        self.upload_at = []
+        self.photo_at = []
+
+    def process_request(self, request, client_address):
+        self.connected_at.append(time.time())
+        super().process_request(request, client_address)
+
+    def answer(self, token, method, fields, files):
+        reply = super().answer(token, method, fields, files)
+        if method == "sendPhoto":
+            self.photo_at.append(time.time())
+        return reply
+
+
+def make_videos(root, cameras, width, height):
+    day = datetime.now().strftime("%Y-%m-%d")
+    names = []
+    for i in range(cameras):
+        camera = f"cam{i}"
+        directory = os.path.join(root, day, camera)
+        os.makedirs(directory)
+        path = os.path.join(directory, f"{camera}_{day}-12-00-00.avi")
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 3, (width, height))
+        rng = np.random.default_rng(i)
+        base = np.linspace(60, 180, width, dtype=np.float32)[None, :].repeat(height, 0)
+        for _ in range(3):
+            grey = np.clip(base + rng.normal(0, 6, (height, width)), 0, 255).astype(np.uint8)
+            writer.write(cv2.cvtColor(grey, cv2.COLOR_GRAY2BGR))
+        writer.release()
+        names.append(camera)
+    return names
+
+
+def write_config(path, url, basedir, subdirs, file_type):
+    with open(path, "w") as f:
+        f.write(f"import sys\nsys.path.insert(0, {REPO!r})\nfrom default_config import *\n"
+                f"input_basedir = {basedir!r}\ninput_subdir_names = {subdirs!r}\n"
+                f"file_type = {file_type!r}\nmonitor_bot_name = 'bench'\n"
+                f"telegram_api_url = {url!r}\ntelegram_bot_token = 'bench'\n"
+                f"telegram_chat_id = 1\n")
+
+
+def wall(args, env=None):
+    t0 = time.time()
+    subprocess.run(args, cwd=REPO, env=env, check=True, stdout=subprocess.DEVNULL)
+    return time.time() - t0
+
+
+def one_shot(config_path, server):
+    env = {**os.environ, "BB_MONITOR_ONCE": "1"}
+    connections, uploads, photos = len(server.connected_at), len(server.upload_at), len(server.photo_at)
+    t0 = time.time()
+    subprocess.run([sys.executable, "bb_monitor.py", config_path], cwd=REPO, env=env,
+                   check=True, stdout=subprocess.DEVNULL)
+    exited = time.time() - t0
+    if len(server.photo_at) == photos:
+        raise RuntimeError("the one-shot monitor sent no photo")
+    return (server.connected_at[connections] - t0, server.upload_at[uploads] - t0,
+            server.photo_at[photos] - t0, exited)
+
+
+def row(label, times):
+    print(f"{label:<16}{statistics.median(times) * 1e3:>11.0f}{min(times) * 1e3:>9.0f}"
+          f"{max(times) * 1e3:>9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--videos", help="input_basedir to read (default: made-up videos)")
+    parser.add_argument("--subdirs", nargs="+", help="input_subdir_names, with --videos")
+    parser.add_argument("--file-type", default="avi")
+    parser.add_argument("--cameras", type=int, default=3)
+    parser.add_argument("--size", default="1920x1080", help="WIDTHxHEIGHT of made-up videos")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float,
+                        help="fail if the median time to the photo received is longer")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="bb_bench_startup_")
+    try:
+        if args.videos:
+            basedir, subdirs = args.videos, args.subdirs or ["cam0"]
+        else:
+            width, height = map(int, args.size.lower().split("x"))
+            basedir = os.path.join(scratch, "videos")
+            subdirs = make_videos(basedir, args.cameras, width, height)
+        config_path = os.path.join(scratch, "bench_config.py")
+        with TimedTelegram() as server:
+            write_config(config_path, server.url, basedir, subdirs, args.file_type)
+            interpreter = [wall([sys.executable, "-c", "pass"]) for _ in range(args.repeats)]
+            imports = [wall([sys.executable, "-c", "import bb_monitor", config_path])
+                       for _ in range(args.repeats)]
+            one_shot(config_path, server)       # warm the page cache and the .pyc files
+            runs = [one_shot(config_path, server) for _ in range(args.repeats)]
+    finally:
+        shutil.rmtree(scratch)
+
+    print(f"{len(subdirs)} cameras, {args.repeats} runs each")
+    print(f"{'':<16}{'median ms':>11}{'min ms':>9}{'max ms':>9}")
+    row("interpreter", interpreter)
+    row("import", imports)
+    for i, label in enumerate(("connected", "upload starts", "photo received", "exit")):
+        row(label, [r[i] for r in runs])
+    if args.max_seconds is not None:
+        received = statistics.median(r[2] for r in runs)
+        if received > args.max_seconds:
+            print(f"median time to the photo received {received:.2f}s is over {args.max_seconds:.2f}s")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
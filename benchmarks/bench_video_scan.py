@@ -0,0 +1,106 @@
+"""Benchmark: newest video by glob + getmtime vs. by scandir + file-name timestamp.
+
+    python benchmarks/bench_video_scan.py                 # 10k files in a temp dir
+    python benchmarks/bench_video_scan.py --files 1440 --dir /mnt/nfs/scratch
+
+Builds one camera directory of Pi-style names (`cam0_YYYY-mm-dd-HH-MM-SS.h264`) with
+shuffled mtimes, as rsync leaves them, and times each way of finding the newest one.
+Point --dir at an NFS mount to see the stat round trips the file-name order avoids;
+on a local disk the page cache hides most of them.
+"""
+import argparse
+import glob
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.video_index import VideoIndex, name_start_epoch, scan_latest  # noqa: E402
+
+
+def glob_getmtime(base, subdirs, file_type):
+    """bb_monitor.find_most_recent_files' per-camera step, as it was."""
+    date_dir = max(os.path.join(base, d) for d in os.listdir(base))
+    out = []
+    for subdir in subdirs:
+        files = glob.glob(os.path.join(date_dir, subdir, "*" + file_type))
+        out.append(max(files, key=os.path.getmtime) if files else None)
+    return out
+
+
+def build(root, n_files):
+    day = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    camdir = os.path.join(root, day.strftime("%Y-%m-%d"), "cam0")
+    os.makedirs(camdir)
+    now = time.time()
+    for i in range(n_files):
+        start = day + timedelta(seconds=8 * i)
+        path = os.path.join(camdir, f"cam0_{start:%Y-%m-%d-%H-%M-%S}.h264")
+        open(path, "wb").close()
+        t = now - ((i * 7919) % n_files)        # shuffled, as rsync leaves them
+        os.utime(path, (t, t))
+    return path                                  # the newest by name
+
+
+class StatCounter:
+    def __init__(self):
+        self.count = 0
+        self._real = os.stat
+
+    def __enter__(self):
+        def counting_stat(*args, **kwargs):
+            self.count += 1
+            return self._real(*args, **kwargs)
+        os.stat = counting_stat
+        return self
+
+    def __exit__(self, *exc):
+        os.stat = self._real
+
+
+def timed(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    with StatCounter() as stats:
+        fn()
+    return result, times, stats.count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=10_000)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--dir", help="parent directory for the test tree (default: a temp dir)")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bb_bench_", dir=args.dir)
+    try:
+        expected = build(root, args.files)
+        name_start_epoch.cache_clear()
+        index = VideoIndex(root, ["cam0"], "h264", mode="poll", order="filename")
+        candidates = [
+            ("glob + getmtime (old)", lambda: glob_getmtime(root, ["cam0"], "h264")),
+            ("scandir + mtime", lambda: scan_latest(root, ["cam0"], "h264", order="mtime")),
+            ("scandir + file name", lambda: scan_latest(root, ["cam0"], "h264", order="filename")),
+            ("index, poll, file name", index.latest),
+        ]
+        print(f"{args.files} files, {args.repeats} repeats, in {root}")
+        print(f"{'method':<26}{'median ms':>11}{'min ms':>9}{'stats':>8}  correct")
+        for label, fn in candidates:
+            result, times, stats = timed(fn, args.repeats)
+            print(f"{label:<26}{statistics.median(times) * 1e3:>11.2f}{min(times) * 1e3:>9.2f}"
+                  f"{stats:>8}  {result == [expected]}")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,10 +2,43 @@
 monitor_bot_name = "Hive X"  # name to be displayed on images for monitor bot.  e.g. Hive 1 or Feeder/Exit
 telegram_bot_token = "FILL IN API TOKEN"
 telegram_chat_id = "FILL IN TELEGRAM CHAT ID"
+# Telegram calls share one pool of keep-alive connections per process (all monitors
+# of bb_monitor_multi, and the system check). Each call gives up after these
+# timeouts instead of hanging; failures to connect are retried telegram_retries
+# times with backoff.
+telegram_connect_timeout_seconds = 5
+telegram_read_timeout_seconds = 30
+telegram_retries = 3
+# Where the Bot API is. Point it at `python -m src.fake_telegram` to try a config
+# without sending anything to Telegram.
+telegram_api_url = "https://api.telegram.org"
+# Sends that cannot reach Telegram (the uplink is down) are kept in this directory and
+# delivered in order once it is back, retried with back-off from 5 s up to 10 min.
+# The oldest are dropped beyond notify_spool_max_mb or notify_spool_max_age_hours.
+# None loses them instead. One process per directory.
+notify_spool_dir = "~/.cache/bb_monitor/spool"
+notify_spool_max_mb = 200
+notify_spool_max_age_hours = 24
+# Where messages (and, for the monitor, composites) go. Each composite is encoded once
+# and handed to all sinks at the same time; a failing sink is reported without
+# holding up the others. Besides "telegram":
+#   {"type": "directory", "path": "/var/www/hive", "history": False}  # <name>-latest.<ext>
+#   {"type": "webhook", "url": "http://host/hook"}       # JSON messages, multipart images
+#   {"type": "smtp", "host": "localhost", "to": ["you@example.org"]}
+sinks = ["telegram"]
 
 # Setting timers to wait for checking directories 
 timer_image_saving = 1  # in minutes.  Time to wait before getting most recent video and associated image
 timer_messagebot_multiplier = 1  # integer.  Multiplies timer_image_saving
+# Ticks are due at local midnight + n * timer_image_saving, whatever the process start
+# time; the composite goes out on every tick n divisible by timer_messagebot_multiplier.
+# When a tick runs past the next one's due time: "skip" drops the ticks it missed,
+# "catch_up" runs each of them back to back.
+tick_overrun = "skip"
+# When no camera has a new video since the last composite: "notice" sends a short
+# "no new video since HH:MM" message instead, "skip" sends nothing, and "send" sends
+# the same composite again.
+unchanged_composite = "notice"
  
  # Whether or not to save images
 save_images = False 
@@ -15,10 +48,95 @@ input_subdir_names = ["cam0","cam1"]
 # images will be saved in subdirectories under output_basedir, with the subdir names
 # can be "" if not saving images
 output_basedir = "/Users/jacob/Desktop/frames" # images will be saved in subdirectories under this, with the subdir names
+# Saved frames are encoded and written on save_workers background threads; at most
+# save_queue_size wait, beyond that the oldest is dropped. save_image_format is "png",
+# "jpeg" or "webp"; save_image_quality is the PNG compression level (0-9) or the
+# JPEG/WebP quality (0-100), None for the format's default. A frame identical to the
+# camera's last saved one is not written again.
+save_image_format = "png"
+save_image_quality = None
+save_workers = 2
+save_queue_size = 8
+# Compact archive: with archive_dir set, each camera's new frames are also kept
+# archive_width pixels wide in one file per camera per day under archive_dir, for
+# timelapses and looking back (see src/archive.py). None turns it off.
+archive_dir = None
+archive_width = 320
 file_type = "avi"
+# How the newest video per camera is found. "auto" keeps an in-memory index that is
+# updated from inotify events on local disks, and from directory mtimes on NFS (where
+# inotify never sees the other host's writes); "inotify" or "poll" force one of the
+# two. "rescan" lists and stats every file on every tick, as older versions did.
+video_index = "auto"
+# The index still rescans everything this often, in case an event was missed.
+video_index_full_rescan_seconds = 900
+# Configs run by one bb_monitor_multi share the index of a base directory. Within
+# this many seconds of its last look at the directories it answers from memory, so
+# configs whose ticks fall due together cost one look, not one each.
+video_index_refresh_seconds = 5
+# Which video counts as newest. "mtime" is the file's modification time; "filename"
+# is the recording start time in its name (Basler or Pi-h264), which needs no stat
+# per file and is not fooled by rsync or a copy touching the mtimes.
+video_order = "mtime"
+
+# Decode the cameras' first frames on this many threads at once (OpenCV releases the
+# GIL while decoding). 0 or 1 decodes them one after another.
+decode_workers = 0
+# With decode_workers > 1, how many seconds each camera may take before its tile is
+# shown as "timed out" rather than holding up the composite. A number, a dict by
+# subdirectory name (e.g. {"cam0": 10, "cam1": 30}; unnamed cameras get 20), or None
+# to wait indefinitely. Each camera's decode latency is printed every tick.
+decode_deadline_seconds = 20
+# How the first frame is read. "opencv" opens the video with cv2.VideoCapture.
+# "ffmpeg" (needs the ffmpeg binary) pipes the file into ffmpeg and stops reading at
+# the first keyframe, so less of each video crosses NFS; anything it cannot read
+# falls back to opencv. first_frame_lowres = 1, 2 or 3 decodes at 1/2, 1/4 or 1/8
+# resolution where the codec supports it (MJPEG, MPEG-4), which also shrinks the
+# frames save_images writes. The decode latency line shows time and bytes read.
+first_frame_backend = "opencv"
+first_frame_lowres = 0
+# Monochrome cameras decode to three identical colour channels. "auto" keeps such a
+# frame as one channel from decode to upload (a third of the memory, CPU and upload
+# size, same picture); "always" converts every frame to grey, "never" keeps BGR.
+grayscale = "auto"
+# Decoded first frames can be cached for every config of the process, keyed by the
+# video's path, size and mtime, up to this many megabytes; 0 turns the cache off.
+# None: on (256 MB) only in a bb_monitor_multi worker process running configs that
+# include the same camera. A single monitor gains nothing from it: its tile cache
+# already skips cameras without a new video.
+frame_cache_mb = None
+
+# Scan the directories and decode the videos in a child process that is killed and
+# restarted when it does not answer within worker_timeout_seconds. Without it, a
+# stale NFS mount blocks the monitor forever without raising an error, so neither
+# this loop nor bb_monitor_multi's restart ever notices.
+isolate_scan_decode = False
+worker_timeout_seconds = 120
+
+# A running monitor listens on a local Unix socket (one per config file, in the temp
+# directory or $BB_MONITOR_CONTROL_DIR) for a "send the composite now", which the
+# system check asks for on recovery. False: no socket, the system check then starts
+# a one-shot monitor instead.
+control_socket = True
 
 # Image formatting for message bot
 rotate = 90 # angle for rotating joined camera images.  Use 90 (or -90?) for main cameras, 0 for feeder/exit
 image_width = 1024
+# How the cameras' tiles are arranged: "vertical" (one above the other), "horizontal"
+# (side by side) or "grid" (grid_columns tiles per row, as many rows as needed). The
+# composite is image_width wide in every layout, so a wide layout has smaller tiles.
+layout = "vertical"
+grid_columns = 2
+# How the composite is encoded for upload: "png" (lossless), "jpeg" or "webp". Lossy
+# formats are many times smaller. image_quality is 0-100 for jpeg/webp and the PNG
+# compression level 0-9 for png; None uses 90 for jpeg/webp and 3 for png.
+image_format = "png"
+image_quality = None
+# Behind a slow uplink (e.g. LTE), cap the bytes per composite: the quality (jpeg/webp)
+# and then the resolution are lowered until it fits, and the settings found are
+# reused on the next ticks. With image_upload_seconds the cap also follows the
+# measured upload speed, so that each upload takes about that long. None = no cap.
+image_max_bytes = None
+image_upload_seconds = None
 
  
\ No newline at end of file
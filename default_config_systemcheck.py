@@ -3,6 +3,30 @@
 monitor_bot_name   = "System Check"
 telegram_bot_token = "FILL IN API TOKEN"
 telegram_chat_id   = "FILL IN TELEGRAM CHAT ID"
+# Telegram calls share one pool of keep-alive connections per process (all monitors
+# of bb_monitor_multi, and the system check). Each call gives up after these
+# timeouts instead of hanging; failures to connect are retried telegram_retries
+# times with backoff.
+telegram_connect_timeout_seconds = 5
+telegram_read_timeout_seconds = 30
+telegram_retries = 3
+# Where the Bot API is. Point it at `python -m src.fake_telegram` to try a config
+# without sending anything to Telegram.
+telegram_api_url = "https://api.telegram.org"
+# Sends that cannot reach Telegram (the uplink is down) are kept in this directory and
+# delivered in order once it is back, retried with back-off from 5 s up to 10 min.
+# The oldest are dropped beyond notify_spool_max_mb or notify_spool_max_age_hours.
+# None loses them instead. One process per directory.
+notify_spool_dir = "~/.cache/bb_monitor/spool-systemcheck"
+notify_spool_max_mb = 200
+notify_spool_max_age_hours = 24
+# Where messages (and, for the monitor, composites) go. Each composite is encoded once
+# and handed to all sinks at the same time; a failing sink is reported without
+# holding up the others. Besides "telegram":
+#   {"type": "directory", "path": "/var/www/hive", "history": False}  # <name>-latest.<ext>
+#   {"type": "webhook", "url": "http://host/hook"}       # JSON messages, multipart images
+#   {"type": "smtp", "host": "localhost", "to": ["you@example.org"]}
+sinks = ["telegram"]
 
 # Fast cadence (minutes). The loop wakes on every multiple of this past midnight,
 # but only posts to Telegram when issues are found. An issue must be seen on TWO
@@ -41,15 +65,18 @@ systemcheck_remediation_hourly_only      = False
 
 # --- On-demand monitor image on recovery (off by default) ---
 # When the system check detects a recovery (an "All systems OK" right after an
-# error), it spawns the monitor bot once per config listed below to push a fresh
-# image to that monitor's own image channel — so you can visually confirm the
-# cameras are back. Leave the list empty to disable. Use ABSOLUTE paths (each
-# child runs with cwd = this repo).
+# error), it asks the monitor of each config listed below to push a fresh image to
+# that monitor's own image channel — so you can visually confirm the cameras are
+# back. A running bb_monitor / bb_monitor_multi of that config file is asked on its
+# control socket; otherwise the monitor bot is spawned once. Leave the list empty to
+# disable. Use ABSOLUTE paths, the same files the monitors were started with (each
+# spawned child runs with cwd = this repo).
 systemcheck_trigger_monitor_configs = [
     # "/home/pi/bb_monitor/feeders_monitor_config.py",
     # "/home/pi/bb_monitor/exitcams_monitor_config.py",
 ]
-# Per-config wall-clock timeout (seconds) for the one-shot image send.
+# Per-config wall-clock timeout (seconds) for the image send: up to half of it
+# waiting for a running monitor to answer, the rest for a one-shot if none does.
 systemcheck_trigger_timeout_seconds = 60
 
 # Cameras with bundled per-type checks. Every camera also gets a clock check.
@@ -0,0 +1,226 @@
+"""A compact archive of small frames: one file per camera per day.
+
+save_images keeps one full-size image file per camera per tick, hundreds of
+thousands of files a season, slow to list, back up and browse. The archive keeps a
+downscaled copy of each frame instead, all of one camera's day in a single file:
+
+    <root>/<camera>/<YYYY-MM-DD>.frames   the frames, raw pixels back to back
+    <root>/<camera>/<YYYY-MM-DD>.times    their times, float64 epoch seconds
+    <root>/<camera>/<YYYY-MM-DD>.json     the frame shape, fixed for the day
+
+Every frame of a day has the same shape (the first frame's, scaled to `width`), so
+frame i starts at byte i * frame size, and reading is a np.memmap of the file: a
+time-range query is a binary search in the times and a slice of the map, with no
+pixels copied until they are used.
+
+Frames are appended in time order, the pixels before the time. A frame whose time
+is missing (a crash between the two writes) is not part of the day, and is cut off
+by the next append. An append holds a lock on the camera's directory and takes the
+day's last time from its file, so several processes can append to one camera, e.g.
+bb_monitor_multi worker processes whose configs share an archive_dir.
+
+    archive = Archive("/data/thumbs")
+    for times, frames in archive.read("cam0", start, end): ...
+    times, frames = archive.frames_between("cam0", start, end)
+
+    python -m src.archive /data/thumbs cam0 "2026-06-01 06:00" "2026-06-01 20:00" --out day.mp4
+"""
+import argparse
+import contextlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+import cv2
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:     # not on Windows: one process per archive there
+    fcntl = None
+
+DEFAULT_WIDTH = 320
+TIME_DTYPE = np.dtype("<f8")
+
+
+class Day(NamedTuple):
+    """One camera's frames of one day, as read-only views of its files."""
+    day: str
+    times: np.ndarray       # float64 epoch seconds, ascending
+    frames: np.ndarray      # (n, height, width) or (n, height, width, channels) uint8
+
+
+def day_name(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d")
+
+
+class Archive:
+    """Appends frames to, and reads them back from, the archive under `root`."""
+
+    def __init__(self, root, width=DEFAULT_WIDTH):
+        self.root = os.path.expanduser(root)
+        self.width = width
+        self._shapes = {}       # (camera, day) -> frame shape
+
+    def _path(self, camera, day, kind):
+        return os.path.join(self.root, camera, f"{day}.{kind}")
+
+    # ----- writing -----
+
+    def _shape(self, camera, day, image):
+        """The day's frame shape: from its .json, or made from `image` and written."""
+        key = (camera, day)
+        if key not in self._shapes:
+            meta = self._path(camera, day, "json")
+            if os.path.exists(meta):
+                with open(meta) as f:
+                    self._shapes[key] = tuple(json.load(f)["shape"])
+            else:
+                height, width = image.shape[:2]
+                out_width = min(self.width, width)
+                shape = (max(1, round(height * out_width / width)), out_width) + image.shape[2:]
+                with open(meta + ".tmp", "w") as f:
+                    json.dump({"shape": shape, "dtype": "uint8"}, f)
+                os.replace(meta + ".tmp", meta)
+                self._shapes[key] = shape
+        return self._shapes[key]
+
+    def append(self, camera, timestamp, image):
+        """Add `image` (uint8, grey or BGR) to `camera`'s day as the frame of
+        `timestamp` (epoch seconds). Returns False, storing nothing, for a frame not
+        newer than the day's last one."""
+        day = day_name(timestamp)
+        directory = os.path.join(self.root, camera)
+        os.makedirs(directory, exist_ok=True)
+        with _locked(directory):
+            shape = self._shape(camera, day, image)
+            times_path, frames_path = self._path(camera, day, "times"), self._path(camera, day, "frames")
+            count = os.path.getsize(times_path) // TIME_DTYPE.itemsize if os.path.exists(times_path) else 0
+            if count and timestamp <= np.fromfile(times_path, TIME_DTYPE, offset=(count - 1) * 8)[0]:
+                return False
+
+            frame = _fit(image, shape)
+            with open(frames_path, "ab") as f:
+                f.truncate(count * frame.nbytes)     # a frame whose time was never written
+                f.write(frame.tobytes())
+            with open(times_path, "ab") as f:
+                f.truncate(count * TIME_DTYPE.itemsize)
+                f.write(np.array([timestamp], TIME_DTYPE).tobytes())
+        return True
+
+    # ----- reading -----
+
+    def cameras(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d)))
+
+    def days(self, camera):
+        directory = os.path.join(self.root, camera)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(n[:-len(".times")] for n in os.listdir(directory) if n.endswith(".times"))
+
+    def day(self, camera, day):
+        """All of `camera`'s frames of `day` ("YYYY-MM-DD"), memory-mapped."""
+        with open(self._path(camera, day, "json")) as f:
+            shape = tuple(json.load(f)["shape"])
+        times_path = self._path(camera, day, "times")
+        count = os.path.getsize(times_path) // TIME_DTYPE.itemsize
+        if count == 0:
+            return Day(day, np.empty(0, TIME_DTYPE), np.empty((0,) + shape, np.uint8))
+        times = np.memmap(times_path, TIME_DTYPE, mode="r", shape=(count,))
+        frames = np.memmap(self._path(camera, day, "frames"), np.uint8, mode="r", shape=(count,) + shape)
+        return Day(day, times, frames)
+
+    def read(self, camera, start, end):
+        """Yield a Day, sliced to [start, end), for each day of `camera` with frames in
+        that range. `start` and `end` are epoch seconds or datetimes. The slices are
+        views of the memory maps: nothing is copied."""
+        start, end = _seconds(start), _seconds(end)
+        first = datetime.fromtimestamp(start).date()
+        last = datetime.fromtimestamp(end).date()
+        wanted = {str(first + timedelta(days=i)) for i in range((last - first).days + 1)}
+        for day in self.days(camera):
+            if day not in wanted:
+                continue
+            whole = self.day(camera, day)
+            lo, hi = np.searchsorted(whole.times, [start, end], side="left")
+            if hi > lo:
+                yield Day(day, whole.times[lo:hi], whole.frames[lo:hi])
+
+    def frames_between(self, camera, start, end):
+        """(times, frames) of `camera` in [start, end). Within one day these are views
+        of the archive; a range over several days is joined into new arrays (the
+        days' shapes must then agree)."""
+        days = list(self.read(camera, start, end))
+        if len(days) == 1:
+            return days[0].times, days[0].frames
+        if not days:
+            return np.empty(0, TIME_DTYPE), np.empty((0, 0, 0), np.uint8)
+        return (np.concatenate([d.times for d in days]),
+                np.concatenate([d.frames for d in days]))
+
+
+@contextlib.contextmanager
+def _locked(directory):
+    """Hold an exclusive flock on `directory` (released if the process dies)."""
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+def _fit(image, shape):
+    """`image` as a contiguous uint8 frame of exactly `shape`."""
+    if image.ndim == 3 and image.shape[2] == 1:
+        image = image[:, :, 0]
+    if len(shape) == 2 and image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    elif len(shape) == 3 and image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    if image.shape[:2] != shape[:2]:
+        image = cv2.resize(image, (shape[1], shape[0]), interpolation=cv2.INTER_AREA)
+    return np.ascontiguousarray(image, np.uint8)
+
+
+def _seconds(when):
+    return when.timestamp() if isinstance(when, datetime) else float(when)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("root")
+    parser.add_argument("camera")
+    parser.add_argument("start", type=datetime.fromisoformat)
+    parser.add_argument("end", type=datetime.fromisoformat)
+    parser.add_argument("--out", help="write the frames as a timelapse video (.mp4)")
+    parser.add_argument("--fps", type=float, default=25)
+    args = parser.parse_args()
+
+    archive = Archive(args.root)
+    count = 0
+    writer = None
+    for day in archive.read(args.camera, args.start, args.end):
+        print(f"{day.day}: {len(day.times)} frames {datetime.fromtimestamp(day.times[0]):%H:%M}"
+              f"-{datetime.fromtimestamp(day.times[-1]):%H:%M}, shape {day.frames.shape[1:]}")
+        count += len(day.times)
+        if args.out:
+            for frame in day.frames:
+                if writer is None:
+                    writer = cv2.VideoWriter(args.out, cv2.VideoWriter_fourcc(*"mp4v"), args.fps,
+                                             (frame.shape[1], frame.shape[0]), isColor=frame.ndim == 3)
+                writer.write(frame)
+    if writer is not None:
+        writer.release()
+    print(f"{count} frames" + (f" written to {args.out}" if writer is not None else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Building the composite image from the cameras' first frames.
+
+A camera frame is large (4000x3000 BGR is 36 MB) and a tile is small (1024 px wide).
+Rotating and stamping the frame at full resolution and only then shrinking it meant
+a full-size copy per step, and the composite's peak memory grew with the sensor
+rather than with the image that is sent. Instead each frame is shrunk to its tile
+first, in one INTER_AREA pass, and everything after that — rotation, labels,
+stacking — works on output-sized arrays.
+
+Labels are drawn at output resolution with their stroke scaled down to match, so
+they look as they did when drawn on the full frame and shrunk with it.
+"""
+import cv2
+import numpy as np
+
+# Stroke of a label drawn on a full-resolution frame; see label_thickness.
+LABEL_THICKNESS = 6
+
+
+def rotate_image(image, angle):
+    if angle % 360 ==  90:
+        return cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    if angle % 360 == 270:
+        return cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE)
+    if abs(angle) % 360 == 180:
+        return cv2.rotate(image, cv2.ROTATE_180)
+    return image  # 0° or unrecognized multiple
+
+def add_text_to_image(image, text, position=(0.02,0.1), font_scale_relative=0.0015, font_thickness=6):
+    """Adds text to an image."""
+    # Calculate font scale based on image width
+    (height, width) = image.shape[:2]
+    font_scale = font_scale_relative * width
+    position_scaled = [int(position[0]*width), int(position[1]*height)]
+
+    cv2.putText(image, text, position_scaled, cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 255, 255), font_thickness, cv2.LINE_AA)
+    return image
+
+
+def _quarter_turns(angle):
+    """Whether rotate_image(image, angle) swaps the image's width and height."""
+    return angle % 360 in (90, 270)
+
+
+def fit_tile(image, width, angle):
+    """`image` rotated by `angle` and resized to `width`, as rotate_image followed
+    by a resize to `width` would make it, but shrunk before it is rotated.
+
+    Returns (tile, scale) where `scale` is output pixels per frame pixel. The tile
+    is always a new array, so it can be drawn on without touching `image`.
+    """
+    height, frame_width = image.shape[:2]
+    rotated_width, rotated_height = ((height, frame_width) if _quarter_turns(angle)
+                                     else (frame_width, height))
+    scale = width / float(rotated_width)
+    new_height = int(rotated_height * scale)
+    size = (new_height, width) if _quarter_turns(angle) else (width, new_height)
+    tile = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+    return rotate_image(tile, angle), scale
+
+
+def label_thickness(scale, thickness=LABEL_THICKNESS):
+    """Stroke for a label drawn at output resolution that matches one `thickness`
+    px thick drawn on the full frame and shrunk by `scale` with it."""
+    return max(1, round(thickness * scale))
+
+
+LAYOUTS = ("vertical", "horizontal", "grid")
+
+
+def layout_columns(layout, count, grid_columns=2):
+    """How many tiles side by side `layout` puts `count` cameras in."""
+    if layout == "vertical":
+        return 1
+    if layout == "horizontal":
+        return max(1, count)
+    if layout == "grid":
+        return max(1, min(grid_columns, count))
+    raise ValueError(f"unknown layout {layout!r}; expected one of {LAYOUTS}")
+
+
+class Canvas:
+    """The composite image, laid out as rows of `columns` tiles and reused from one
+    tick to the next.
+
+    Each row is as tall as its tallest tile and each column as wide as its widest,
+    so tiles of different heights (a placeholder, a camera mounted the other way)
+    still line up. The array is reallocated only when the tiles' shapes change,
+    which for a running monitor means almost never; otherwise every tick writes
+    its tiles into the same memory instead of stacking them into a new array.
+    A camera with no tile leaves its cell black. The canvas is single-channel
+    while all tiles are; one colour tile makes it BGR.
+
+    The returned array is overwritten by the next compose(), so whoever keeps it
+    longer than a tick must copy it.
+    """
+
+    def __init__(self, columns=1):
+        self.columns = columns
+        self._shapes = None
+        self._cells = None
+        self._image = None
+        self.allocations = 0
+
+    def _layout(self, shapes):
+        rows = [shapes[i:i + self.columns] for i in range(0, len(shapes), self.columns)]
+        heights = [max((s[0] for s in row if s), default=0) for row in rows]
+        widths = [max((rows[r][c][1] for r in range(len(rows))
+                       if c < len(rows[r]) and rows[r][c]), default=0)
+                  for c in range(self.columns)]
+        channels = max(s[2] if len(s) > 2 else 1 for s in shapes if s)
+        cells = []
+        for i in range(len(shapes)):
+            r, c = divmod(i, self.columns)
+            y, x = sum(heights[:r]), sum(widths[:c])
+            cells.append((slice(y, y + heights[r]), slice(x, x + widths[c])))
+        shape = (sum(heights), sum(widths)) + ((channels,) if channels > 1 else ())
+        return cells, shape
+
+    def compose(self, tiles):
+        """The tiles written into the canvas in order, or None if there are none."""
+        shapes = tuple(t.shape if t is not None else None for t in tiles)
+        if not any(shapes):
+            return None
+        if shapes != self._shapes:
+            self._cells, shape = self._layout(shapes)
+            self._image = np.zeros(shape, np.uint8)
+            self._shapes = shapes
+            self.allocations += 1
+        for tile, (rows, cols) in zip(tiles, self._cells):
+            cell = self._image[rows, cols]
+            if tile is None:
+                cell[...] = 0
+                continue
+            h, w = tile.shape[:2]
+            if tile.ndim < cell.ndim:
+                tile = tile[:, :, None]     # a grey tile among colour ones
+            cell[:h, :w] = tile
+            # Whatever the tile does not cover may hold last tick's label.
+            cell[h:] = 0
+            cell[:h, w:] = 0
+        return self._image
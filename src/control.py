@@ -0,0 +1,167 @@
+"""A local control socket on the running monitor, for "send the composite now".
+
+On recovery the system check used to start `python bb_monitor.py <config>` with
+BB_MONITOR_ONCE=1 for every monitor. Each start pays the interpreter, the cv2 and
+numpy imports, a cold directory scan and a decode of every camera, and on a loaded
+host could take longer than its timeout. The long-running monitor has all of that
+warm: its video index, its tile cache, its notifier.
+
+So bb_monitor and bb_monitor_multi listen on a Unix socket per config, and answer
+one-line commands:
+
+    send    send the composite now, changed or not  ->  "ok: ..." or "error: ..."
+    ping    is this config's monitor running?        ->  "ok: <monitor_bot_name>"
+
+"send SECONDS" says the asker waits SECONDS for the reply. A monitor that cannot
+start on the send within half of them (its tick holds it up, or its lane hangs)
+answers BUSY shortly before they run out, and then does not send at all: the
+asker will have sent it some other way.
+
+The socket's path is made from the config file's real path, so the system check
+finds it from the same path it would have passed to the subprocess. It lives in
+the temporary directory, or in $BB_MONITOR_CONTROL_DIR (e.g. when a systemd unit
+has a private /tmp). When nothing listens there, request() returns None and the
+caller falls back to the subprocess.
+"""
+import hashlib
+import os
+import socket
+import tempfile
+import threading
+import time
+
+DIR_ENV = "BB_MONITOR_CONTROL_DIR"
+MAX_COMMAND = 1024
+BUSY = "error: busy"
+
+
+def socket_path(config_path, directory=None):
+    """Where the monitor of the config file at `config_path` listens."""
+    directory = directory or os.environ.get(DIR_ENV) or tempfile.gettempdir()
+    digest = hashlib.sha1(os.path.realpath(config_path).encode()).hexdigest()[:16]
+    return os.path.join(directory, f"bb_monitor-{digest}.sock")
+
+
+def parse(command):
+    """Split `command` into its name, the time.time() by which its work must have
+    started, and the time by which it must be answered (None, None without
+    SECONDS)."""
+    name, _, seconds = command.partition(" ")
+    try:
+        seconds = float(seconds)
+    except ValueError:
+        return name, None, None
+    now = time.time()
+    return name, now + seconds / 2, now + seconds - min(2.0, seconds / 10)
+
+
+def request(path, command, timeout=60):
+    """Send `command` to the socket at `path` and return the reply line, or None if
+    no monitor is listening there. A monitor that does not answer within `timeout`
+    raises socket.timeout (an OSError)."""
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            return None     # never started, or a socket file left by a dead monitor
+        sock.sendall(command.encode() + b"\n")
+        sock.shutdown(socket.SHUT_WR)
+        reply = b""
+        while chunk := sock.recv(4096):
+            reply += chunk
+    return reply.decode(errors="replace").strip()
+
+
+class ControlServer:
+    """Answers commands on one socket per config, each on its own thread.
+
+    `handler(key, command)` returns the reply for a command sent to the socket
+    listened on for `key`; an exception it raises is answered as "error: ...".
+    Commands to one socket are handled one at a time.
+    """
+
+    def __init__(self, handler, label="control"):
+        self.handler = handler
+        self.label = label
+        self._sockets = {}      # path -> listening socket
+        self._closed = False
+
+    def listen(self, key, path):
+        """Start answering on `path` for `key`. Returns False, listening on nothing,
+        if another monitor already answers there."""
+        if not hasattr(socket, "AF_UNIX"):
+            return False
+        if os.path.exists(path):
+            try:
+                if request(path, "ping", timeout=2) is not None:
+                    print(f"[{self.label}] another monitor already listens on {path}", flush=True)
+                    return False
+            except OSError:
+                return False    # there, but not answering: leave it alone
+            try:
+                os.unlink(path)     # stale: its monitor is gone
+            except FileNotFoundError:
+                pass
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.bind(path)
+            os.chmod(path, 0o660)
+            sock.listen()
+        except OSError as e:
+            sock.close()
+            print(f"[{self.label}] cannot listen on {path}: {e}", flush=True)
+            return False
+        self._sockets[path] = sock
+        threading.Thread(target=self._serve, args=(key, sock), name=f"control-{os.path.basename(path)}",
+                         daemon=True).start()
+        return True
+
+    def _serve(self, key, sock):
+        while not self._closed:
+            try:
+                conn, _ = sock.accept()
+            except OSError:
+                return      # closed
+            with conn:
+                try:
+                    conn.settimeout(5)
+                    command = _read_line(conn)
+                    try:
+                        reply = self.handler(key, command)
+                    except Exception as e:
+                        reply = f"error: {e}"
+                    conn.sendall(reply.encode() + b"\n")
+                except OSError:
+                    pass    # the client gave up
+
+    @property
+    def paths(self):
+        return list(self._sockets)
+
+    def close(self):
+        """Stop listening and remove the socket files."""
+        self._closed = True
+        for path, sock in self._sockets.items():
+            try:
+                sock.shutdown(socket.SHUT_RDWR)     # wakes the thread blocked in accept
+            except OSError:
+                pass
+            sock.close()
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+        self._sockets.clear()
+
+
+def _read_line(conn):
+    data = b""
+    while b"\n" not in data and len(data) < MAX_COMMAND:
+        chunk = conn.recv(MAX_COMMAND)
+        if not chunk:
+            break
+        data += chunk
+    return data.split(b"\n", 1)[0].decode(errors="replace").strip()
@@ -0,0 +1,147 @@
+"""First-frame decoding for several cameras at once, each with its own deadline.
+
+Decoding one 4K HEVC frame takes a good fraction of a second, and a camera's video
+on a struggling NFS mount can take far longer. Decoded one after another, the
+slowest camera sets the pace of the whole tick. OpenCV releases the GIL while it
+decodes, so a small thread pool decodes the cameras side by side.
+
+A camera that misses its deadline comes back as timed out rather than holding up
+the others. Its decode cannot be interrupted — Python threads cannot be killed — so
+it keeps its worker until it returns; if it returns by the next tick and the video
+is still the latest, that result is used then instead of decoding it again.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, NamedTuple, Optional
+
+
+class Extraction(NamedTuple):
+    """What a first-frame backend (src/first_frame.py) reports about one read.
+    `bytes_read` is None where the backend cannot tell."""
+    frame: Any
+    backend: str
+    seconds: float
+    bytes_read: Optional[int] = None
+
+
+class Decoded(NamedTuple):
+    """Outcome of decoding one video's first frame.
+
+    `seconds` is how long the decode itself took, or None if it had not finished by
+    the deadline (`timed_out`). `backend` and `bytes_read` are filled in when the
+    extract function returns an Extraction rather than a bare frame.
+    """
+    frame: Any
+    seconds: Optional[float]
+    timed_out: bool = False
+    bytes_read: Optional[int] = None
+    backend: Optional[str] = None
+
+
+class FrameDecoder:
+    """Decodes first frames with `extract(path)` (returning a frame, None, or an
+    Extraction), serially (workers <= 1, no
+    deadline, exactly as before) or on a bounded pool of `workers` threads.
+
+    Deadlines count from the start of decode(): they bound how late the composite
+    can be, which is what the caller cares about.
+    """
+
+    def __init__(self, extract, workers=0, deadline_seconds=None, clock=time.monotonic):
+        self._extract = extract
+        self.deadline_seconds = deadline_seconds
+        self._clock = clock
+        self._pool = (ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decode")
+                      if workers > 1 else None)
+        self._in_flight = {}    # path -> Future, including overruns from an earlier tick
+        self._lock = threading.Lock()
+
+    def _timed(self, path):
+        t0 = self._clock()
+        result = self._extract(path)
+        seconds = self._clock() - t0
+        if isinstance(result, Extraction):
+            return Decoded(result.frame, seconds, bytes_read=result.bytes_read,
+                           backend=result.backend)
+        return Decoded(result, seconds)
+
+    def decode(self, paths, deadlines=None):
+        """Decode each of `paths`. Returns {path: Decoded}.
+
+        `deadlines` optionally maps a path to its own deadline in seconds, overriding
+        `deadline_seconds`; None means wait for it however long it takes.
+        """
+        paths = list(dict.fromkeys(p for p in paths if p))
+        if self._pool is None:
+            return {p: self._decode_inline(p) for p in paths}
+
+        deadlines = deadlines or {}
+        start = self._clock()
+        futures = {}
+        with self._lock:
+            # Overruns for videos that are no longer the latest will never be asked
+            # for again; drop them (and their frames) once they have finished.
+            for path in [p for p, f in self._in_flight.items() if p not in paths and f.done()]:
+                del self._in_flight[path]
+            for path in paths:
+                if path not in self._in_flight:
+                    self._in_flight[path] = self._pool.submit(self._timed, path)
+                futures[path] = self._in_flight[path]
+
+        results = {}
+        for path, future in futures.items():
+            limit = deadlines.get(path, self.deadline_seconds)
+            remaining = None if limit is None else max(0.0, start + limit - self._clock())
+            try:
+                result = future.result(timeout=remaining)
+            except FutureTimeout:
+                results[path] = Decoded(None, None, timed_out=True)
+                continue
+            except Exception:
+                result = Decoded(None, None)
+            with self._lock:
+                if self._in_flight.get(path) is future:
+                    del self._in_flight[path]
+            results[path] = result
+        return results
+
+    def _decode_inline(self, path):
+        try:
+            return self._timed(path)
+        except Exception:
+            return Decoded(None, None)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def format_bytes(n):
+    return f"{n / 1e6:.1f}MB" if n >= 100_000 else f"{n / 1e3:.0f}kB"
+
+
+def latency_report(decoded, names):
+    """One line of per-camera decode latency, e.g. `cam0 412ms, cam1 timed out`,
+    with the bytes read and backend where known: `cam0 212ms 1.3MB ffmpeg`.
+
+    `names` maps a path to the camera name to show for it.
+    """
+    parts = []
+    for path, result in decoded.items():
+        name = names.get(path, path)
+        if result.timed_out:
+            parts.append(f"{name} timed out")
+        elif result.seconds is None:
+            parts.append(f"{name} failed")
+        else:
+            detail = f"{name} {result.seconds * 1000:.0f}ms"
+            if result.bytes_read is not None:
+                detail += f" {format_bytes(result.bytes_read)}"
+            if result.backend is not None:
+                detail += f" {result.backend}"
+            if result.frame is None:
+                detail += " (no frame)"
+            parts.append(detail)
+    return ", ".join(parts)
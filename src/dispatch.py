@@ -0,0 +1,331 @@
+"""One scheduler for many monitors, running their ticks on a few worker processes.
+
+bb_monitor_multi used to give every config a thread running its own
+wait_and_get_images loop. Decoding, resizing and encoding are CPU work, so twenty
+hives on one host took turns on a single core under the GIL, and configs that fell
+due at the same minute piled up behind each other.
+
+Dispatcher keeps each config's Ticker (src/schedule.py) in a heap ordered by when
+its next tick is due, and sleeps only until the earliest. A due tick is handed to
+the config's lane: a single-process executor, one per core. A config always runs
+on the same lane, so what it keeps between ticks (its video index, tile cache,
+notifier) lives on in that process, and its ticks never overlap; different lanes
+run in parallel. A config is not due again until its running tick has finished, so
+an overrun is handled by its Ticker's skip-or-catch-up policy.
+
+Configs that include the same camera are best put on the same lane, where they
+share the decoded frame (src/frame_cache.py), as far as that leaves the lanes
+evenly loaded; group_lanes works that out.
+
+A tick that raises is reported, and the config is retried after a back-off that
+doubles with each failure in a row. A lane whose process died is replaced. With a
+`tick_timeout`, a tick still running after it (a hung NFS read, a decoder that
+never returns) counts as failed too: its lane's process is killed and replaced,
+and the configs waiting behind it on the lane are dispatched again. The deadline
+runs from dispatch, so it covers the launcher's `prepare` step as well.
+"""
+import heapq
+import itertools
+import multiprocessing
+import os
+import queue
+import signal
+import time
+import traceback
+from concurrent.futures import BrokenExecutor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from src.schedule import tick_report
+
+DEFAULT_BACKOFF_SECONDS = 10
+DEFAULT_MAX_BACKOFF_SECONDS = 600
+DEFAULT_PREPARE_WORKERS = 4
+
+
+def process_lane(number, initializer=None):
+    """A one-process executor for lane `number`; `initializer(number)` runs in it."""
+    return ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_start_lane, initargs=(number, initializer))
+
+
+def _start_lane(number, initializer):
+    # Ctrl-C reaches every process of the terminal; the launcher shuts the lanes
+    # down itself, letting a tick in progress finish.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if initializer is not None:
+        initializer(number)
+
+
+def group_lanes(keys, workers):
+    """A lane for each of several configs, given each config's set of `keys` (e.g.
+    its cameras). A config goes to the lane whose configs share most of its keys,
+    unless that lane already has its fair share of configs (their number over
+    `workers`, rounded up); without shared keys, to the least loaded lane. Configs
+    with the most keys are placed first, so that an overview of every camera takes
+    a few of its cameras' configs along, not all of them."""
+    fair_share = -(-len(keys) // workers)
+    lanes, load = [0] * len(keys), [0] * workers
+    lane_keys = [set() for _ in range(workers)]
+    for i in sorted(range(len(keys)), key=lambda i: len(keys[i]), reverse=True):
+        open_lanes = [n for n in range(workers) if load[n] < fair_share]
+        lane = max(open_lanes, key=lambda n: (len(keys[i] & lane_keys[n]), -load[n], -n))
+        lanes[i] = lane
+        load[lane] += 1
+        lane_keys[lane] |= keys[i]
+    return lanes
+
+
+def sharing_lanes(keys, lanes):
+    """The lanes on which two configs share a key, given each config's `keys` and
+    `lanes` (as from group_lanes)."""
+    seen, sharing = {}, set()
+    for config_keys, lane in zip(keys, lanes):
+        for key in config_keys:
+            if (lane, key) in seen:
+                sharing.add(lane)
+            seen[(lane, key)] = True
+    return frozenset(sharing)
+
+
+def default_workers(count):
+    """One lane per core, but no more lanes than configs."""
+    return max(1, min(count, os.cpu_count() or 1))
+
+
+class _Entry:
+    __slots__ = ("label", "ticker", "args", "lane", "failures", "started", "abandoned")
+
+    def __init__(self, label, ticker, args, lane):
+        self.label = label
+        self.ticker = ticker
+        self.args = args
+        self.lane = lane
+        self.failures = 0
+        self.started = None     # (deadline, executor, future, stage) of its tick in flight
+        self.abandoned = set()  # futures of ticks given up on, whatever they still do
+
+
+class Dispatcher:
+    """Runs `job(*args, tick)` on a lane for every tick of every added config.
+
+    With `prepare`, `prepare(*args, tick)` first runs in the launcher, on one of
+    `prepare_workers` threads, and its result is passed on: `job(*args, tick,
+    prepared)`. bb_monitor_multi finds the configs' newest videos this way, from
+    indexes the launcher shares between configs.
+
+    With `tick_timeout` (seconds), a tick still unfinished that long after it was
+    dispatched is given up on and its config backed off. If it is stuck on its
+    lane, the lane is recycled (see the module docstring); if still in `prepare`,
+    the prepare threads are replaced, leaving the stuck one behind.
+    """
+
+    def __init__(self, job, workers, make_lane=process_lane, prepare=None,
+                 prepare_workers=DEFAULT_PREPARE_WORKERS,
+                 backoff_seconds=DEFAULT_BACKOFF_SECONDS,
+                 max_backoff_seconds=DEFAULT_MAX_BACKOFF_SECONDS, tick_timeout=None,
+                 clock=time.monotonic):
+        self.job = job
+        self.prepare = prepare
+        self.prepare_workers = prepare_workers
+        self._preparing = self._prepare_pool() if prepare is not None else None
+        self.workers = workers
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.tick_timeout = tick_timeout
+        self._make_lane = make_lane
+        self._clock = clock
+        self._lanes = [make_lane(n) for n in range(workers)]
+        self._entries = []
+        self._heap = []                 # (due monotonic, order, entry)
+        self._order = itertools.count()
+        self._done = queue.Queue()      # what to do next on run()'s thread, e.g. a tick finished
+        self.dispatched = 0
+        self.failed = 0
+        self.restarts = 0
+        self.timed_out = 0
+
+    def add(self, label, ticker, *args, lane=None):
+        """Schedule a config: `ticker` says when its ticks are due, `args` go to the
+        job. `lane` pins it to a lane; by default configs take turns. Returns the
+        lane."""
+        if lane is None:
+            lane = len(self._entries) % self.workers
+        entry = _Entry(label, ticker, args, lane=lane % self.workers)
+        self._entries.append(entry)
+        self._push(entry, ticker.next_due)
+        return entry.lane
+
+    def call(self, lane, fn, *args):
+        """Run `fn(*args)` on lane `lane` (as returned by add) between its ticks, e.g.
+        a send asked for on the control socket. Returns its Future."""
+        try:
+            return self._lanes[lane].submit(fn, *args)
+        except RuntimeError as e:     # broken or shut down; replaced once a tick fails
+            return _failed(e)
+
+    def _push(self, entry, due):
+        heapq.heappush(self._heap, (due, next(self._order), entry))
+
+    @property
+    def running(self):
+        """Ticks dispatched and not yet finished."""
+        return len(self._entries) - len(self._heap)
+
+    def run(self, stop=lambda: False):
+        """Dispatch ticks until `stop()` is true (checked after every wake-up)."""
+        while not stop():
+            wake = [started[0] for started in (e.started for e in self._entries)
+                    if started and started[0] is not None]
+            if self._heap:
+                wake.append(self._heap[0][0])
+            timeout = max(0.0, min(wake) - self._clock()) if wake else None
+            try:
+                self._done.get(timeout=timeout)()
+            except queue.Empty:
+                pass
+            self._expire_overdue()
+            while self._heap and self._heap[0][0] <= self._clock():
+                _, _, entry = heapq.heappop(self._heap)
+                tick = entry.ticker.poll()
+                if tick is None:
+                    self._push(entry, entry.ticker.next_due)
+                else:
+                    self._dispatch(entry, tick)
+
+    def _dispatch(self, entry, tick):
+        if tick.lag >= 1 or tick.skipped:       # its previous tick, or its lane, overran
+            print(f"[{entry.label}] {tick_report(tick, entry.ticker.last_duration)}", flush=True)
+        self.dispatched += 1
+        deadline = self._clock() + self.tick_timeout if self.tick_timeout is not None else None
+        if self.prepare is None:
+            self._submit(entry, tick, (), deadline)
+            return
+        pool = self._preparing
+        future = pool.submit(self.prepare, *entry.args, tick)
+        entry.started = (deadline, pool, future, "prepare")
+        future.add_done_callback(
+            lambda f: self._done.put(lambda: self._prepared(entry, tick, f, deadline)))
+
+    def _prepared(self, entry, tick, future, deadline):
+        if future in entry.abandoned or future.cancelled() or future.exception() is not None:
+            self._finished(entry, None, future)
+            return
+        self._submit(entry, tick, (future.result(),), deadline)
+
+    def _submit(self, entry, tick, extra, deadline):
+        lane = self._lanes[entry.lane]
+        try:
+            future = lane.submit(self.job, *entry.args, tick, *extra)
+        except RuntimeError as e:     # broken, or shut down as it was being replaced
+            future = _failed(e)
+        entry.started = (deadline, lane, future, "lane")
+        future.add_done_callback(lambda f: self._done.put(lambda: self._finished(entry, lane, f)))
+
+    def _finished(self, entry, lane, future):
+        if future in entry.abandoned:
+            entry.abandoned.discard(future)     # dealt with when it was given up on
+            return
+        entry.started = None
+        entry.ticker.done()
+        if future.cancelled():          # queued on a lane or pool that was shut down
+            self._push(entry, entry.ticker.next_due)
+            return
+        try:
+            future.result()
+        except Exception as e:
+            self._failure(entry, lane, e)
+            return
+        entry.failures = 0
+        self._push(entry, entry.ticker.next_due)
+
+    def _failure(self, entry, lane, error):
+        if isinstance(error, BrokenExecutor):
+            self._replace_lane(entry.lane, lane)
+        else:
+            traceback.print_exception(type(error), error, error.__traceback__)
+        self._retry(entry, f"crashed: {error}")
+
+    def _retry(self, entry, what):
+        self.failed += 1
+        entry.failures += 1
+        backoff = min(self.backoff_seconds * 2 ** (entry.failures - 1), self.max_backoff_seconds)
+        print(f"[{entry.label}] {what}; restarting in {backoff:.0f}s", flush=True)
+        self._push(entry, max(self._clock() + backoff, entry.ticker.next_due))
+
+    def _expire_overdue(self):
+        now = self._clock()
+        for entry in self._entries:
+            started = entry.started
+            if started is None or started[0] is None or started[0] > now:
+                continue
+            _, executor, future, stage = started
+            if stage == "prepare" and not future.running():
+                continue    # queued behind a stuck one, and set free when that is replaced
+            self.timed_out += 1
+            self._give_up(entry, future)
+            if stage == "prepare":
+                self._replace_prepare_pool(executor)
+                self._retry(entry, f"prepare still running after {self.tick_timeout:g}s")
+            else:
+                self._recycle_lane(entry.lane, executor)
+                self._retry(entry, f"tick still running after {self.tick_timeout:g}s, its lane killed")
+
+    def _give_up(self, entry, future):
+        entry.started = None
+        entry.abandoned.add(future)
+        entry.ticker.done()
+
+    def _recycle_lane(self, number, lane):
+        # The ticks queued behind the hung one would fail with the lane: send them
+        # again, to the new lane, without counting it against their configs.
+        for other in self._entries:
+            started = other.started
+            if started is not None and started[1] is lane and started[3] == "lane":
+                self._give_up(other, started[2])
+                self._push(other, other.ticker.next_due)
+        if self._lanes[number] is lane:
+            self._lanes[number] = self._make_lane(number)
+            self.restarts += 1
+            print(f"[dispatch] lane {number} killed; started a new one", flush=True)
+        _kill(lane)
+
+    def _prepare_pool(self):
+        return ThreadPoolExecutor(self.prepare_workers, thread_name_prefix="prepare")
+
+    def _replace_prepare_pool(self, stuck):
+        # A thread stuck in prepare (a hung NFS scan) cannot be stopped. Leave it to
+        # the old pool and give the others fresh threads; what was queued on the old
+        # pool is cancelled, and dispatched again on the new one.
+        if self._preparing is not stuck:
+            return
+        self._preparing = self._prepare_pool()
+        stuck.shutdown(wait=False, cancel_futures=True)
+        print("[dispatch] a prepare thread is stuck; started new ones", flush=True)
+
+    def _replace_lane(self, number, broken):
+        if self._lanes[number] is not broken:
+            return          # already replaced, for another config on the lane
+        broken.shutdown(wait=False, cancel_futures=True)
+        self._lanes[number] = self._make_lane(number)
+        self.restarts += 1
+        print(f"[dispatch] lane {number} died; started a new one", flush=True)
+
+    def close(self):
+        if self._preparing is not None:
+            self._preparing.shutdown(wait=False, cancel_futures=True)
+        for lane in self._lanes:
+            lane.shutdown(wait=False, cancel_futures=True)
+
+
+def _kill(executor):
+    """Shut `executor` down without waiting for what runs on it, terminating its
+    processes if it has any (a thread cannot be stopped, and is left to finish)."""
+    processes = list((getattr(executor, "_processes", None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+
+
+def _failed(error):
+    future = Future()
+    future.set_exception(error)
+    return future
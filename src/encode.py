@@ -0,0 +1,124 @@
+"""Encoding the composite for upload, in memory.
+
+The composite used to go to Telegram by way of the filesystem: a temp directory,
+cv2.imwrite, open it again for the upload, delete file and directory. cv2.imencode
+produces the same bytes in memory, and they go into the multipart body as they are.
+
+PNG is lossless and what the monitor has always sent. A camera composite is mostly
+noise to PNG's compressor, so JPEG (or WebP) at a high quality is many times
+smaller and looks the same at the size Telegram shows it.
+
+Behind a slow uplink even that can take too long, so AdaptiveEncoder fits each
+composite into a byte budget instead, trading quality first and resolution second.
+"""
+import cv2
+
+# format -> (file extension, MIME type, cv2 parameter for `quality`, its default)
+IMAGE_FORMATS = {
+    "png": (".png", "image/png", cv2.IMWRITE_PNG_COMPRESSION, 3),
+    "jpeg": (".jpg", "image/jpeg", cv2.IMWRITE_JPEG_QUALITY, 90),
+    "webp": (".webp", "image/webp", cv2.IMWRITE_WEBP_QUALITY, 90),
+}
+
+
+def encode_image(image, image_format="png", quality=None):
+    """`image` encoded as `image_format`. Returns (bytes, extension, MIME type).
+
+    `quality` is 0-100 for JPEG and WebP, and the compression level 0-9 for PNG
+    (which only trades time for size); None uses the format's default.
+    """
+    try:
+        extension, mime, param, default = IMAGE_FORMATS[image_format]
+    except KeyError:
+        raise ValueError(f"unknown image format {image_format!r}; "
+                         f"expected one of {tuple(IMAGE_FORMATS)}") from None
+    ok, buffer = cv2.imencode(extension, image, [param, default if quality is None else int(quality)])
+    if not ok:
+        raise ValueError(f"could not encode a {image.shape} image as {image_format}")
+    return buffer.tobytes(), extension, mime
+
+
+class AdaptiveEncoder:
+    """Encodes composites to fit a byte budget, for hives behind slow uplinks.
+
+    For JPEG and WebP it looks for the highest quality (between `min_quality` and
+    `max_quality`) whose output fits; when even `min_quality` does not, it shrinks
+    the image by `scale_step` and looks again, down to `min_scale`. PNG has no
+    quality to give, so only its resolution shrinks.
+
+    One monitor's composites hardly change in how well they compress from one tick
+    to the next, so the settings found are remembered and tried first next time: a
+    tick whose image still fits without wasting much of the budget costs one encode.
+    Only when it overflows, or uses less than `refill` of the budget while better
+    settings exist, does the search run again.
+    """
+
+    def __init__(self, image_format="jpeg", min_quality=40, max_quality=95,
+                 min_scale=0.25, scale_step=0.75, refill=0.6):
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"unknown image format {image_format!r}")
+        self.image_format = image_format
+        self.min_quality = min_quality
+        self.max_quality = max_quality
+        self.min_scale = min_scale
+        self.scale_step = scale_step
+        self.refill = refill
+        self.quality = None if image_format == "png" else max_quality
+        self.scale = 1.0
+        self.encodes = 0
+        self.searches = 0
+
+    def _encode(self, image, quality, scale):
+        if scale < 1.0:
+            height, width = image.shape[:2]
+            image = cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+        self.encodes += 1
+        return encode_image(image, self.image_format, quality)
+
+    def encode(self, image, max_bytes):
+        """`image` encoded within `max_bytes` if at all possible. Returns (bytes,
+        extension, MIME type) like encode_image; when nothing fits, the smallest
+        encoding tried."""
+        encoded = self._encode(image, self.quality, self.scale)
+        size = len(encoded[0])
+        best = self.quality in (None, self.max_quality) and self.scale == 1.0
+        if size <= max_bytes and (best or size >= self.refill * max_bytes):
+            return encoded
+        return self._search(image, max_bytes)
+
+    def _search(self, image, max_bytes):
+        self.searches += 1
+        scale = 1.0
+        while True:
+            if self.quality is None:            # PNG: only the size can change
+                encoded = self._encode(image, None, scale)
+                fits = len(encoded[0]) <= max_bytes
+                quality = None
+            else:
+                encoded, quality = self._best_quality(image, scale, max_bytes)
+                fits = quality is not None
+                quality = quality if fits else self.min_quality
+            if fits or scale * self.scale_step < self.min_scale:
+                self.quality, self.scale = quality, scale
+                return encoded
+            scale *= self.scale_step
+
+    def _best_quality(self, image, scale, max_bytes):
+        """(encoding, quality) for the highest quality at `scale` that fits, or
+        (the min-quality encoding, None) when none does."""
+        lo, hi = self.min_quality, self.max_quality
+        best = None
+        smallest = None
+        while lo <= hi:
+            quality = (lo + hi) // 2
+            encoded = self._encode(image, quality, scale)
+            if len(encoded[0]) <= max_bytes:
+                best = (encoded, quality)
+                lo = quality + 1
+            else:
+                smallest = encoded if quality == self.min_quality else smallest
+                hi = quality - 1
+        if best is not None:
+            return best
+        return smallest or self._encode(image, self.min_quality, scale), None
@@ -0,0 +1,215 @@
+"""A local stand-in for the Telegram Bot API, for tests and benchmarks.
+
+    python -m src.fake_telegram --port 8081 --latency 0.05
+
+then set `telegram_api_url = "http://127.0.0.1:8081"` in a config to send there
+instead of api.telegram.org. It answers `sendMessage`, `sendPhoto`, `getMe` and
+`getUpdates` the way Telegram does, over HTTP/1.1 with keep-alive, and records
+what it received. Faults can be injected: a latency per request, 429 replies with
+a `retry_after`, and server errors or dropped connections.
+
+It speaks plain HTTP, so a benchmark against it measures everything but the TLS
+handshake a pooled session saves on the real API.
+"""
+import argparse
+import json
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import NamedTuple, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+
+class Received(NamedTuple):
+    """One request the server accepted."""
+    token: str
+    method: str
+    fields: dict
+    photo: Optional[bytes] = None
+
+
+def parse_form(content_type, body):
+    """(fields, files) of a urlencoded or multipart/form-data body; files maps a
+    field name to (filename, bytes)."""
+    if content_type.startswith("multipart/form-data"):
+        message = BytesParser(policy=HTTP).parsebytes(
+            b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body)
+        fields, files = {}, {}
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            data = part.get_payload(decode=True) or b""
+            if part.get_filename() is not None:
+                files[name] = (part.get_filename(), data)
+            else:
+                fields[name] = data.decode()
+        return fields, files
+    return dict(parse_qsl(body.decode())), {}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in two writes; with Nagle on, the body of every reply
+    # on a kept-alive connection would wait out the client's 40 ms delayed ACK.
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self._handle(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+
+    def do_GET(self):
+        self._handle(b"")
+
+    def _handle(self, body):
+        server = self.server
+        url = urlsplit(self.path)
+        _, _, rest = url.path.partition("/bot")
+        token, _, method = rest.partition("/")
+        fields, files = parse_form(self.headers.get("Content-Type", ""), body)
+        fields.update(parse_qsl(url.query))
+        latency, fault = server.next_fault()
+        if latency:
+            time.sleep(latency)
+        if fault == "drop":
+            self.close_connection = True
+            return
+        if fault is not None:
+            status, reply = fault
+        else:
+            status, reply = 200, server.answer(token, method, fields, files)
+        data = json.dumps(reply).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeTelegram(ThreadingHTTPServer):
+    """The fake Bot API, listening on 127.0.0.1 (port 0 picks a free one).
+
+    Use as a context manager, or start() and stop(). `received` lists every
+    accepted sendMessage / sendPhoto; `connections` counts TCP connections, so a
+    test can tell a pooled client from one that reconnects every time.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency = latency
+        self.received = []
+        self.connections = 0
+        self.requests = 0
+        self._faults = []          # injected replies, used one per request
+        self._updates = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._message_id = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    # ----- fault injection -----
+
+    def rate_limit(self, count=1, retry_after=1):
+        """Answer the next `count` requests with a 429 asking to wait `retry_after`."""
+        reply = {"ok": False, "error_code": 429,
+                 "description": f"Too Many Requests: retry after {retry_after}",
+                 "parameters": {"retry_after": retry_after}}
+        with self._lock:
+            self._faults += [(429, reply)] * count
+
+    def fail(self, count=1, status=500):
+        """Answer the next `count` requests with HTTP `status`."""
+        reply = {"ok": False, "error_code": status, "description": "Internal Server Error"}
+        with self._lock:
+            self._faults += [(status, reply)] * count
+
+    def drop(self, count=1):
+        """Close the connection without answering the next `count` requests."""
+        with self._lock:
+            self._faults += ["drop"] * count
+
+    def next_fault(self):
+        with self._lock:
+            self.requests += 1
+            latency = self.latency() if callable(self.latency) else self.latency
+            return latency, (self._faults.pop(0) if self._faults else None)
+
+    # ----- the API -----
+
+    def push_update(self, text, chat_id=1):
+        """Queue an incoming message for getUpdates."""
+        with self._lock:
+            update_id = len(self._updates) + 1
+            self._updates.append({"update_id": update_id, "message": {
+                "message_id": update_id, "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"}, "text": text}})
+
+    def answer(self, token, method, fields, files):
+        if method == "getMe":
+            return {"ok": True, "result": {"id": 1, "is_bot": True, "username": "fake_bot"}}
+        if method == "getUpdates":
+            offset = int(fields.get("offset", 0))
+            with self._lock:
+                return {"ok": True, "result": [u for u in self._updates if u["update_id"] >= offset]}
+        if method not in ("sendMessage", "sendPhoto"):
+            return {"ok": False, "error_code": 404, "description": "Not Found"}
+        if "chat_id" not in fields:
+            return {"ok": False, "error_code": 400, "description": "Bad Request: chat_id is empty"}
+        photo = files.get("photo", (None, None))[1]
+        if method == "sendPhoto" and not photo:
+            return {"ok": False, "error_code": 400, "description": "Bad Request: there is no photo"}
+        if method == "sendMessage" and len(fields.get("text", "")) > 4096:
+            return {"ok": False, "error_code": 400, "description": "Bad Request: message is too long"}
+        with self._lock:
+            self._message_id += 1
+            self.received.append(Received(token, method, fields, photo))
+            return {"ok": True, "result": {"message_id": self._message_id,
+                                           "chat": {"id": fields["chat_id"]},
+                                           "date": int(time.time())}}
+
+    # ----- lifecycle -----
+
+    def process_request(self, request, client_address):
+        with self._lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, args=(0.05,),
+                                        name="fake-telegram", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    args = parser.parse_args()
+    server = FakeTelegram(args.port, latency=args.latency)
+    print(f"fake Telegram Bot API at {server.url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
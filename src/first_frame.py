@@ -0,0 +1,162 @@
+"""Reading the first frame of a video, with interchangeable backends.
+
+The monitor only ever wants frame one, yet `cv2.VideoCapture` sets up for playing
+the whole file: it probes the container, builds the demuxer's stream state and warms
+up the decoder before the first read. On a large AVI/MP4 on NFS that means fetching
+a lot more than the first keyframe.
+
+Backends:
+
+  opencv  cv2.VideoCapture, as it always was. Also the fallback for every other
+          backend, so a file the fast path cannot handle still gets a frame.
+  ffmpeg  streams the file into `ffmpeg` through a pipe, one chunk at a time, and
+          stops feeding it as soon as it has decoded one keyframe. Only the bytes
+          up to that frame are read. With `lowres`, codecs that support it (MJPEG,
+          MPEG-4 part 2) decode straight to 1/2, 1/4 or 1/8 resolution. A container
+          whose index sits at the end (an MP4 without faststart) cannot be read
+          from a pipe; that falls back to opencv.
+
+Monochrome cameras still come out of every backend as 3-channel BGR, three equal
+channels. With `grayscale` the frame is reduced to one channel right after the
+decode, so rotating, stamping, compositing, saving and encoding all handle a third
+of the bytes; the image looks the same.
+
+read_first_frame reports the backend that produced the frame, how long it took and
+how many bytes it read, so the backends can be compared on real files (see
+benchmarks/bench_first_frame.py).
+"""
+import shutil
+import subprocess
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from src.decode import Extraction
+
+BACKENDS = ("opencv", "ffmpeg")
+GRAYSCALE_MODES = ("auto", "always", "never")
+# How far apart (0-255) a pixel's channels may be for "auto" to call a frame grey:
+# a mono sensor's video decoded to BGR can carry a little chroma noise.
+GREY_TOLERANCE = 2
+FFMPEG_CHUNK_BYTES = 256 * 1024
+
+
+def extract_first_frame(video_path):
+    """Extracts the first frame from the given video file."""
+    cap = cv2.VideoCapture(video_path)
+    success, image = cap.read()
+    cap.release()
+    return image if success else None
+
+
+def thread_bytes_read():
+    """Bytes this thread has read via read(2) so far (Linux `rchar`), or None.
+
+    Per thread rather than per process, so the other monitor threads' reads do not
+    count. VideoCapture reads the file in the calling thread.
+    """
+    try:
+        with open("/proc/thread-self/io") as f:
+            for line in f:
+                if line.startswith("rchar:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _opencv(video_path):
+    before = thread_bytes_read()
+    frame = extract_first_frame(video_path)
+    after = thread_bytes_read()
+    read = after - before if before is not None and after is not None else None
+    return frame, read
+
+
+def _ffmpeg(video_path, lowres=0):
+    """First keyframe via an ffmpeg child fed through a pipe. Returns (frame, bytes
+    handed to ffmpeg); the frame is None when ffmpeg is missing or cannot decode."""
+    binary = shutil.which("ffmpeg")
+    if binary is None:
+        return None, 0
+    cmd = [binary, "-hide_banner", "-loglevel", "error", "-skip_frame", "nokey"]
+    if lowres:
+        cmd += ["-lowres", str(lowres)]
+    cmd += ["-i", "pipe:0", "-frames:v", "1", "-pix_fmt", "bgr24",
+            "-f", "image2pipe", "-c:v", "bmp", "pipe:1"]
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL)
+    fed = [0]
+
+    def feed():
+        # Runs until ffmpeg has its frame and exits, which breaks the pipe.
+        try:
+            with open(video_path, "rb") as f:
+                while True:
+                    chunk = f.read(FFMPEG_CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    proc.stdin.write(chunk)
+                    fed[0] += len(chunk)
+        except OSError:
+            pass
+        finally:
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+
+    feeder = threading.Thread(target=feed, name="ffmpeg-feed", daemon=True)
+    feeder.start()
+    out = proc.stdout.read()
+    proc.wait()
+    feeder.join()
+    if proc.returncode != 0 or not out:
+        return None, fed[0]
+    frame = cv2.imdecode(np.frombuffer(out, np.uint8), cv2.IMREAD_COLOR)
+    return frame, fed[0]
+
+
+def _channels_close(frame):
+    b, g, r = cv2.split(frame)
+    return (cv2.norm(b, g, cv2.NORM_INF) <= GREY_TOLERANCE
+            and cv2.norm(b, r, cv2.NORM_INF) <= GREY_TOLERANCE)
+
+
+def is_grey(frame):
+    """Whether a BGR frame's three channels carry the same picture. A colour frame
+    is usually told apart on a sparse sample, before the full check."""
+    return _channels_close(np.ascontiguousarray(frame[::16, ::16])) and _channels_close(frame)
+
+
+def to_grayscale(frame, mode="auto"):
+    """`frame` as a single-channel image if `mode` says so: "always", or "auto" and
+    the frame is grey. Anything else, including None, is returned as it is."""
+    if frame is None or frame.ndim != 3 or frame.shape[2] != 3 or mode == "never":
+        return frame
+    if mode == "always" or is_grey(frame):
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return frame
+
+
+def read_first_frame(video_path, backend="opencv", lowres=0, grayscale="never"):
+    """First frame of `video_path` via `backend`, falling back to opencv. Returns
+    an Extraction; its `backend` reads e.g. "ffmpeg->opencv" after a fallback.
+    `grayscale` is one of GRAYSCALE_MODES (see to_grayscale)."""
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown first-frame backend {backend!r}")
+    if grayscale not in GRAYSCALE_MODES:
+        raise ValueError(f"unknown grayscale mode {grayscale!r}")
+    t0 = time.monotonic()
+    label = backend
+    frame, read = (None, None)
+    if backend == "ffmpeg":
+        frame, read = _ffmpeg(video_path, lowres=lowres)
+        if frame is None:
+            label = "ffmpeg->opencv"
+    if frame is None:
+        frame, opencv_read = _opencv(video_path)
+        read = opencv_read if read is None or opencv_read is None else read + opencv_read
+    return Extraction(to_grayscale(frame, grayscale), label, time.monotonic() - t0, read)
@@ -0,0 +1,138 @@
+"""Decoded first frames, shared by every monitor config in the process.
+
+An overview monitor and a per-hive monitor often include the same camera, and each
+decoded that camera's newest video for itself. FrameCache keeps decoded frames by
+the video's (path, size, mtime) — a video still being written changes size and
+mtime, so it is never served stale — and by the decode options, since a config
+that reads at lower resolution or in grey gets a different frame.
+
+The cache is a least-recently-used list capped at `max_bytes` of pixels. When two
+configs ask for the same frame at once, the second waits for the first one's
+decode instead of starting its own. Cached frames are made read-only, as several
+configs hold them; the monitor draws only on tiles made from them.
+"""
+import collections
+import threading
+from concurrent.futures import Future
+
+from src.decode import Extraction
+from src.tiles import file_stamp
+
+DEFAULT_CACHE_MB = 256
+# What frame_cache_mb = None means: off, until share_by_default() is called.
+_default_mb = 0
+
+
+class FrameCache:
+    """LRU cache of decoded frames with single-flight loading."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = collections.OrderedDict()     # key -> (Extraction, nbytes)
+        self._loading = {}                             # key -> Future of the decode
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0          # requests that shared another's in-flight decode
+        self.evictions = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key, load):
+        """The cached Extraction for `key`, or `load()`'s, cached if it has a frame.
+        One served from the cache or another's decode says backend "cache" and no
+        bytes read."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _served(entry[0])
+            pending = self._loading.get(key)
+            if pending is None:
+                pending = self._loading[key] = Future()
+                self.misses += 1
+                leader = True
+            else:
+                self.waits += 1
+                leader = False
+        if not leader:
+            return _served(pending.result())
+
+        try:
+            result = load()
+        except BaseException as e:
+            with self._lock:
+                del self._loading[key]
+            pending.set_exception(e)
+            raise
+        if not isinstance(result, Extraction):
+            result = Extraction(result, None, 0.0)
+        with self._lock:
+            del self._loading[key]
+            if result.frame is not None:
+                self._store(key, result)
+        pending.set_result(result)
+        return result
+
+    def _store(self, key, result):
+        nbytes = result.frame.nbytes
+        if nbytes > self.max_bytes:
+            return
+        result.frame.flags.writeable = False
+        self._entries[key] = (result, nbytes)
+        self.nbytes += nbytes
+        while self.nbytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.nbytes -= evicted
+            self.evictions += 1
+
+    def wrap(self, extract, variant=()):
+        """`extract(path)` served from the cache. `variant` is what else the frame
+        depends on (the decode options), so differently read frames do not mix."""
+        def cached(path):
+            stamp = file_stamp(path)
+            if stamp is None:
+                return extract(path)
+            return self.get((stamp, variant), lambda: extract(path))
+        return cached
+
+    def report(self):
+        """e.g. `frame cache 12 hits, 3 misses, 2 shared, 1 evicted, 96/256MB`."""
+        with self._lock:
+            return (f"frame cache {self.hits} hits, {self.misses} misses, {self.waits} shared, "
+                    f"{self.evictions} evicted, {self.nbytes / 2**20:.0f}/{self.max_bytes / 2**20:.0f}MB")
+
+
+def _served(result):
+    return result._replace(backend="cache", bytes_read=0)
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def share_by_default(megabytes=DEFAULT_CACHE_MB):
+    """Cache frames for configs that leave frame_cache_mb at None. bb_monitor_multi
+    calls this in a worker process whose configs include the same camera."""
+    global _default_mb
+    _default_mb = megabytes
+
+
+def shared(config):
+    """The process-wide FrameCache, sized by the first caller's `frame_cache_mb`;
+    None for a config whose frame_cache_mb is 0 (no caching), whatever the other
+    configs in the process chose."""
+    global _shared
+    megabytes = getattr(config, "frame_cache_mb", None)
+    if megabytes is None:
+        megabytes = _default_mb
+    if not megabytes:
+        return None
+    with _shared_lock:
+        if _shared is None:
+            _shared = FrameCache(int(megabytes * 2**20))
+        return _shared
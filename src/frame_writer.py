@@ -0,0 +1,144 @@
+"""Writing save_images frames on background threads.
+
+The loop used to cv2.imwrite each camera's full-resolution first frame as a PNG
+itself, after an os.path.exists and makedirs per frame. Encoding a 12 MP PNG takes
+seconds of CPU, and every camera's took its turn on the loop's thread.
+
+FrameWriter takes the frame and returns at once. A few threads encode and write
+from a bounded queue: when it is full the oldest frame waiting is dropped, rather
+than holding up the tick that produced the new one. The format and compression
+are those of src/encode.py. Each output directory is created once, and a frame is
+written under a temporary name and renamed, so nothing reads half a file.
+
+A frame whose pixels are identical to the last one saved for the same camera (a
+camera re-sending a frozen picture under a new file name) is not written again:
+a hash of the raw pixels costs far less than the encode it saves.
+"""
+import collections
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+from src.encode import IMAGE_FORMATS, encode_image
+
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE_SIZE = 8
+
+
+class _Job:
+    __slots__ = ("slot", "directory", "stem", "image")
+
+    def __init__(self, slot, directory, stem, image):
+        self.slot = slot
+        self.directory = directory
+        self.stem = stem
+        self.image = image
+
+
+def frame_hash(image):
+    """A digest of the frame's shape and pixels."""
+    digest = hashlib.blake2b(repr((image.shape, image.dtype.str)).encode(), digest_size=16)
+    digest.update(memoryview(np.ascontiguousarray(image)).cast("B"))
+    return digest.digest()
+
+
+class FrameWriter:
+    """Saves frames as `<directory>/<stem><extension>` on `workers` threads.
+
+    Frames of one camera slot are written one at a time, in the order given; slots
+    are written in parallel.
+    """
+
+    def __init__(self, image_format="png", quality=None, workers=DEFAULT_WORKERS,
+                 queue_size=DEFAULT_QUEUE_SIZE, label="frames"):
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"unknown image format {image_format!r}")
+        self.image_format = image_format
+        self.quality = quality
+        self.queue_size = queue_size
+        self.label = label
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._busy_slots = set()        # slots a thread is writing right now
+        self._made_dirs = set()
+        self._last_hash = {}            # slot -> hash of the last frame written
+        self.written = 0
+        self.duplicates = 0
+        self.dropped = 0
+        self.failed = 0
+        self._threads = [threading.Thread(target=self._run, name=f"frame-writer-{i}", daemon=True)
+                         for i in range(max(1, workers))]
+        for thread in self._threads:
+            thread.start()
+
+    def save(self, slot, directory, stem, image):
+        """Queue `image` to be saved for camera `slot`. Returns at once."""
+        with self._cond:
+            if len(self._queue) >= self.queue_size:
+                oldest = self._queue.popleft()
+                self.dropped += 1
+                print(f"[{self.label}] writer behind; dropped {oldest.slot}/{oldest.stem}", flush=True)
+            self._queue.append(_Job(slot, directory, stem, image))
+            self._cond.notify_all()
+
+    @property
+    def pending(self):
+        """Frames queued or being written."""
+        with self._cond:
+            return len(self._queue) + len(self._busy_slots)
+
+    def flush(self, timeout=None):
+        """Wait until every frame queued so far is written (or failed). Returns False
+        if `timeout` ran out first."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._queue and not self._busy_slots, timeout)
+
+    # ----- the writing threads -----
+
+    def _next_job(self):
+        """The oldest queued job of a slot no other thread is writing, or None."""
+        for i, job in enumerate(self._queue):
+            if job.slot not in self._busy_slots:
+                del self._queue[i]
+                return job
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while (job := self._next_job()) is None:
+                    self._cond.wait()
+                self._busy_slots.add(job.slot)
+            outcome = "failed"
+            try:
+                outcome = self._write(job)
+            except Exception as e:
+                print(f"[{self.label}] could not save {job.slot}/{job.stem}: {e}", flush=True)
+            finally:
+                with self._cond:
+                    setattr(self, outcome, getattr(self, outcome) + 1)
+                    self._busy_slots.discard(job.slot)
+                    self._cond.notify_all()
+
+    def _write(self, job):
+        """Returns the counter the job adds to: "written" or "duplicates"."""
+        digest = frame_hash(job.image)
+        if self._last_hash.get(job.slot) == digest:
+            return "duplicates"
+        data, extension, _ = encode_image(job.image, self.image_format, self.quality)
+        if job.directory not in self._made_dirs:
+            os.makedirs(job.directory, exist_ok=True)
+            self._made_dirs.add(job.directory)
+        path = os.path.join(job.directory, job.stem + extension)
+        tmp = path + ".tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(data)
+        except FileNotFoundError:       # the directory was removed since
+            self._made_dirs.discard(job.directory)
+            raise
+        os.replace(tmp, path)
+        self._last_hash[job.slot] = digest
+        return "written"
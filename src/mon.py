@@ -2,11 +2,10 @@ import importlib
 import importlib.util
 import os
 import sys
-import tempfile
 from datetime import datetime
 
-import cv2
-import requests
+from src import notifier, sinks, telegram
+from src.encode import AdaptiveEncoder, encode_image
 
 
 def load_config_from_path(path):
@@ -33,36 +32,107 @@ def get_config(default_module="default_config", user_module="user_config"):
 
 
 def process_image_and_send(config, image):
-    temp_dir = tempfile.mkdtemp()
-    temp_image_path = os.path.join(
-        temp_dir,
-        config.monitor_bot_name + datetime.now().strftime("%Y-%m-%d %H:%M:%S") + '.png',
-    )
-    cv2.imwrite(temp_image_path, image)
+    """Encode `image` and send it as a photo; wait for the send. Returns whether it
+    went out."""
+    return process_image_and_send_async(config, image).result()
 
-    response = send_photo(config, temp_image_path)
 
-    os.remove(temp_image_path)
-    os.rmdir(temp_dir)
-    return response
+def process_image_and_send_async(config, image):
+    """Encode `image` in memory (image_format / image_quality in the config, or
+    within image_budget) and hand it to every sink of the config at once. Returns
+    a Future for whether all of them took it.
+
+    The image is encoded before this returns, so the caller may reuse its array. A
+    composite from the same config still waiting for Telegram is replaced by this one.
+    """
+    budget = image_budget(config)
+    if budget is None:
+        data, extension, mime = encode_image(
+            image, getattr(config, "image_format", "png"), getattr(config, "image_quality", None),
+        )
+    else:
+        data, extension, mime = _adaptive_encoder(config).encode(image, budget)
+    filename = config.monitor_bot_name + datetime.now().strftime("%Y-%m-%d %H:%M:%S") + extension
+    return sinks.fan_out(config, lambda sink: sink.image(config, data, filename, mime))
+
+
+# Smallest budget image_upload_seconds may lower image_max_bytes to, so one slow
+# upload cannot shrink the composite to nothing.
+MIN_IMAGE_BYTES = 20_000
+
+
+def image_budget(config):
+    """Most bytes one composite may take, or None to encode as configured.
+
+    image_max_bytes caps it. With image_upload_seconds, the budget also follows the
+    measured upload throughput so that an upload takes about that long; because
+    the throughput includes each request's round trip, this settles at what fits
+    in image_upload_seconds in total.
+    """
+    budget = getattr(config, "image_max_bytes", None)
+    seconds = getattr(config, "image_upload_seconds", None)
+    if seconds:
+        throughput = telegram.upload_throughput(getattr(config, "telegram_api_url", telegram.API_URL))
+        if throughput is not None:
+            fitted = max(MIN_IMAGE_BYTES, int(throughput * seconds))
+            budget = fitted if budget is None else min(budget, fitted)
+    return budget
+
+
+# One AdaptiveEncoder per config, remembering the quality and scale that fit.
+_adaptive_encoders = {}
+
+
+def _adaptive_encoder(config):
+    encoder = _adaptive_encoders.get(id(config))
+    if encoder is None:
+        encoder = _adaptive_encoders.setdefault(
+            id(config), AdaptiveEncoder(getattr(config, "image_format", "jpeg")))
+    return encoder
 
 
 def send_message(config, message):
-    send_url = f'https://api.telegram.org/bot{config.telegram_bot_token}/sendMessage'
-    data = {'chat_id': config.telegram_chat_id, 'text': config.monitor_bot_name + ':  ' + message}
-    response = requests.post(send_url, data=data).json()
-    if not response['ok']:
+    """Send `message`, split into several if it is too long; wait for the send."""
+    ok = send_message_async(config, message).result()
+    if not ok:
         print("Message not sent")
-    return response['ok']
+    return ok
+
+
+def send_message_async(config, message):
+    """Hand `message` to every sink of the config at once (Telegram prefixes it
+    with the bot name and splits it at its length limit). Returns a Future for
+    whether every sink took it."""
+    return sinks.fan_out(config, lambda sink: sink.message(config, message))
+
+
+def connect(config):
+    """Open the connection to Telegram that the config's sends will use, if it has a
+    Telegram sink, so that importing the HTTP stack and the TCP and TLS handshakes
+    happen before the first send instead of during it."""
+    if any(isinstance(sink, sinks.TelegramSink) for sink in sinks.sinks_for(config)):
+        telegram.connect(config)
 
 
-def send_photo(config, file, caption=""):
+def wait_for_sends(timeout=None):
+    """Wait until every queued send has gone out (or failed), e.g. before exiting.
+    Returns False if `timeout` ran out first."""
+    sinks.wait(timeout)
+    return notifier.shared().flush(timeout)
+
+
+def send_photo(config, file, caption="", filename=None, mime=None):
+    """Send a photo: `file` is a path, or the encoded image itself as bytes."""
     params = {'chat_id': config.telegram_chat_id, 'caption': caption}
+    if isinstance(file, (bytes, bytearray, memoryview)):
+        return _post_photo(config, params, (filename or "photo", file, mime))
     try:
         file_opened = open(file, 'rb')
-    except:
+    except OSError:
         return None
-    files = {'photo': file_opened}
-    send_url = f'https://api.telegram.org/bot{config.telegram_bot_token}/sendPhoto'
-    response = requests.post(send_url, params, files=files)
-    return response.json()
+    with file_opened:
+        return _post_photo(config, params, file_opened)
+
+
+def _post_photo(config, params, photo):
+    return telegram.call(config, 'sendPhoto', data=params, files={'photo': photo})
@@ -0,0 +1,297 @@
+"""Telegram sends on a background thread, so a slow API never delays a tick.
+
+Until now every composite and every system-check message was posted from the loop
+that produced it: a Telegram API taking 20 s to answer pushed the monitor's next
+tick 20 s later, and with it every tick after.
+
+The Notifier takes a send — a list of ApiCalls, e.g. the pieces of a long
+message — and returns a Future at once. One thread works through a bounded queue
+in order:
+
+  - a composite still waiting in the queue when a newer one from the same monitor
+    arrives is replaced by it (its Future resolves False): the newer image is the
+    one worth sending;
+  - a 429 reply is retried after the `retry_after` Telegram asks for;
+  - when the queue is full the oldest send is dropped, rather than blocking the
+    loop that produced the new one.
+
+The Future resolves True once every call of the send was answered `ok`, so a
+caller that needs a confirmed send (the system check's recovery message) waits on
+it, and the others do not.
+
+With a Spool (src/spool.py), a send that cannot reach Telegram at all is not lost:
+its calls are appended to the spool, its Future resolves False, and the thread
+retries the oldest spooled call with exponential back-off until the uplink is back,
+then delivers the backlog in order. While there is a backlog, new sends go to the
+end of the spool without a network attempt, so they keep their order and no caller
+waits out a connection timeout during an outage. A message identical to the one
+spooled just before it is not stored again. Only a call that never connected is
+spooled (telegram.unreached): one that timed out waiting for the reply, or got a
+reply that is not JSON, may have been delivered, and fails instead.
+"""
+import collections
+import threading
+import time
+from concurrent.futures import Future
+
+from src import telegram
+from src.spool import Spool, SpoolBusy
+from src.telegram import ApiCall, retry_after
+
+DEFAULT_QUEUE_SIZE = 64
+# How often one call may be retried after a 429 before it counts as failed.
+DEFAULT_RATE_LIMIT_RETRIES = 5
+# Back-off between attempts to deliver the spool while the uplink is down.
+DEFAULT_BACKOFF_SECONDS = 5
+DEFAULT_MAX_BACKOFF_SECONDS = 600
+
+
+class _Send:
+    __slots__ = ("calls", "future", "label", "coalesce_key")
+
+    def __init__(self, calls, label, coalesce_key):
+        self.calls = calls
+        self.future = Future()
+        self.label = label
+        self.coalesce_key = coalesce_key
+
+
+class Notifier:
+    """Sends queued ApiCalls in order on one background thread, spooling what cannot
+    be delivered when `spool` is given."""
+
+    def __init__(self, queue_size=DEFAULT_QUEUE_SIZE,
+                 rate_limit_retries=DEFAULT_RATE_LIMIT_RETRIES, spool=None,
+                 backoff_seconds=DEFAULT_BACKOFF_SECONDS,
+                 max_backoff_seconds=DEFAULT_MAX_BACKOFF_SECONDS,
+                 perform=telegram.perform, sleep=time.sleep, clock=time.monotonic):
+        self.queue_size = queue_size
+        self.rate_limit_retries = rate_limit_retries
+        self.spool = spool
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self._perform = perform
+        self._sleep = sleep
+        self._clock = clock
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._busy = False
+        self._thread = None
+        self._backoff = backoff_seconds
+        self._next_attempt = clock()
+        self._last_spooled = None       # (method, data) of the newest spooled message
+        self.sent = 0
+        self.failed = 0
+        self.replaced = 0
+        self.dropped = 0
+        self.spooled = 0
+        if spool is not None and len(spool):
+            print(f"[notifier] {len(spool)} spooled sends from before the restart", flush=True)
+            self._ensure_thread()
+
+    def submit(self, calls, label="", coalesce_key=None):
+        """Queue `calls` (ApiCalls). Returns a Future for whether all went out.
+
+        A queued send with the same `coalesce_key` is replaced by this one.
+        """
+        send = _Send(list(calls), label, coalesce_key)
+        with self._cond:
+            if coalesce_key is not None:
+                for i, queued in enumerate(self._queue):
+                    if queued.coalesce_key == coalesce_key:
+                        self._queue[i] = send
+                        self.replaced += 1
+                        queued.future.set_result(False)
+                        break
+                else:
+                    self._enqueue(send)
+            else:
+                self._enqueue(send)
+            self._ensure_thread()
+            self._cond.notify_all()
+        return send.future
+
+    def _enqueue(self, send):
+        if len(self._queue) >= self.queue_size:
+            oldest = self._queue.popleft()
+            self.dropped += 1
+            print(f"[notifier] queue full; dropped {oldest.label or 'a send'}", flush=True)
+            oldest.future.set_result(False)
+        self._queue.append(send)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="notifier", daemon=True)
+            self._thread.start()
+
+    @property
+    def pending(self):
+        """Sends queued or in flight (not counting the spool)."""
+        with self._cond:
+            return len(self._queue) + self._busy
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far has been sent, spooled or has failed.
+        Returns False if `timeout` ran out first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._queue or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    # ----- the sending thread -----
+
+    def _backlog(self):
+        return self.spool is not None and len(self.spool) > 0
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    if self._backlog():
+                        wait = self._next_attempt - self._clock()
+                        if wait <= 0:
+                            break
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+                send = self._queue.popleft() if self._queue else None
+                self._busy = True
+            try:
+                if send is not None:
+                    self._send(send)
+                else:
+                    self._drain_one()
+            except Exception as e:      # e.g. the spool's disk is full
+                print(f"[notifier] {e}", flush=True)
+                self._backed_off()
+                if send is not None and not send.future.done():
+                    send.future.set_exception(e)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _send(self, send):
+        if self._backlog():
+            self._spool(send.calls, send.label)
+            send.future.set_result(False)
+            return
+        ok = True
+        for i, call in enumerate(send.calls):
+            try:
+                reply = self._call(call, send.label)
+            except Exception as e:
+                if self.spool is not None and telegram.unreached(e):
+                    print(f"[notifier] {send.label or 'send'}: {e}; spooled until "
+                          f"Telegram can be reached", flush=True)
+                    self._spool(send.calls[i:], send.label)
+                    self._backed_off()
+                    send.future.set_result(False)
+                else:
+                    self.failed += 1
+                    print(f"[notifier] {send.label or 'send'} failed: {e}", flush=True)
+                    send.future.set_exception(e)
+                return
+            ok = ok and _ok(reply)
+        if ok:
+            self.sent += 1
+        else:
+            self.failed += 1
+        send.future.set_result(ok)
+
+    def _call(self, call, label):
+        for _ in range(self.rate_limit_retries + 1):
+            reply = self._perform(call)
+            wait = retry_after(reply)
+            if wait is None:
+                break
+            print(f"[notifier] rate limited; retrying {label or 'send'} in {wait}s", flush=True)
+            self._sleep(wait)
+        return reply
+
+    def _spool(self, calls, label):
+        for call in calls:
+            if call.photo is None and self._backlog() and self._last_spooled == (call.method, call.data):
+                # e.g. the recovery message the system check retries every tick
+                continue
+            self._last_spooled = (call.method, call.data) if call.photo is None else None
+            photo = None
+            if call.photo is not None:
+                filename, data, mime = call.photo
+                photo = [filename, mime]
+            self.spool.append({"label": label, "settings": call.settings, "method": call.method,
+                               "data": call.data, "photo": photo},
+                              data if call.photo is not None else None)
+            self.spooled += 1
+
+    def _drain_one(self):
+        entry = self.spool.oldest()
+        if entry is None:
+            return
+        seq, meta, payload = entry
+        photo = (meta["photo"][0], payload, meta["photo"][1]) if meta.get("photo") else None
+        call = ApiCall(meta["settings"], meta["method"], meta["data"], photo)
+        try:
+            reply = self._call(call, meta.get("label"))
+        except Exception as e:
+            if telegram.unreached(e):
+                self._backed_off()
+                return
+            # It may have been delivered: not tried again.
+            self.spool.remove(seq)
+            self.failed += 1
+            print(f"[notifier] spooled {meta.get('label') or 'send'} failed: {e}", flush=True)
+            return
+        self.spool.remove(seq)
+        self._backoff = self.backoff_seconds
+        if _ok(reply):
+            self.sent += 1
+            if not self._backlog():
+                print("[notifier] spool delivered", flush=True)
+        else:
+            self.failed += 1
+            print(f"[notifier] spooled {meta.get('label') or 'send'} rejected: "
+                  f"{reply.get('description') if isinstance(reply, dict) else reply}", flush=True)
+
+    def _backed_off(self):
+        self._next_attempt = self._clock() + self._backoff
+        self._backoff = min(self._backoff * 2, self.max_backoff_seconds)
+
+
+def _ok(reply):
+    return bool(isinstance(reply, dict) and reply.get("ok"))
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def shared(config=None):
+    """The process-wide Notifier, shared by every monitor and the system check.
+
+    The first caller's `config` chooses the spool (notify_spool_dir and friends);
+    without one, or when another process holds that directory, sends that cannot
+    reach Telegram fail instead of being spooled.
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = Notifier(spool=_open_spool(config))
+        return _shared
+
+
+def _open_spool(config):
+    directory = getattr(config, "notify_spool_dir", None)
+    if not directory:
+        return None
+    try:
+        return Spool(directory,
+                     max_bytes=getattr(config, "notify_spool_max_mb", 200) * 1024 * 1024,
+                     max_age_seconds=getattr(config, "notify_spool_max_age_hours", 24) * 3600)
+    except (SpoolBusy, OSError) as e:
+        print(f"[notifier] not spooling: {e}", flush=True)
+        return None
@@ -0,0 +1,171 @@
+"""A drift-free tick schedule for the image loop, aligned to the wall clock.
+
+wait_and_get_images used to sleep for `interval - (now - start)` measured with
+datetime.now(). Every tick's rounding and every NTP step landed in the schedule and
+stayed there, so the ticks wandered away from the minute, and the message bot's
+every-Nth-tick counter started from whenever the process happened to start.
+
+Ticker keeps the schedule on time.monotonic, which never steps, and anchors it to
+the wall clock the way the system check snaps to its minute: tick `i` of a day is
+due at local midnight + i * interval. Sleeping towards a monotonic deadline leaves
+no error to accumulate. If the wall clock is found to disagree with the schedule
+by more than `resync_seconds` (an NTP step, a suspend) or the day rolls over, the
+schedule is re-anchored to the wall clock.
+
+A tick that runs past the next tick's due time is an overrun. With policy "skip"
+the next tick starts at once and the ticks it missed are dropped; with "catch_up"
+every missed tick runs, back to back. Each Tick says how late it started, and the
+Ticker how long the previous tick ran.
+"""
+import time
+from datetime import datetime
+from typing import NamedTuple
+
+POLICIES = ("skip", "catch_up")
+
+
+class Tick(NamedTuple):
+    """One run of the loop. `index` counts intervals since local midnight, so
+    `index % n == 0` picks every n-th tick at the same times every day. `due` is
+    the wall-clock time (epoch seconds) it was due, `lag` how many seconds late it
+    started, and `skipped` how many due ticks were dropped just before it."""
+    index: int
+    due: float
+    lag: float
+    skipped: int = 0
+
+    def every(self, n):
+        """Whether this is an n-th tick, or runs in place of one that was skipped:
+        what only every n-th tick does is then done late rather than not at all. A
+        run of skipped ticks back past midnight includes the day's tick 0."""
+        return self.index % n <= self.skipped
+
+
+def local_midnight(wall_seconds):
+    """Epoch seconds of the local midnight that starts the day of `wall_seconds`."""
+    day = datetime.fromtimestamp(wall_seconds).replace(hour=0, minute=0, second=0, microsecond=0)
+    return day.timestamp()
+
+
+class Ticker:
+    """Iterate to wait for each tick: `for tick in Ticker(60): ...`, or poll() it.
+
+    With `run_first_now` the first tick runs at once (as the tick of the interval
+    the process starts in, with no lag) rather than waiting for the next boundary.
+    """
+
+    def __init__(self, interval_seconds, policy="skip", run_first_now=True, resync_seconds=2.0,
+                 clock=time.monotonic, wall=time.time, sleep=time.sleep, midnight=local_midnight):
+        if interval_seconds <= 0:
+            raise ValueError("interval must be positive")
+        if policy not in POLICIES:
+            raise ValueError(f"unknown overrun policy {policy!r}; expected one of {POLICIES}")
+        self.interval = float(interval_seconds)
+        self.policy = policy
+        self.resync_seconds = resync_seconds
+        self._clock, self._wall, self._sleep, self._midnight = clock, wall, sleep, midnight
+        self._first = run_first_now
+        self._next = None           # (index, due wall, due monotonic, day end wall)
+        self._started = None        # monotonic start of the current tick
+        self._last_due = None       # wall due time of the current tick
+        self._skipped = 0
+        self.last_duration = None
+        self.resyncs = 0
+
+    def _anchor(self):
+        """Re-read the wall clock: the boundary it last passed, unless that tick has
+        already run, in which case the next one."""
+        wall, mono = self._wall(), self._clock()
+        midnight = self._midnight(wall)
+        index = int((wall - midnight) // self.interval)
+        due = midnight + index * self.interval
+        current = (index, due, mono + (due - wall), self._next_midnight(midnight))
+        if due == self._last_due:
+            current = self._advance(current)
+        return current
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self.done()
+        while (tick := self.poll()) is None:
+            self._sleep(max(0.0, self.next_due - self._clock()))
+        return tick
+
+    def done(self):
+        """Note that the current tick has finished, for `last_duration`. Iterating
+        does this itself; a caller that polls does it when the tick's work is done."""
+        if self._started is not None:
+            self.last_duration = self._clock() - self._started
+            self._started = None
+
+    @property
+    def next_due(self):
+        """Monotonic time the next tick is due (now, before the first)."""
+        if self._first or self._next is None:
+            return self._clock()
+        return self._next[2]
+
+    def poll(self):
+        """The next Tick if it is due, else None. Never sleeps: for a scheduler that
+        waits on several Tickers at once (see bb_monitor_multi.py)."""
+        if self._first:
+            self._first = False
+            index, due, due_mono, day_end = self._anchor()
+            self._next = self._advance((index, due, due_mono, day_end))
+            self._started, self._last_due = self._clock(), due
+            return Tick(index, self._wall(), 0.0)
+        if self._next is None:
+            self._next = self._advance(self._anchor())
+
+        if self._stepped(self._next):
+            self._resync()
+        if self.policy == "skip":
+            self._skip_missed()
+        if self._next[2] > self._clock():
+            return None
+
+        index, due, due_mono, day_end = self._next
+        self._started, self._last_due = self._clock(), due
+        self._next = self._advance(self._next)
+        skipped, self._skipped = self._skipped, 0
+        return Tick(index, due, max(0.0, self._started - due_mono), skipped)
+
+    def _stepped(self, upcoming):
+        """Whether the wall clock disagrees with the monotonic schedule: it should
+        read `due` exactly when the monotonic clock reads the due time."""
+        _, due, due_mono, _ = upcoming
+        return abs((self._wall() - due) - (self._clock() - due_mono)) > self.resync_seconds
+
+    def _resync(self):
+        self.resyncs += 1
+        self._next = self._anchor()
+
+    def _skip_missed(self):
+        """Move past every tick that is a whole interval overdue, counting them."""
+        index, due, due_mono, day_end = self._next
+        while self._clock() - due_mono >= self.interval:
+            index, due, due_mono, day_end = self._advance((index, due, due_mono, day_end))
+            self._skipped += 1      # reported with the next tick that runs
+        self._next = index, due, due_mono, day_end
+
+    def _next_midnight(self, midnight):
+        return self._midnight(midnight + 36 * 3600)     # a 23 or 25 hour day too
+
+    def _advance(self, current):
+        """The tick after `current`: the next boundary, or tick 0 of the next day."""
+        index, due, due_mono, day_end = current
+        if due + self.interval >= day_end:
+            return 0, day_end, due_mono + (day_end - due), self._next_midnight(day_end)
+        return index + 1, due + self.interval, due_mono + self.interval, day_end
+
+
+def tick_report(tick, duration):
+    """e.g. `tick 12:05:00 started 0.02s late, took 1.31s (2 skipped)`."""
+    text = f"tick {datetime.fromtimestamp(tick.due):%H:%M:%S} started {tick.lag:.2f}s late"
+    if duration is not None:
+        text += f", took {duration:.2f}s"
+    if tick.skipped:
+        text += f" ({tick.skipped} skipped)"
+    return text
@@ -0,0 +1,304 @@
+"""Where composites and messages go: Telegram, a directory, a webhook, e-mail.
+
+A config lists its sinks, Telegram alone by default:
+
+    sinks = [
+        "telegram",
+        {"type": "directory", "path": "/var/www/hive1"},
+        {"type": "webhook", "url": "http://alerts.lan/hook"},
+        {"type": "smtp", "host": "localhost", "to": ["bees@example.org"]},
+    ]
+
+A composite is encoded once, and the same bytes are handed to every sink at the
+same time, so the slowest sink sets the latency rather than the sum of all of them.
+Each sink's send returns a Future; fan_out combines them into one that is True
+only when every sink confirmed. A sink that fails is reported by name and does not
+hold up or fail the others' deliveries.
+
+Telegram goes through the notifier (src/notifier.py) for its queue, coalescing and
+spool; the other sinks run on a small shared thread pool.
+"""
+import json
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+
+from src import notifier, telegram
+
+FAN_OUT_WORKERS = 8
+DEFAULT_TIMEOUT_SECONDS = 30
+
+
+class Sink:
+    """One destination. message() and image() return a Future for whether the
+    sink accepted the message or image."""
+
+    name = "sink"
+
+    def message(self, config, text):
+        raise NotImplementedError
+
+    def image(self, config, data, filename, mime):
+        raise NotImplementedError
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_outstanding = set()        # Futures of sends not yet done, for wait()
+
+
+def _run(deliver, *args):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=FAN_OUT_WORKERS, thread_name_prefix="sink")
+        future = _pool.submit(deliver, *args)
+        _outstanding.add(future)
+    future.add_done_callback(_forget)
+    return future
+
+
+def _forget(future):
+    with _pool_lock:
+        _outstanding.discard(future)
+
+
+class ThreadedSink(Sink):
+    """A sink whose deliveries are blocking calls, run on the fan-out pool."""
+
+    def message(self, config, text):
+        return _run(self.deliver_message, config, text)
+
+    def image(self, config, data, filename, mime):
+        return _run(self.deliver_image, config, data, filename, mime)
+
+    def deliver_message(self, config, text):
+        raise NotImplementedError
+
+    def deliver_image(self, config, data, filename, mime):
+        raise NotImplementedError
+
+
+class TelegramSink(Sink):
+    """The config's Telegram chat, through the shared notifier."""
+
+    name = "telegram"
+
+    def message(self, config, text):
+        prefix = config.monitor_bot_name + ':  '
+        settings = telegram.settings(config)
+        calls = [
+            telegram.ApiCall(settings, 'sendMessage',
+                             {'chat_id': config.telegram_chat_id, 'text': prefix + part})
+            for part in telegram.split_text(text, telegram.MESSAGE_LIMIT - len(prefix))
+        ]
+        return notifier.shared(config).submit(calls, label=f"{config.monitor_bot_name} message")
+
+    def image(self, config, data, filename, mime):
+        params = {'chat_id': config.telegram_chat_id, 'caption': ""}
+        return notifier.shared(config).submit(
+            [telegram.ApiCall(telegram.settings(config), 'sendPhoto', params, (filename, data, mime))],
+            label=f"{config.monitor_bot_name} image", coalesce_key=("image", id(config)),
+        )
+
+
+def _safe(name):
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+
+
+class DirectorySink(ThreadedSink):
+    """Writes `<monitor>-latest.<ext>` into `path`, replaced atomically so a web
+    server never serves half an image, and appends messages to
+    `<monitor>-messages.log`. With `history`, every image is also kept under its
+    own timestamped name."""
+
+    name = "directory"
+
+    def __init__(self, path, history=False):
+        self.path = os.path.expanduser(path)
+        self.history = history
+        os.makedirs(self.path, exist_ok=True)
+
+    def deliver_message(self, config, text):
+        line = f"{datetime.now():%Y-%m-%d %H:%M:%S}  {text}\n"
+        with open(os.path.join(self.path, _safe(config.monitor_bot_name) + "-messages.log"), "a") as f:
+            f.write(line)
+        return True
+
+    def deliver_image(self, config, data, filename, mime):
+        stem = _safe(config.monitor_bot_name)
+        extension = os.path.splitext(filename)[1]
+        latest = os.path.join(self.path, f"{stem}-latest{extension}")
+        tmp = latest + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        if self.history:
+            kept = os.path.join(self.path, f"{stem}-{datetime.now():%Y%m%d-%H%M%S}{extension}")
+            os.link(tmp, kept + ".tmp")
+            os.replace(kept + ".tmp", kept)     # two in one second: keep the later
+        os.replace(tmp, latest)
+        return True
+
+
+class WebhookSink(ThreadedSink):
+    """POSTs messages as JSON `{"monitor": ..., "text": ...}` and images as a
+    multipart upload (`monitor` field, `image` file) to `url`."""
+
+    name = "webhook"
+
+    def __init__(self, url, timeout_seconds=DEFAULT_TIMEOUT_SECONDS, headers=None):
+        self.url = url
+        self.timeout_seconds = timeout_seconds
+        import requests     # not with the module: a Telegram-only monitor starts without it
+
+        self.session = requests.Session()       # keep-alive between sends
+        self.session.headers.update(headers or {})
+
+    def deliver_message(self, config, text):
+        response = self.session.post(self.url, timeout=self.timeout_seconds,
+                                     data=json.dumps({"monitor": config.monitor_bot_name, "text": text}),
+                                     headers={"Content-Type": "application/json"})
+        response.raise_for_status()
+        return True
+
+    def deliver_image(self, config, data, filename, mime):
+        response = self.session.post(self.url, timeout=self.timeout_seconds,
+                                     data={"monitor": config.monitor_bot_name},
+                                     files={"image": (filename, data, mime)})
+        response.raise_for_status()
+        return True
+
+
+class SmtpSink(ThreadedSink):
+    """E-mails messages, and images as attachments, through an SMTP server."""
+
+    name = "smtp"
+
+    def __init__(self, host="localhost", to=(), port=25, sender="bb_monitor@localhost",
+                 starttls=False, username=None, password=None,
+                 timeout_seconds=DEFAULT_TIMEOUT_SECONDS):
+        if not to:
+            raise ValueError("smtp sink needs at least one recipient in 'to'")
+        self.host, self.port = host, port
+        self.to = [to] if isinstance(to, str) else list(to)
+        self.sender = sender
+        self.starttls = starttls
+        self.username, self.password = username, password
+        self.timeout_seconds = timeout_seconds
+
+    def _send(self, message):
+        import smtplib
+
+        message["From"] = self.sender
+        message["To"] = ", ".join(self.to)
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout_seconds) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            smtp.send_message(message)
+        return True
+
+    def deliver_message(self, config, text):
+        from email.message import EmailMessage
+        message = EmailMessage()
+        message["Subject"] = f"[{config.monitor_bot_name}] {text.splitlines()[0] if text else ''}"[:200]
+        message.set_content(text)
+        return self._send(message)
+
+    def deliver_image(self, config, data, filename, mime):
+        from email.message import EmailMessage
+        message = EmailMessage()
+        message["Subject"] = f"[{config.monitor_bot_name}] {filename}"
+        message.set_content(f"{config.monitor_bot_name} at {datetime.now():%Y-%m-%d %H:%M:%S}")
+        maintype, _, subtype = (mime or "application/octet-stream").partition("/")
+        message.add_attachment(data, maintype=maintype, subtype=subtype, filename=filename)
+        return self._send(message)
+
+
+SINK_TYPES = {
+    "telegram": TelegramSink,
+    "directory": DirectorySink,
+    "webhook": WebhookSink,
+    "smtp": SmtpSink,
+}
+
+
+def make_sink(spec):
+    """A Sink from one entry of a config's `sinks`: a type name, or a dict with
+    "type" and the sink's keyword arguments."""
+    if isinstance(spec, str):
+        spec = {"type": spec}
+    options = dict(spec)
+    kind = options.pop("type", None)
+    if kind not in SINK_TYPES:
+        raise ValueError(f"unknown sink type {kind!r}; expected one of {tuple(SINK_TYPES)}")
+    return SINK_TYPES[kind](**options)
+
+
+# The config's sinks, built once: they hold sessions and check their settings.
+_sinks = {}
+_sinks_lock = threading.Lock()
+
+
+def sinks_for(config):
+    with _sinks_lock:
+        if id(config) not in _sinks:
+            _sinks[id(config)] = [make_sink(s) for s in getattr(config, "sinks", ["telegram"])]
+        return _sinks[id(config)]
+
+
+def fan_out(config, start):
+    """Call `start(sink)` for every sink of `config` at once. Returns a Future that
+    is True when every sink confirmed; with a single sink, that sink's own Future.
+
+    Each sink that fails (False or an exception) is printed with its name.
+    """
+    label = config.monitor_bot_name
+    futures = []
+    for sink in sinks_for(config):
+        try:
+            future = start(sink)
+        except Exception as e:
+            future = Future()
+            future.set_exception(e)
+        futures.append((sink, future))
+    if len(futures) == 1:
+        return futures[0][1]
+
+    combined = Future()
+    remaining = [len(futures)]
+    ok = [True]
+    lock = threading.Lock()
+
+    def done(sink, future):
+        try:
+            delivered = bool(future.result())
+        except Exception as e:
+            print(f"[{label}] {sink.name} failed: {e}", flush=True)
+            delivered = False
+        else:
+            if not delivered:
+                print(f"[{label}] {sink.name}: not delivered", flush=True)
+        with lock:
+            ok[0] = ok[0] and delivered
+            remaining[0] -= 1
+            finished = remaining[0] == 0
+        if finished:
+            combined.set_result(ok[0])
+
+    for sink, future in futures:
+        future.add_done_callback(lambda f, sink=sink: done(sink, f))
+    return combined
+
+
+def wait(timeout=None):
+    """Wait for the fan-out pool's outstanding deliveries (not the notifier's)."""
+    with _pool_lock:
+        pending = list(_outstanding)
+    for future in pending:
+        try:
+            future.result(timeout)
+        except Exception:
+            pass
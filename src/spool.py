@@ -0,0 +1,148 @@
+"""A durable, append-only spool of outbound Telegram calls, kept on local disk.
+
+When the monitor host loses its uplink, a send that cannot reach Telegram used to
+be lost (a composite, an hourly summary) or retried by its loop on the next tick.
+Instead the notifier appends it here and a later attempt delivers it, oldest first,
+once the uplink is back (see src/notifier.py).
+
+Each call is one pair of files named by a sequence number: `<seq>.json` with the
+call and its creation time, and `<seq>.bin` with the encoded image, if any. Both are
+written to a temporary name and renamed into place, so a crash leaves either a
+whole entry or none. Entries older than `max_age_seconds`, and the oldest ones
+beyond `max_bytes` in total, are evicted: after a long outage the latest news is
+what matters.
+
+Only one process may use a spool directory at a time; it holds a lock file for as
+long as the Spool is open.
+"""
+import fcntl
+import json
+import os
+import time
+
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+DEFAULT_MAX_AGE_SECONDS = 24 * 3600
+
+
+class SpoolBusy(Exception):
+    """Another process already holds the spool directory."""
+
+
+class Spool:
+    """Ordered on-disk queue of (meta, payload) entries."""
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES,
+                 max_age_seconds=DEFAULT_MAX_AGE_SECONDS, clock=time.time):
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._clock = clock
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        self._lock = open(os.path.join(self.directory, ".lock"), "w")
+        try:
+            fcntl.flock(self._lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._lock.close()
+            raise SpoolBusy(f"{self.directory} is in use by another process") from None
+        self._entries = self._load_index()      # [(seq, created, nbytes)], oldest first
+        self.evicted = 0
+
+    def _path(self, seq, suffix):
+        return os.path.join(self.directory, f"{seq:012d}{suffix}")
+
+    def _load_index(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            stem, suffix = os.path.splitext(name)
+            if suffix == ".tmp":
+                os.remove(os.path.join(self.directory, name))   # an interrupted append
+                continue
+            if suffix != ".json" or not stem.isdigit():
+                continue
+            seq = int(stem)
+            try:
+                with open(self._path(seq, ".json")) as f:
+                    created = json.load(f)["created"]
+            except (OSError, ValueError, KeyError):
+                self._discard(seq)
+                continue
+            entries.append((seq, created, self._size(seq)))
+        return sorted(entries)
+
+    def _size(self, seq):
+        total = 0
+        for suffix in (".json", ".bin"):
+            try:
+                total += os.path.getsize(self._path(seq, suffix))
+            except OSError:
+                pass
+        return total
+
+    def _write(self, path, data):
+        tmp = path + ".tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        return sum(e[2] for e in self._entries)
+
+    def append(self, meta, payload=None):
+        """Store `meta` (JSON-serialisable) and optional `payload` bytes as the
+        newest entry. Returns its sequence number."""
+        seq = self._entries[-1][0] + 1 if self._entries else 0
+        created = self._clock()
+        # The payload first: an entry counts only once its .json exists.
+        if payload is not None:
+            self._write(self._path(seq, ".bin"), bytes(payload))
+        self._write(self._path(seq, ".json"),
+                    json.dumps({**meta, "created": created, "payload": payload is not None}).encode())
+        self._entries.append((seq, created, self._size(seq)))
+        self.evict()
+        return seq
+
+    def oldest(self):
+        """(seq, meta, payload) of the oldest entry, or None when empty."""
+        self.evict()
+        while self._entries:
+            seq = self._entries[0][0]
+            try:
+                with open(self._path(seq, ".json")) as f:
+                    meta = json.load(f)
+                payload = None
+                if meta.pop("payload", False):
+                    with open(self._path(seq, ".bin"), "rb") as f:
+                        payload = f.read()
+                return seq, meta, payload
+            except (OSError, ValueError):
+                self.remove(seq)        # damaged; nothing to deliver
+        return None
+
+    def remove(self, seq):
+        self._entries = [e for e in self._entries if e[0] != seq]
+        self._discard(seq)
+
+    def _discard(self, seq):
+        for suffix in (".json", ".bin"):
+            try:
+                os.remove(self._path(seq, suffix))
+            except FileNotFoundError:
+                pass
+
+    def evict(self):
+        """Drop entries past their age, then the oldest until under the size cap."""
+        cutoff = self._clock() - self.max_age_seconds
+        total = self.nbytes
+        while self._entries and (self._entries[0][1] < cutoff or total > self.max_bytes):
+            seq, _, nbytes = self._entries.pop(0)
+            self._discard(seq)
+            total -= nbytes
+            self.evicted += 1
+
+    def close(self):
+        self._lock.close()
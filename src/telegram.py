@@ -0,0 +1,219 @@
+"""Telegram Bot API calls over one pooled HTTP session per process.
+
+`requests.post` opens a fresh connection, TLS handshake included, for every
+message and photo, and without a timeout it waits for a stalled connection forever:
+one hung send freezes a monitor thread, or the whole system-check loop. All calls
+go through a shared TelegramClient instead, whose requests.Session keeps its
+connections to the API alive between calls. Every monitor thread of
+bb_monitor_multi, and the system check, reuses the same warm connections.
+
+Each call has a connect and a read timeout. Failures to connect are retried a
+few times with backoff; nothing else is, because a request that reached Telegram
+may already have been delivered and must not be sent twice.
+
+requests is imported with the first client, not with this module: the one-shot
+monitor imports it, and connects, on a thread while it decodes (see connect()).
+"""
+import threading
+import time
+from typing import NamedTuple, Optional
+
+API_URL = "https://api.telegram.org"
+DEFAULT_CONNECT_TIMEOUT_SECONDS = 5
+DEFAULT_READ_TIMEOUT_SECONDS = 30
+DEFAULT_RETRIES = 3
+# Connections kept open to the API: enough for every monitor thread of a large
+# bb_monitor_multi to send at once.
+POOL_SIZE = 16
+
+
+class TelegramClient:
+    """Posts Bot API methods over a pooled, keep-alive session."""
+
+    def __init__(self, api_url=API_URL, retries=DEFAULT_RETRIES, backoff_seconds=0.5,
+                 pool_size=POOL_SIZE):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.api_url = api_url.rstrip("/")
+        # read=False: a timed-out reply raises ReadTimeout at once, never a resend.
+        retry = Retry(total=retries, connect=retries, read=False, status=0, other=0, redirect=0,
+                      backoff_factor=backoff_seconds, allowed_methods=None,
+                      raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def call(self, token, method, data=None, files=None,
+             connect_timeout=DEFAULT_CONNECT_TIMEOUT_SECONDS,
+             read_timeout=DEFAULT_READ_TIMEOUT_SECONDS):
+        """POST `method` and return the decoded JSON reply. Raises requests'
+        exceptions on connection failure or timeout."""
+        response = self.session.post(f"{self.api_url}/bot{token}/{method}", data=data,
+                                     files=files, timeout=(connect_timeout, read_timeout))
+        return response.json()
+
+    def close(self):
+        self.session.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def client(api_url=API_URL, retries=DEFAULT_RETRIES):
+    """The process-wide TelegramClient for `api_url` and `retries`."""
+    with _clients_lock:
+        key = (api_url, retries)
+        if key not in _clients:
+            _clients[key] = TelegramClient(api_url, retries=retries)
+        return _clients[key]
+
+
+def settings(config):
+    """Everything a call needs from `config`, as plain data, so a call can be queued
+    or spooled to disk and made later (see ApiCall)."""
+    return {
+        "api_url": getattr(config, "telegram_api_url", API_URL),
+        "retries": getattr(config, "telegram_retries", DEFAULT_RETRIES),
+        "token": config.telegram_bot_token,
+        "connect_timeout": getattr(config, "telegram_connect_timeout_seconds",
+                                   DEFAULT_CONNECT_TIMEOUT_SECONDS),
+        "read_timeout": getattr(config, "telegram_read_timeout_seconds",
+                                DEFAULT_READ_TIMEOUT_SECONDS),
+    }
+
+
+_connecting = {}    # (api_url, retries) -> Event set once connect() has its answer
+
+
+def post(settings, method, data=None, files=None):
+    """Post `method` on the shared client for `settings` (see settings())."""
+    key = (settings["api_url"], settings["retries"])
+    connecting = _connecting.get(key)
+    if connecting is not None and method != "getMe":
+        # Take the connection connect() is opening rather than a second handshake.
+        connecting.wait(settings["connect_timeout"])
+    return client(*key).call(
+        settings["token"], method, data=data, files=files,
+        connect_timeout=settings["connect_timeout"], read_timeout=settings["read_timeout"],
+    )
+
+
+def call(config, method, data=None, files=None):
+    """Post `method` with the bot token, timeouts and retries from `config`."""
+    return post(settings(config), method, data=data, files=files)
+
+
+def connect(config):
+    """Open a pooled connection to the API ahead of the first send, with a getMe
+    (which changes nothing). Returns whether the API answered; a failure here is
+    left for the send itself to retry and report. A send made meanwhile waits for
+    the answer, up to the connect timeout, and then reuses the connection."""
+    config_settings = settings(config)
+    _connecting[(config_settings["api_url"], config_settings["retries"])] = done = threading.Event()
+    try:
+        return bool(post(config_settings, "getMe").get("ok"))
+    except Exception:
+        return False
+    finally:
+        done.set()
+
+
+def unreached(error):
+    """Whether a call that raised `error` never reached Telegram, so that sending it
+    again cannot deliver it twice: no connection could be made. A read timeout, a
+    connection dropped once the request was out, or an undecodable reply may follow
+    a request Telegram already acted on."""
+    try:
+        import requests
+        from urllib3.exceptions import ConnectTimeoutError
+    except ImportError:
+        requests = None
+    if requests is not None:
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        if isinstance(error, requests.exceptions.ConnectionError):
+            # A failed connect (refused, unresolvable, timed out; urllib3's
+            # NewConnectionError is a ConnectTimeoutError) arrives as the reason of
+            # a MaxRetryError; "Connection aborted" after sending is a ProtocolError.
+            cause = error.args[0] if error.args else None
+            return isinstance(getattr(cause, "reason", None), ConnectTimeoutError)
+        if isinstance(error, requests.exceptions.RequestException):
+            return False
+    return isinstance(error, ConnectionError)
+
+
+class ApiCall(NamedTuple):
+    """One Bot API call as data. `photo` is (filename, encoded bytes, MIME type)."""
+    settings: dict
+    method: str
+    data: dict
+    photo: Optional[tuple] = None
+
+
+def perform(api_call):
+    """Make `api_call` and return the reply. Photo uploads feed upload_throughput."""
+    if api_call.photo is None:
+        return post(api_call.settings, api_call.method, data=api_call.data)
+    t0 = time.monotonic()
+    reply = post(api_call.settings, api_call.method, data=api_call.data,
+                 files={"photo": api_call.photo})
+    _record_upload(api_call.settings["api_url"], len(api_call.photo[1]), time.monotonic() - t0)
+    return reply
+
+
+# api_url -> smoothed bytes per second of photo uploads, latency included.
+_throughput = {}
+_throughput_lock = threading.Lock()
+THROUGHPUT_SMOOTHING = 0.3
+
+
+def _record_upload(api_url, nbytes, seconds):
+    if seconds <= 0:
+        return
+    rate = nbytes / seconds
+    with _throughput_lock:
+        previous = _throughput.get(api_url)
+        _throughput[api_url] = rate if previous is None else (
+            previous + THROUGHPUT_SMOOTHING * (rate - previous))
+
+
+def upload_throughput(api_url=API_URL):
+    """Bytes per second recent photo uploads to `api_url` achieved, counting the
+    whole request (so a fixed round-trip time lowers it), or None before the first."""
+    with _throughput_lock:
+        return _throughput.get(api_url)
+
+
+# Longest text a single sendMessage accepts.
+MESSAGE_LIMIT = 4096
+
+
+def split_text(text, limit=MESSAGE_LIMIT):
+    """`text` cut into pieces of at most `limit` characters, at line breaks where
+    possible. Always at least one piece."""
+    parts, current = [], ""
+    for line in text.splitlines(keepends=True):
+        while len(line) > limit:
+            if current:
+                parts.append(current)
+                current = ""
+            parts.append(line[:limit])
+            line = line[limit:]
+        if len(current) + len(line) > limit:
+            parts.append(current)
+            current = ""
+        current += line
+    if current or not parts:
+        parts.append(current)
+    return [p.rstrip("\n") if len(parts) > 1 else p for p in parts]
+
+
+def retry_after(reply):
+    """Seconds Telegram asks us to wait when `reply` is a 429, else None."""
+    if isinstance(reply, dict) and reply.get("error_code") == 429:
+        return (reply.get("parameters") or {}).get("retry_after", 1)
+    return None
@@ -0,0 +1,112 @@
+"""Per-camera tiles of the composite image, rebuilt only when the video changes.
+
+A camera's tile is its latest video's first frame, resized to the composite width,
+rotated, and stamped with the camera name and start time (src/composite.py). While the camera has not
+written a new video, every one of those steps would produce the identical tile
+again — including the decode, which dominates the tick. So the last tile is kept per
+camera and reused as long as the video's (path, size, mtime) is unchanged.
+
+The same stamps tell the loop when there is nothing new at all: StampLog remembers
+which video of each camera was last saved or sent, so an unchanged camera's frame
+is not decoded and written again, and a composite of nothing but unchanged cameras
+need not be uploaded again.
+"""
+import os
+import threading
+from typing import NamedTuple, Optional
+
+
+class FileStamp(NamedTuple):
+    """Identity of one version of a file. A video still being written changes size
+    and mtime, so its tile is rebuilt once it is complete."""
+    path: str
+    size: int
+    mtime_ns: int
+
+
+def file_stamp(path) -> Optional[FileStamp]:
+    """One stat; None when there is no path or the file has gone."""
+    if not path:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return FileStamp(path, st.st_size, st.st_mtime_ns)
+
+
+class TileCache:
+    """Last tile per camera slot, valid while (stamp, recipe) is unchanged.
+
+    `recipe` is whatever else the tile depends on (rotation, width), so a config
+    change rebuilds instead of serving a stale layout. Only the newest tile per slot
+    is kept: a camera's older videos never come back.
+    """
+
+    def __init__(self):
+        self._tiles = {}        # slot -> ((stamp, recipe), tile)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, slot, stamp, recipe=None):
+        if stamp is None:
+            return None
+        with self._lock:
+            entry = self._tiles.get(slot)
+            if entry is not None and entry[0] == (stamp, recipe):
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, slot, stamp, tile, recipe=None):
+        with self._lock:
+            if stamp is None or tile is None:
+                self._tiles.pop(slot, None)
+            else:
+                self._tiles[slot] = ((stamp, recipe), tile)
+
+    def last(self, slot):
+        """The slot's most recent tile whatever its stamp, e.g. to size a
+        placeholder like it; None if the slot has none."""
+        with self._lock:
+            entry = self._tiles.get(slot)
+            return entry[1] if entry is not None else None
+
+
+class StampLog:
+    """The stamp each camera slot had when its video was last used for something
+    (saved, sent), so a tick can tell which cameras have anything new."""
+
+    def __init__(self):
+        self._stamps = {}       # slot -> FileStamp or None
+        self._lock = threading.Lock()
+
+    def changed(self, slot, stamp):
+        """Whether `stamp` is new for `slot`. A missing video is never new."""
+        if stamp is None:
+            return False
+        with self._lock:
+            return self._stamps.get(slot) != stamp
+
+    def update(self, slot, stamp):
+        """Record `stamp` as used; None forgets the slot, so its video counts as
+        new next time (e.g. it timed out and was not used after all)."""
+        with self._lock:
+            if stamp is None:
+                self._stamps.pop(slot, None)
+            else:
+                self._stamps[slot] = stamp
+
+    def unchanged(self, stamps):
+        """True when no slot in `stamps` (slot -> stamp) has a new video and at
+        least one has a video at all."""
+        return (any(s is not None for s in stamps.values())
+                and not any(self.changed(slot, s) for slot, s in stamps.items()))
+
+
+def newest_mtime(stamps):
+    """Epoch seconds of the newest of `stamps` (None entries ignored), or None."""
+    times = [s.mtime_ns for s in stamps if s is not None]
+    return max(times) / 1e9 if times else None
@@ -0,0 +1,555 @@
+"""Each camera's newest video, without rescanning the directories every tick.
+
+bb_monitor.find_most_recent_files lists the base directory, globs every camera
+subdirectory and stats every file in it, on every tick. Cameras write ~1,440 videos
+a day each, usually onto an NFS mount, so by the evening a tick costs thousands of
+stat round trips to answer a question whose answer changed by one file.
+
+VideoIndex keeps the answer in memory and only looks at what changed:
+
+  inotify  the base directory, the latest date directory and each camera directory
+           are watched; a tick drains the pending events (non-blocking) and stats
+           only the files they name.
+  poll     for filesystems that do not deliver events — NFS, CIFS, sshfs only see
+           writes made by *this* host, and the videos are written by another — each
+           directory's mtime is checked instead (one stat per directory). A changed
+           directory is re-listed, but only names not seen before are stat'ed.
+
+Either way a full rescan runs every `full_rescan_seconds`, as insurance against a
+missed event or an NFS attribute cache that hid a change.
+
+"Newest" is by mtime by default, as it always was. With order="filename" it is by
+the recording start time in the file name instead, which costs no stat at all and
+stays right when rsync or a copy has touched the mtimes.
+"""
+import ctypes
+import ctypes.util
+import functools
+import os
+import select
+import struct
+import threading
+import time
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+
+try:
+    from bb_binary.parsing import parse_video_fname
+except ImportError:  # only needed for Basler file names; Pi names parse without it
+    parse_video_fname = None
+
+# A directory modified this recently may be modified again within the same mtime
+# tick, which would leave its mtime unchanged. Keep re-listing it until it settles
+# (the same "racy timestamp" problem git's index has).
+MTIME_SETTLE_SECONDS = 2
+
+# Filesystems on which inotify only reports changes made by this host.
+REMOTE_FILESYSTEMS = frozenset({
+    "nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "ceph", "glusterfs",
+    "fuse.sshfs", "fuse.glusterfs", "fuse.rclone", "afs", "lustre",
+})
+
+
+ORDERS = ("mtime", "filename")
+# How long latest() waits for another caller's refresh before answering from the
+# one before it.
+REFRESH_WAIT_SECONDS = 30
+
+
+class VideoName(NamedTuple):
+    """What a video's file name says about it.
+
+    `start` is naive: UTC for Basler names (`utc` True), local time for Pi names.
+    """
+    camera: str
+    start: datetime
+    utc: bool
+
+
+def parse_video_name(filename):
+    """Camera and start time from a Basler or Pi-h264 video file name, else None.
+
+    Basler names go through bb_binary's parse_video_fname; Pi names end in
+    `_YYYY-mm-dd-HH-MM-SS` before the extension, with the camera name first.
+    """
+    filename = os.path.basename(filename)
+    if parse_video_fname is not None:
+        try:
+            cam_id, start, _end = parse_video_fname(filename, format="basler")
+            return VideoName(f"cam{cam_id}", start, True)
+        except Exception:
+            pass
+    stem = os.path.splitext(filename)[0]
+    try:
+        start = datetime.strptime(stem.split("_")[-1], "%Y-%m-%d-%H-%M-%S")
+    except ValueError:
+        return None
+    return VideoName(filename.split("_")[0], start, False)
+
+
+@functools.lru_cache(maxsize=1 << 17)
+def name_start_epoch(filename):
+    """Recording start from the file name as epoch seconds, or None. Cached: the same
+    names come round every tick, and a day's worth per camera is ~1,440 entries."""
+    parsed = parse_video_name(filename)
+    if parsed is None:
+        return None
+    start = parsed.start.replace(tzinfo=timezone.utc) if parsed.utc else parsed.start
+    return start.timestamp()
+
+
+def sort_key(path, order="mtime"):
+    """Ordering key for one video; larger is newer, None if the file vanished.
+
+    In "filename" order a name that does not parse falls back to its mtime, so a
+    stray file still sorts sensibly; that is the only case that costs a stat.
+    Both keys are epoch seconds, so the two mix.
+    """
+    if order == "filename":
+        key = name_start_epoch(os.path.basename(path))
+        if key is not None:
+            return key
+    try:
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def scan_latest(base_directory, sub_directories, file_type, order="mtime"):
+    """One full os.scandir pass: newest video per camera, or None where there is none.
+
+    The stateless counterpart of VideoIndex, and of find_most_recent_files' glob plus
+    getmtime. In "filename" order it performs no per-file stat at all.
+    """
+    date_dir = latest_date_dir(base_directory)
+    if date_dir is None:
+        return [None] * len(sub_directories)
+    results = []
+    for subdir in sub_directories:
+        path = os.path.join(date_dir, subdir)
+        try:
+            with os.scandir(path) as it:
+                names = [e.name for e in it if matches_file_type(e.name, file_type)]
+        except (FileNotFoundError, NotADirectoryError):
+            names = []
+        keyed = ((sort_key(os.path.join(path, n), order), n) for n in names)
+        newest = max(((k, n) for k, n in keyed if k is not None), default=None)
+        results.append(os.path.join(path, newest[1]) if newest else None)
+    return results
+
+
+def latest_date_dir(base_directory, year=None):
+    """The lexically greatest subdirectory of base_directory starting with `year`
+    (default: the current year), or None."""
+    prefix = str(year if year is not None else datetime.now().year)
+    try:
+        with os.scandir(base_directory) as it:
+            names = [e.name for e in it if e.name.startswith(prefix) and e.is_dir()]
+    except FileNotFoundError:
+        return None
+    return os.path.join(base_directory, max(names)) if names else None
+
+
+def matches_file_type(name, file_type):
+    """The names glob('*' + file_type) would match: glob skips dotfiles."""
+    return name.endswith(file_type) and not name.startswith(".")
+
+
+def filesystem_type(path):
+    """Type of the filesystem `path` lives on, from /proc/mounts; None if unknown."""
+    try:
+        with open("/proc/mounts") as f:
+            mounts = [line.split()[1:3] for line in f]
+    except OSError:
+        return None
+    path = os.path.realpath(path)
+    best, fstype = "", None
+    for mountpoint, kind in mounts:
+        mountpoint = mountpoint.replace("\\040", " ")
+        inside = path == mountpoint or path.startswith(mountpoint.rstrip("/") + "/")
+        if inside and len(mountpoint) > len(best):
+            best, fstype = mountpoint, kind
+    return fstype
+
+
+def _dir_stamp(path):
+    """Poll-mode change marker for a directory: its mtime, or None when it is missing
+    or was modified too recently to trust (see MTIME_SETTLE_SECONDS). None never
+    matches, so such a directory is listed again on the next look."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    if time.time() - st.st_mtime < MTIME_SETTLE_SECONDS:
+        return None
+    return st.st_mtime_ns
+
+
+# ---------- inotify ----------
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, "O_CLOEXEC", 0o2000000)
+
+_EVENT_HEADER = struct.Struct("iIII")
+_DIR_MASK = IN_CREATE | IN_MOVED_TO | IN_DELETE | IN_MOVED_FROM | IN_DELETE_SELF | IN_MOVE_SELF
+_FILE_MASK = _DIR_MASK | IN_CLOSE_WRITE
+
+
+class Inotify:
+    """Minimal ctypes binding; only what VideoIndex needs. Linux only."""
+
+    _libc = None
+
+    @classmethod
+    def available(cls):
+        if cls._libc is None:
+            try:
+                libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+                libc.inotify_init1  # noqa: B018 - raises AttributeError off Linux
+                cls._libc = libc
+            except (OSError, AttributeError):
+                cls._libc = False
+        return bool(cls._libc)
+
+    def __init__(self):
+        if not self.available():
+            raise OSError("inotify is not available on this platform")
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path, mask):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+        return wd
+
+    def rm_watch(self, wd):
+        self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self):
+        """Every pending event as (wd, mask, name), without blocking."""
+        events = []
+        while select.select([self.fd], [], [], 0)[0]:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                events.append((wd, mask, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+# ---------- the index ----------
+
+class _CameraDir:
+    """What the index knows about one camera subdirectory of the date directory."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}        # file name -> sort key
+        self.newest = None       # (key, name)
+        self.dir_mtime_ns = None
+        self.dirty = True
+        self.wd = None
+
+    def add(self, name, key):
+        self.entries[name] = key
+        if self.newest is None or key >= self.newest[0]:
+            self.newest = (key, name)
+
+    def remove(self, name):
+        self.entries.pop(name, None)
+        if self.newest is not None and self.newest[1] == name:
+            self._recompute()
+
+    def _recompute(self):
+        self.newest = max(((k, n) for n, k in self.entries.items()), default=None)
+
+    def newest_path(self):
+        return os.path.join(self.path, self.newest[1]) if self.newest else None
+
+
+class VideoIndex:
+    """Newest video per camera subdirectory of the latest date directory.
+
+    latest() returns what bb_monitor.find_most_recent_files would: one path (or
+    None) per entry of `sub_directories`, ordered by `order` (see sort_key). The
+    difference is cost: after the first call it is proportional to what changed, not
+    to what exists.
+
+    `mode` is "inotify", "poll", or "auto" (inotify unless the base directory is on
+    a filesystem listed in REMOTE_FILESYSTEMS, or inotify is unavailable).
+    """
+
+    def __init__(self, base_directory, sub_directories, file_type, mode="auto",
+                 order="mtime", full_rescan_seconds=900, refresh_seconds=0,
+                 refresh_wait_seconds=REFRESH_WAIT_SECONDS, clock=time.monotonic):
+        if order not in ORDERS:
+            raise ValueError(f"unknown video order {order!r}")
+        self.base_directory = base_directory
+        self.sub_directories = list(sub_directories)
+        self.file_type = file_type
+        self.order = order
+        self.full_rescan_seconds = full_rescan_seconds
+        self.refresh_seconds = refresh_seconds
+        self.refresh_wait_seconds = refresh_wait_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.mode = self._resolve_mode(mode)
+        self._inotify = Inotify() if self.mode == "inotify" else None
+        self._base_wd = None
+        self._date_wd = None
+        self._date_dir = None
+        self._base_dirty = True
+        self._base_mtime_ns = None
+        self._cameras = {}       # subdir name -> _CameraDir
+        self._by_wd = {}         # watch descriptor -> _CameraDir
+        self._last_full_scan = None
+        self._last_refresh = None
+        self._answers = {}       # subdir -> newest path at the last refresh; replaced, not changed
+        self.scans = 0           # directory listings performed, for diagnostics
+
+    def _resolve_mode(self, mode):
+        if mode not in ("auto", "inotify", "poll"):
+            raise ValueError(f"unknown video index mode {mode!r}")
+        if mode == "auto":
+            local = filesystem_type(self.base_directory) not in REMOTE_FILESYSTEMS
+            return "inotify" if local and Inotify.available() else "poll"
+        return mode
+
+    def latest(self, sub_directories=None):
+        """Newest video of each of `sub_directories` (default: the index's own),
+        which are added to the index if it does not follow them yet.
+
+        Safe to call from several threads. Within `refresh_seconds` of the last
+        look at the directories the answer comes from memory, so monitors whose
+        ticks fall due together share one refresh: a caller that finds another's
+        refresh in progress waits for it. On a stalled NFS mount a refresh can hang
+        for good, though, and it should hang one thread, not every thread asking:
+        after `refresh_wait_seconds` the answer is that of the refresh before, for
+        cameras it covered.
+        """
+        wanted = list(self.sub_directories if sub_directories is None else sub_directories)
+        if not self._lock.acquire(timeout=self.refresh_wait_seconds):
+            answers = self._answers
+            if all(subdir in answers for subdir in wanted):
+                return [answers[subdir] for subdir in wanted]
+            self._lock.acquire()        # a camera never looked at: nothing to answer yet
+        try:
+            results = self._latest(wanted)
+            self._answers = {**self._answers, **dict(zip(wanted, results))}
+            return results
+        finally:
+            self._lock.release()
+
+    def _latest(self, wanted):
+        for subdir in wanted:
+            if subdir not in self.sub_directories:
+                self._add_camera(subdir)
+        now = self._clock()
+        fresh = self._last_refresh is not None and now - self._last_refresh < self.refresh_seconds
+        if not fresh:
+            self._last_refresh = now
+            self._refresh_base(now)
+        if self._date_dir is None:
+            return [None] * len(wanted)
+
+        results = []
+        for subdir in wanted:
+            cam = self._cameras[subdir]
+            if self._inotify is None and not fresh:
+                stamp = _dir_stamp(cam.path)
+                cam.dirty |= stamp is None or stamp != cam.dir_mtime_ns
+                cam.dir_mtime_ns = stamp
+            if cam.dirty:
+                self._rescan(cam)
+            results.append(cam.newest_path())
+        return results
+
+    def _refresh_base(self, now):
+        if self._last_full_scan is None or now - self._last_full_scan >= self.full_rescan_seconds:
+            self._mark_everything_dirty()
+            self._last_full_scan = now
+
+        if self._inotify is not None:
+            self._drain_events()
+        else:
+            stamp = _dir_stamp(self.base_directory)
+            self._base_dirty |= stamp is None or stamp != self._base_mtime_ns
+            self._base_mtime_ns = stamp
+
+        if self._base_dirty:
+            self._base_dirty = False
+            self.scans += 1
+            date_dir = latest_date_dir(self.base_directory)
+            if date_dir != self._date_dir:
+                self._switch_date_dir(date_dir)
+
+    def _add_camera(self, subdir):
+        self.sub_directories.append(subdir)
+        if self._date_dir is not None:
+            self._cameras[subdir] = _CameraDir(os.path.join(self._date_dir, subdir))
+
+    def close(self):
+        with self._lock:
+            if self._inotify is not None:
+                self._inotify.close()
+                self._inotify = None
+
+    # ----- scanning -----
+
+    def _sort_key(self, path):
+        return sort_key(path, self.order)
+
+    def _rescan(self, cam):
+        """Re-list one camera directory, keying only names not already known."""
+        cam.dirty = False
+        self.scans += 1
+        if self._inotify is not None and cam.wd is None:
+            self._watch_camera(cam)     # before listing, so no file slips between
+        try:
+            with os.scandir(cam.path) as it:
+                names = {e.name for e in it if matches_file_type(e.name, self.file_type)}
+        except (FileNotFoundError, NotADirectoryError):
+            cam.entries.clear()
+            cam.newest = None
+            return
+        for name in list(cam.entries):
+            if name not in names:
+                del cam.entries[name]
+        for name in names - cam.entries.keys():
+            key = self._sort_key(os.path.join(cam.path, name))
+            if key is not None:
+                cam.entries[name] = key
+        cam._recompute()
+
+    def _mark_everything_dirty(self):
+        self._base_dirty = True
+        for cam in self._cameras.values():
+            cam.dirty = True
+
+    def _switch_date_dir(self, date_dir):
+        """A new date directory appeared (midnight), or the first scan found one."""
+        if self._inotify is not None:
+            for wd in [self._date_wd] + [c.wd for c in self._cameras.values()]:
+                if wd is not None:
+                    self._inotify.rm_watch(wd)
+            self._by_wd.clear()
+            self._date_wd = None
+        self._date_dir = date_dir
+        self._cameras = {}
+        if date_dir is None:
+            return
+        for subdir in self.sub_directories:
+            self._cameras[subdir] = _CameraDir(os.path.join(date_dir, subdir))
+        if self._inotify is not None:
+            self._date_wd = self._try_watch(date_dir, _DIR_MASK)
+
+    # ----- inotify -----
+
+    def _try_watch(self, path, mask):
+        try:
+            return self._inotify.add_watch(path, mask)
+        except OSError:
+            return None
+
+    def _watch_camera(self, cam):
+        cam.wd = self._try_watch(cam.path, _FILE_MASK)
+        if cam.wd is not None:
+            self._by_wd[cam.wd] = cam
+
+    def _drain_events(self):
+        if self._base_wd is None:
+            self._base_wd = self._try_watch(self.base_directory, _DIR_MASK)
+            self._base_dirty = True
+        for wd, mask, name in self._inotify.read_events():
+            if mask & IN_Q_OVERFLOW:
+                self._mark_everything_dirty()
+            elif wd == self._base_wd:
+                self._on_base_event(mask)
+            elif wd == self._date_wd:
+                self._on_date_dir_event(mask, name)
+            elif wd in self._by_wd:
+                self._on_camera_event(self._by_wd[wd], mask, name)
+
+    def _on_base_event(self, mask):
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+            self._base_wd = None
+        self._base_dirty = True
+
+    def _on_date_dir_event(self, mask, name):
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+            self._date_wd = None
+            self._base_dirty = True
+            return
+        cam = self._cameras.get(name)
+        if cam is not None:
+            # A camera subdirectory appeared or went away: start over for it.
+            if cam.wd is not None:
+                self._by_wd.pop(cam.wd, None)
+                cam.wd = None
+            cam.dirty = True
+
+    def _on_camera_event(self, cam, mask, name):
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+            self._by_wd.pop(cam.wd, None)
+            cam.wd = None
+            cam.dirty = True
+        elif not matches_file_type(name, self.file_type) or mask & IN_ISDIR:
+            return
+        elif mask & (IN_DELETE | IN_MOVED_FROM):
+            cam.remove(name)
+        elif not cam.dirty:
+            key = self._sort_key(os.path.join(cam.path, name))
+            if key is None:
+                cam.remove(name)
+            else:
+                cam.add(name, key)
+
+
+def make_index(base_directory, sub_directories, file_type, mode="auto", **kwargs) -> Optional[VideoIndex]:
+    """A VideoIndex, or None for mode "rescan" (scan every tick, as before)."""
+    if mode == "rescan":
+        return None
+    return VideoIndex(base_directory, sub_directories, file_type, mode=mode, **kwargs)
+
+
+# One VideoIndex per (base directory, file type, mode, order) in the process, shared
+# by every monitor config that reads from it: each config asks for its own cameras,
+# and a directory is scanned once however many configs watch it.
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_index(base_directory, file_type, mode="auto", order="mtime", **kwargs) -> Optional[VideoIndex]:
+    """The process's VideoIndex of `base_directory` (created with `kwargs` by the
+    first caller), or None for mode "rescan"."""
+    if mode == "rescan":
+        return None
+    key = (os.path.abspath(base_directory), file_type, mode, order)
+    with _shared_lock:
+        if key not in _shared:
+            _shared[key] = VideoIndex(base_directory, [], file_type, mode=mode, order=order, **kwargs)
+        return _shared[key]
@@ -0,0 +1,242 @@
+"""The monitor's directory scans and video decodes, in a child process it can kill.
+
+A stale NFS mount does not fail, it blocks: `os.listdir` or `cv2.VideoCapture`
+simply never returns. In the monitor's own thread that is fatal in the quietest
+possible way — no exception is raised, so bb_monitor_multi's restart loop never
+runs, and that hive's images stop without a word. The system check's recovery
+trigger has long avoided this by running the monitor as a subprocess with a
+timeout; ScanDecodeWorker gives the long-running loops the same isolation.
+
+Every scan and decode request goes to a child process with a deadline. A child that
+misses it is killed and a fresh one is started on the next request, and the caller
+gets WorkerUnavailable — an ordinary exception it can report. (A process blocked
+inside an NFS call cannot die until that call returns; it is abandoned, not waited
+for.)
+
+Decoded frames come back through shared memory rather than the pipe: pickling a
+30+ MB frame means serialising it, pushing it through a 64 KB pipe buffer and
+unpickling it again. Instead the parent owns one segment per camera, grown when a
+frame does not fit, the child writes each frame into it, and the parent copies it
+out — one memcpy. The parent creates and unlinks the segments, so a killed child
+never leaks one.
+"""
+import functools
+import importlib
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from src.decode import FrameDecoder
+from src.video_index import make_index, scan_latest
+
+DEFAULT_EXTRACT = "src.first_frame:read_first_frame"
+
+
+class WorkerUnavailable(Exception):
+    """The worker missed its deadline (and was killed) or died."""
+
+
+def _load(spec):
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+# ---------- child side ----------
+
+def _scan(indexes, args):
+    base, subdirs, file_type, mode, order, full_rescan_seconds = args
+    if mode == "rescan":
+        return scan_latest(base, subdirs, file_type, order)
+    key = (base, tuple(subdirs), file_type, mode, order)
+    if key not in indexes:
+        indexes[key] = make_index(base, subdirs, file_type, mode=mode, order=order,
+                                  full_rescan_seconds=full_rescan_seconds)
+    return indexes[key].latest()
+
+
+def _write_frames(frames, targets, attached):
+    """Copy each held frame into its slot's segment. Returns {path: reply}, where
+    a reply is the Decoded with the frame replaced by where to find it."""
+    replies = {}
+    for path, (name, size) in targets.items():
+        result = frames[path]
+        frame = result.frame
+        if frame is None:
+            replies[path] = ("none", result)
+        elif frame.nbytes > size:
+            replies[path] = ("too_large", result._replace(frame=frame.nbytes))
+        else:
+            if name not in attached:
+                attached[name] = shared_memory.SharedMemory(name=name)
+            view = np.ndarray(frame.shape, frame.dtype, buffer=attached[name].buf)
+            view[...] = frame
+            del view
+            replies[path] = ("ok", result._replace(frame=(frame.shape, frame.dtype.str)))
+    return replies
+
+
+def _worker_main(conn, extract_spec):
+    extract = _load(extract_spec)
+    indexes = {}
+    decoders = {}
+    attached = {}      # segment name -> SharedMemory
+    held = {}          # path -> Decoded whose frame did not fit its segment yet
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            return      # the parent has gone
+        kind, args = request
+        try:
+            if kind == "scan":
+                reply = _scan(indexes, args)
+            elif kind == "decode":
+                targets, workers, deadline, deadlines, options = args
+                key = (workers, deadline, tuple(sorted(options.items())))
+                if key not in decoders:
+                    decoders[key] = FrameDecoder(
+                        functools.partial(extract, **options) if options else extract,
+                        workers=workers, deadline_seconds=deadline,
+                    )
+                held = decoders[key].decode(list(targets), deadlines)
+                for name in [n for n in attached if n not in {t[0] for t in targets.values()}]:
+                    attached.pop(name).close()
+                reply = _write_frames(held, targets, attached)
+            elif kind == "copy":
+                reply = _write_frames(held, args, attached)
+            else:
+                raise ValueError(f"unknown request {kind!r}")
+            if kind in ("decode", "copy"):
+                # Hold on only to frames still waiting for a bigger segment.
+                held = {p: held[p] for p, r in reply.items() if r[0] == "too_large"}
+            conn.send(("ok", reply))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+# ---------- parent side ----------
+
+class ScanDecodeWorker:
+    """Runs scans and decodes for one monitor config in a supervised child process.
+
+    The child is started on first use and after every kill, and keeps its VideoIndex
+    between requests, so a healthy tick costs what it would in-process plus one
+    round trip.
+    """
+
+    def __init__(self, label, timeout_seconds=120, extract=DEFAULT_EXTRACT):
+        self.label = label
+        self.timeout_seconds = timeout_seconds
+        self.extract = extract
+        self._ctx = multiprocessing.get_context("spawn")   # safe next to other threads
+        self._process = None
+        self._conn = None
+        self._segments = {}       # slot -> SharedMemory, owned (and unlinked) here
+        self.restarts = 0
+
+    # ----- requests -----
+
+    def scan(self, base_directory, sub_directories, file_type, mode="auto",
+             order="mtime", full_rescan_seconds=900):
+        """Newest video per camera, as bb_monitor.latest_videos computes it."""
+        return self._call("scan", (base_directory, list(sub_directories), file_type,
+                                   mode, order, full_rescan_seconds))
+
+    def decode(self, slots, workers=0, deadline_seconds=None, deadlines=None, options=None):
+        """First frames of `slots` ({path: slot name}). Returns {path: Decoded}.
+
+        `options` are keyword arguments for the extract function, e.g. the backend.
+        """
+        targets = {path: self._target(slot, 0) for path, slot in slots.items() if path}
+        if not targets:
+            return {}
+        replies = self._call("decode", (targets, workers, deadline_seconds,
+                                        deadlines or {}, options or {}))
+        too_large = {p: r[1].frame for p, r in replies.items() if r[0] == "too_large"}
+        if too_large:
+            grown = {p: self._target(slots[p], n) for p, n in too_large.items()}
+            replies.update(self._call("copy", grown))
+        return {path: self._collect(slots[path], reply) for path, reply in replies.items()}
+
+    def _target(self, slot, nbytes):
+        """(name, size) of `slot`'s segment, grown to hold at least `nbytes`."""
+        segment = self._segments.get(slot)
+        if segment is None or segment.size < nbytes:
+            if segment is not None:
+                self._release(segment)
+            # Round up so a frame a little larger next time does not regrow it.
+            segment = shared_memory.SharedMemory(create=True, size=max(1, int(nbytes * 1.25)))
+            self._segments[slot] = segment
+        return segment.name, segment.size
+
+    def _collect(self, slot, reply):
+        status, result = reply
+        if status != "ok":
+            return result._replace(frame=None)
+        shape, dtype = result.frame
+        view = np.ndarray(shape, np.dtype(dtype), buffer=self._segments[slot].buf)
+        frame = view.copy()
+        del view
+        return result._replace(frame=frame)
+
+    def _call(self, kind, args):
+        self._ensure_started()
+        try:
+            self._conn.send((kind, args))
+            if not self._conn.poll(self.timeout_seconds):
+                self._kill(f"no reply to {kind} within {self.timeout_seconds}s")
+                raise WorkerUnavailable(f"{kind} timed out after {self.timeout_seconds}s")
+            status, reply = self._conn.recv()
+        except (EOFError, OSError, BrokenPipeError) as e:
+            self._kill(f"worker died ({e or type(e).__name__})")
+            raise WorkerUnavailable(f"worker died during {kind}") from e
+        if status == "error":
+            raise WorkerUnavailable(f"{kind} failed in worker: {reply}")
+        return reply
+
+    # ----- lifecycle -----
+
+    def _ensure_started(self):
+        if self._process is not None and self._process.is_alive():
+            return
+        parent, child = self._ctx.Pipe()
+        self._process = self._ctx.Process(
+            target=_worker_main, args=(child, self.extract),
+            name=f"bb_monitor worker [{self.label}]", daemon=True,
+        )
+        self._process.start()
+        child.close()
+        self._conn = parent
+
+    def _kill(self, reason):
+        print(f"[{self.label}] worker: {reason}; killing it", flush=True)
+        self.restarts += 1
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        if self._process is not None:
+            self._process.kill()
+            # Stuck in an uninterruptible NFS call it cannot die yet; do not wait.
+            self._process.join(1)
+            self._process = None
+
+    def _release(self, segment):
+        segment.close()
+        try:
+            segment.unlink()
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        if self._process is not None:
+            if self._conn is not None:
+                self._conn.close()
+            self._process.join(1)
+            if self._process.is_alive():
+                self._process.kill()
+            self._process = None
+        for segment in self._segments.values():
+            self._release(segment)
+        self._segments.clear()
+
@@ -1,6 +1,7 @@
 import os
 import sys
 import types
+from concurrent.futures import Future
 
 REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, REPO_ROOT)
@@ -27,8 +28,17 @@ def _install_mon_stub():
         _sent.append(message)
         return True
 
+    def send_message_async(config, message):
+        future = Future()
+        try:
+            future.set_result(stub.send_message(config, message))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
     stub.get_config = get_config
     stub.send_message = send_message
+    stub.send_message_async = send_message_async
     sys.modules["src.mon"] = stub
     src.mon = stub
 
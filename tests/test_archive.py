@@ -0,0 +1,88 @@
+"""Tests for the per-camera, per-day thumbnail archive."""
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from src.archive import Archive, day_name
+
+NOON = datetime(2026, 6, 1, 12, 0).timestamp()
+
+
+def frame(value, shape=(300, 400)):
+    return np.full(shape, value, np.uint8)
+
+
+def test_frames_are_scaled_to_one_shape_per_day(tmp_path):
+    archive = Archive(tmp_path, width=100)
+    assert archive.append("cam0", NOON, frame(10))
+    assert archive.append("cam0", NOON + 60, np.full((600, 800, 3), 20, np.uint8))   # colour, bigger
+    day = archive.day("cam0", day_name(NOON))
+    assert day.frames.shape == (2, 75, 100)
+    assert day.frames[1].mean() == 20
+    assert list(day.times) == [NOON, NOON + 60]
+    assert os.path.getsize(tmp_path / "cam0" / f"{day.day}.frames") == 2 * 75 * 100
+
+
+def test_a_time_range_is_a_view_of_the_day(tmp_path):
+    archive = Archive(tmp_path, width=40)
+    for i in range(10):
+        archive.append("cam0", NOON + 60 * i, frame(i))
+    times, frames = archive.frames_between("cam0", NOON + 120, NOON + 300)
+    assert [int(f[0, 0]) for f in frames] == [2, 3, 4]
+    assert list(times) == [NOON + 120, NOON + 180, NOON + 240]
+    assert isinstance(frames.base, np.memmap) or isinstance(frames, np.memmap)
+    assert archive.frames_between("cam1", NOON, NOON + 600)[1].shape[0] == 0
+
+
+def test_frames_out_of_order_are_refused(tmp_path):
+    archive = Archive(tmp_path)
+    assert archive.append("cam0", NOON, frame(1))
+    assert not archive.append("cam0", NOON, frame(2))
+    assert not Archive(tmp_path).append("cam0", NOON - 1, frame(3))      # after a restart too
+    assert len(archive.day("cam0", day_name(NOON)).times) == 1
+
+
+def test_ranges_over_several_days_are_joined(tmp_path):
+    archive = Archive(tmp_path, width=40)
+    day = 86400
+    for i in range(3):
+        archive.append("cam0", NOON + i * day, frame(i))
+    assert archive.days("cam0") == [day_name(NOON + i * day) for i in range(3)]
+    times, frames = archive.frames_between("cam0", NOON, NOON + 2 * day)
+    assert list(times) == [NOON, NOON + day] and frames.shape[0] == 2
+    assert archive.cameras() == ["cam0"]
+
+
+def test_a_frame_without_its_time_is_cut_off(tmp_path):
+    archive = Archive(tmp_path, width=40)
+    archive.append("cam0", NOON, frame(1))
+    name = day_name(NOON)
+    with open(tmp_path / "cam0" / f"{name}.frames", "ab") as f:
+        f.write(b"\x00" * 1000)           # crashed before writing the time
+    archive = Archive(tmp_path, width=40)
+    archive.append("cam0", NOON + 60, frame(2))
+    day = archive.day("cam0", name)
+    assert [int(f[0, 0]) for f in day.frames] == [1, 2]
+    assert os.path.getsize(tmp_path / "cam0" / f"{name}.frames") == 2 * day.frames[0].nbytes
+
+
+def test_two_writers_of_one_camera_keep_its_frames_in_order(tmp_path):
+    first, second = Archive(tmp_path), Archive(tmp_path)    # e.g. two worker processes
+    assert first.append("cam0", NOON, frame(1))
+    assert second.append("cam0", NOON + 60, frame(2))
+    assert not first.append("cam0", NOON + 30, frame(3))    # older than second's frame
+
+    def write(archive, offset):
+        for i in range(50):
+            archive.append("cam0", NOON + 120 + 2 * i + offset, frame(i))
+
+    threads = [threading.Thread(target=write, args=(a, o)) for a, o in ((first, 0), (second, 1))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    day = first.day("cam0", day_name(NOON))
+    assert len(day.frames) == len(day.times) and np.all(np.diff(day.times) > 0)
+    assert os.path.getsize(tmp_path / "cam0" / f"{day.day}.frames") == len(day.times) * day.frames[0].nbytes
@@ -0,0 +1,102 @@
+"""The monitor's tick path, on real video files."""
+import importlib.util
+import os
+import types
+from datetime import datetime
+
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+
+import bb_monitor  # noqa: E402
+import default_config  # noqa: E402
+from src import notifier  # noqa: E402
+from src.archive import Archive  # noqa: E402
+from src.fake_telegram import FakeTelegram  # noqa: E402
+from src.schedule import Tick  # noqa: E402
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_video(path, value=100):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 3, (64, 48))
+    writer.write(np.full((48, 64, 3), value, np.uint8))
+    writer.release()
+    return str(path)
+
+
+@pytest.fixture
+def cameras(tmp_path):
+    day = datetime.now().strftime("%Y-%m-%d")
+    return [write_video(tmp_path / day / cam / f"{cam}_{day}-12-00-00.avi", 60 * i + 60)
+            for i, cam in enumerate(("cam0", "cam1"))]
+
+
+def make_config(tmp_path, **settings):
+    return types.SimpleNamespace(
+        monitor_bot_name="Hive T", input_basedir=str(tmp_path), input_subdir_names=["cam0", "cam1"],
+        file_type="avi", frame_cache_mb=0, **settings)
+
+
+def test_a_tick_where_only_the_second_camera_changed_decodes_it_under_its_own_name(
+        tmp_path, cameras, capsys):
+    config = make_config(tmp_path, decode_workers=2, save_images=False,
+                         archive_dir=str(tmp_path / "archive"), timer_messagebot_multiplier=2)
+    tick = Tick(index=1, due=0.0, lag=0.0)      # not a sending tick
+    bb_monitor.run_tick(config, tick, cameras)
+    capsys.readouterr()
+
+    # cam0's deadline is impossible to meet: a cam1 video taken for cam0's times out.
+    config.decode_deadline_seconds = {"cam0": 1e-9, "cam1": 30}
+
+    day = datetime.now().strftime("%Y-%m-%d")
+    newer = write_video(tmp_path / f"cam1_{day}-12-05-00.avi", 200)
+    bb_monitor.run_tick(config, tick, [cameras[0], newer])
+    line = capsys.readouterr().out
+    assert "decode: cam1 " in line and "cam0" not in line and "timed out" not in line
+    assert len(Archive(str(tmp_path / "archive")).day("cam1", day).times) == 2
+
+
+def test_frames_are_archived_at_the_time_in_their_name(tmp_path, cameras):
+    config = make_config(tmp_path, save_images=False, archive_dir=str(tmp_path / "archive"),
+                         timer_messagebot_multiplier=2)
+    for path in cameras:
+        os.utime(path, (0, 0))          # an mtime rewritten by a copy
+    bb_monitor.run_tick(config, Tick(index=1, due=0.0, lag=0.0), cameras)
+    day = datetime.now().strftime("%Y-%m-%d")
+    (taken,) = Archive(str(tmp_path / "archive")).day("cam0", day).times
+    assert datetime.fromtimestamp(taken) == datetime.strptime(f"{day} 12:00", "%Y-%m-%d %H:%M")
+
+
+@pytest.fixture
+def real_mon(monkeypatch):
+    """The real src/mon.py in place of conftest's stub, with a notifier of its own."""
+    pytest.importorskip("requests")
+    spec = importlib.util.spec_from_file_location("real_mon", os.path.join(REPO_ROOT, "src", "mon.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    monkeypatch.setattr(bb_monitor, "mon", module)
+    monkeypatch.setattr(notifier, "_shared", notifier.Notifier(backoff_seconds=0.05))
+    return module
+
+
+def test_an_unchanged_sending_tick_sends_the_notice_and_no_photo(tmp_path, cameras, real_mon):
+    settings = {k: v for k, v in vars(default_config).items() if not k.startswith("_")}
+    with FakeTelegram() as server:
+        settings.update(monitor_bot_name="Hive T", input_basedir=str(tmp_path),
+                        input_subdir_names=["cam0", "cam1"], file_type="avi", frame_cache_mb=0,
+                        save_images=False, archive_dir=None, timer_messagebot_multiplier=1,
+                        unchanged_composite="notice", notify_spool_dir=None,
+                        telegram_api_url=server.url, telegram_bot_token="TOKEN",
+                        telegram_chat_id="42", telegram_retries=0)
+        config = types.SimpleNamespace(**settings)
+        tick = Tick(index=0, due=0.0, lag=0.0)
+        bb_monitor.run_tick(config, tick, cameras)
+        assert real_mon.wait_for_sends(10)
+        bb_monitor.run_tick(config, tick, cameras)      # the same videos again
+        assert real_mon.wait_for_sends(10)
+    photo, notice = server.received
+    assert photo.method == "sendPhoto"
+    assert notice.method == "sendMessage" and "no new video since" in notice.fields["text"]
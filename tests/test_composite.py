@@ -0,0 +1,105 @@
+"""Tests for the compositor: tiles shrunk before they are rotated, and the canvas
+the tiles are written into every tick."""
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+from src.composite import Canvas, fit_tile, label_thickness, layout_columns, rotate_image
+
+
+# The compositor's reference: what the monitor did before tiles were shrunk first
+# and written into a canvas.
+
+def resize_image(image, width):
+    """`image` resized to `width`, keeping its aspect ratio."""
+    height, original_width = image.shape[:2]
+    return cv2.resize(image, (width, int(height * width / float(original_width))),
+                      interpolation=cv2.INTER_AREA)
+
+
+def join_images(images):
+    """The images that are not None, stacked vertically; None if there are none."""
+    images = [img for img in images if img is not None]
+    return np.vstack(images) if images else None
+
+
+def _frame(height=300, width=400):
+    rng = np.random.default_rng(0)
+    # Smooth content, so shrinking before or after rotating gives the same pixels.
+    small = rng.integers(0, 255, (height // 50, width // 50, 3), dtype=np.uint8)
+    return cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR)
+
+
+@pytest.mark.parametrize("angle", [0, 90, 180, 270, -180])
+def test_fit_tile_matches_rotate_then_resize(angle):
+    frame = _frame()
+    expected = resize_image(rotate_image(frame, angle), width=100)
+    tile, scale = fit_tile(frame, 100, angle)
+    assert tile.shape == expected.shape
+    assert np.abs(tile.astype(int) - expected.astype(int)).max() <= 2
+    assert scale == pytest.approx(100 / (300 if angle % 360 in (90, 270) else 400))
+
+
+def test_fit_tile_never_draws_on_the_frame():
+    frame = _frame()
+    tile, _ = fit_tile(frame, 400, 0)      # already the right size
+    tile[...] = 0
+    assert frame.any()
+
+
+def test_label_thickness_follows_the_scale():
+    assert label_thickness(1.0) == 6
+    assert label_thickness(1024 / 3000) == 2
+    assert label_thickness(0.01) == 1
+
+
+def test_layout_columns():
+    assert layout_columns("vertical", 8) == 1
+    assert layout_columns("horizontal", 8) == 8
+    assert layout_columns("grid", 8, grid_columns=3) == 3
+    assert layout_columns("grid", 1, grid_columns=3) == 1
+    with pytest.raises(ValueError):
+        layout_columns("diagonal", 2)
+
+
+def test_canvas_grid_places_tiles_in_rows():
+    canvas = Canvas(columns=2)
+    tiles = [np.full((10, 20, 3), v, np.uint8) for v in (1, 2, 3)]
+    image = canvas.compose(tiles)
+    assert image.shape == (20, 40, 3)
+    assert (image[:10, :20] == 1).all() and (image[:10, 20:] == 2).all()
+    assert (image[10:, :20] == 3).all() and (image[10:, 20:] == 0).all()
+
+
+def test_canvas_vertical_matches_join_images():
+    tiles = [np.full((10, 20, 3), 1, np.uint8), None, np.full((5, 20, 3), 2, np.uint8)]
+    assert np.array_equal(Canvas().compose(tiles), join_images(tiles))
+    assert Canvas().compose([None, None]) is None
+
+
+def test_canvas_is_reused_and_fully_rewritten():
+    canvas = Canvas(columns=2)
+    first = canvas.compose([np.full((10, 20, 3), 9, np.uint8), np.full((6, 20, 3), 9, np.uint8)])
+    first[...] = 255                       # e.g. the bot name stamped over it
+    second = canvas.compose([np.full((10, 20, 3), 1, np.uint8), np.full((6, 20, 3), 2, np.uint8)])
+    assert second is first and canvas.allocations == 1
+    assert (second[:, 20:][6:] == 0).all()  # below the shorter tile
+    assert (second[:6, 20:] == 2).all()
+    canvas.compose([np.full((12, 20, 3), 1, np.uint8), None])
+    assert canvas.allocations == 2
+
+
+def test_canvas_stays_grey_until_a_colour_tile_arrives():
+    canvas = Canvas()
+    grey = np.full((4, 6), 7, np.uint8)
+    assert canvas.compose([grey, grey]).shape == (8, 6)
+    colour = np.full((4, 6, 3), 9, np.uint8)
+    image = canvas.compose([grey, colour])
+    assert image.shape == (8, 6, 3)
+    assert (image[:4] == 7).all() and (image[4:] == 9).all()
+
+
+def test_fit_tile_keeps_a_grey_frame_grey():
+    tile, _ = fit_tile(np.full((300, 400), 5, np.uint8), 100, 90)
+    assert tile.shape == (133, 100)
@@ -0,0 +1,138 @@
+"""Tests for the control socket, and the system check's use of it."""
+import socket
+import subprocess
+import threading
+import time
+import types
+from concurrent.futures import Future
+
+import pytest
+
+import bb_monitor_systemcheck as sc
+from src.control import BUSY, DIR_ENV, ControlServer, parse, request, socket_path
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix sockets")
+
+
+@pytest.fixture
+def control_dir(tmp_path, monkeypatch):
+    # Short: a Unix socket path is limited to about 100 bytes.
+    monkeypatch.setenv(DIR_ENV, str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def server():
+    calls = []
+
+    def handler(key, command):
+        calls.append((key, command, threading.current_thread().name))
+        if command == "boom":
+            raise RuntimeError("no frames")
+        return f"ok: {command} for {key}"
+
+    server = ControlServer(handler)
+    server.calls = calls
+    yield server
+    server.close()
+
+
+def test_socket_path_follows_the_config_file(control_dir, tmp_path):
+    config = tmp_path / "hive.py"
+    config.write_text("")
+    link = tmp_path / "link.py"
+    link.symlink_to(config)
+    assert socket_path(str(link)) == socket_path(str(config))
+    assert socket_path(str(config)).startswith(str(control_dir))
+    assert socket_path(str(config)) != socket_path(str(tmp_path / "other.py"))
+
+
+def test_commands_are_answered_on_the_servers_thread(control_dir, server):
+    path = socket_path("/cfg/hive.py")
+    assert server.listen("hive", path)
+    assert request(path, "send") == "ok: send for hive"
+    assert request(path, "boom") == "error: no frames"
+    assert [c[:2] for c in server.calls] == [("hive", "send"), ("hive", "boom")]
+    assert server.calls[0][2].startswith("control-")
+
+
+def test_nothing_listening_is_none(control_dir, server):
+    path = socket_path("/cfg/hive.py")
+    assert request(path, "send") is None
+    server.listen("hive", path)
+    server.close()
+    assert request(path, "send") is None
+
+
+def test_a_stale_socket_file_is_replaced(control_dir, server):
+    path = socket_path("/cfg/hive.py")
+    dead = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    dead.bind(path)
+    dead.close()        # the file stays, with nobody listening: a crashed monitor's
+    assert request(path, "ping") is None
+    assert server.listen("hive", path)
+    assert request(path, "ping") == "ok: ping for hive"
+
+
+def test_a_second_monitor_does_not_take_over(control_dir, server):
+    path = socket_path("/cfg/hive.py")
+    assert server.listen("first", path)
+    second = ControlServer(lambda key, command: "ok: second")
+    assert not second.listen("second", path)
+    assert request(path, "ping") == "ok: ping for first"
+
+
+def test_systemcheck_asks_the_running_monitor_and_spawns_for_the_others(control_dir, server, monkeypatch):
+    spawned = []
+    monkeypatch.setattr(sc.config, "systemcheck_trigger_monitor_configs", ["/cfg/a.py", "/cfg/b.py"],
+                        raising=False)
+    monkeypatch.setattr(subprocess, "run", lambda args, **kwargs: spawned.append(args[-1]))
+    server.listen("a", socket_path("/cfg/a.py"))
+    sc._trigger_monitor_images()
+    assert [c[:2] for c in server.calls] == [("a", "send 30")]      # half the default 60s
+    assert spawned == ["/cfg/b.py"]
+
+
+def test_systemcheck_spawns_only_when_the_monitor_does_not_answer(control_dir, monkeypatch):
+    spawned = []
+    monkeypatch.setattr(sc.config, "systemcheck_trigger_monitor_configs", ["/cfg/boom.py", "/cfg/hung.py"],
+                        raising=False)
+    monkeypatch.setattr(sc.config, "systemcheck_trigger_timeout_seconds", 0.4, raising=False)
+    monkeypatch.setattr(subprocess, "run", lambda args, **kwargs: spawned.append((args[-1], kwargs["timeout"])))
+    failing = ControlServer(lambda key, command: "error: no frames")
+    failing.listen("boom", socket_path("/cfg/boom.py"))
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as hung:
+        hung.bind(socket_path("/cfg/hung.py"))
+        hung.listen()       # accepts connections, never answers
+        sc._trigger_monitor_images()
+    failing.close()
+    (path, timeout), = spawned      # "error: no frames" is the monitor's answer, not a reason to spawn
+    assert path == "/cfg/hung.py" and timeout <= 0.2 + 0.05     # what the wait left of the 0.4s
+
+
+def test_a_send_with_seconds_must_start_within_half_and_be_answered_before_the_end():
+    now = time.time()
+    name, start_by, answer_by = parse("send 30")
+    assert name == "send"
+    assert abs(start_by - (now + 15)) < 1 and abs(answer_by - (now + 28)) < 1
+    assert parse("send") == ("send", None, None) and parse("ping")[1:] == (None, None)
+
+
+def test_a_busy_monitor_answers_busy_in_time(monkeypatch):
+    pytest.importorskip("cv2")
+    import bb_monitor
+    import bb_monitor_multi as multi
+
+    config = types.SimpleNamespace(monitor_bot_name="Hive T")
+    with bb_monitor._tick_lock:         # a tick that runs on and on
+        t0 = time.monotonic()
+        assert bb_monitor.handle_control(config, "send 0.4") == BUSY
+        assert time.monotonic() - t0 < 0.4
+
+    hung = Future()
+    dispatcher = types.SimpleNamespace(call=lambda lane, fn, *args: hung)
+    monkeypatch.setitem(multi._launcher_configs, "/cfg/a.py", config)
+    monkeypatch.setattr(multi, "_latest_videos", lambda path, tick: None)
+    t0 = time.monotonic()
+    assert multi._controller(dispatcher, {"/cfg/a.py": 0})("/cfg/a.py", "send 1") == BUSY
+    assert time.monotonic() - t0 < 1 and hung.cancelled()
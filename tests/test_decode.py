@@ -0,0 +1,94 @@
+"""Tests for parallel first-frame decoding with per-camera deadlines."""
+import threading
+import time
+
+from src.decode import Decoded, Extraction, FrameDecoder, latency_report
+
+
+def slow_extract(delays, calls=None):
+    def extract(path):
+        if calls is not None:
+            calls.append(path)
+        time.sleep(delays.get(path, 0))
+        return f"frame:{path}"
+    return extract
+
+
+def test_serial_mode_decodes_every_path_in_turn():
+    decoder = FrameDecoder(slow_extract({}), workers=0)
+    results = decoder.decode(["a", "b", None, "a"])
+    assert list(results) == ["a", "b"]
+    assert results["a"].frame == "frame:a"
+    assert not results["a"].timed_out
+
+
+def test_cameras_decode_side_by_side():
+    decoder = FrameDecoder(slow_extract({"a": 0.3, "b": 0.3, "c": 0.3}), workers=3,
+                           deadline_seconds=5)
+    t0 = time.monotonic()
+    results = decoder.decode(["a", "b", "c"])
+    assert time.monotonic() - t0 < 0.8
+    assert all(r.frame for r in results.values())
+    decoder.shutdown()
+
+
+def test_a_slow_camera_times_out_without_holding_up_the_others():
+    release = threading.Event()
+
+    def extract(path):
+        if path == "stuck":
+            release.wait(5)
+        return f"frame:{path}"
+
+    decoder = FrameDecoder(extract, workers=2, deadline_seconds=0.2)
+    t0 = time.monotonic()
+    results = decoder.decode(["stuck", "ok"])
+    assert time.monotonic() - t0 < 1
+    assert results["stuck"] == Decoded(None, None, timed_out=True)
+    assert results["ok"].frame == "frame:ok"
+    release.set()
+    decoder.shutdown()
+
+
+def test_a_per_camera_deadline_overrides_the_default():
+    decoder = FrameDecoder(slow_extract({"a": 0.3}), workers=2, deadline_seconds=0.05)
+    results = decoder.decode(["a"], deadlines={"a": 2})
+    assert results["a"].frame == "frame:a"
+    decoder.shutdown()
+
+
+def test_an_overrun_is_picked_up_next_tick_instead_of_decoding_again():
+    calls = []
+    decoder = FrameDecoder(slow_extract({"a": 0.3}, calls), workers=2, deadline_seconds=0.05)
+    assert decoder.decode(["a"])["a"].timed_out
+    time.sleep(0.4)
+    assert decoder.decode(["a"])["a"].frame == "frame:a"
+    assert calls == ["a"]
+    decoder.shutdown()
+
+
+def test_an_exception_in_the_decoder_is_a_failed_camera():
+    def extract(path):
+        raise RuntimeError("boom")
+
+    for workers in (0, 2):
+        decoder = FrameDecoder(extract, workers=workers, deadline_seconds=1)
+        assert decoder.decode(["a"])["a"] == Decoded(None, None)
+        decoder.shutdown()
+
+
+def test_an_extraction_carries_bytes_and_backend_through():
+    decoder = FrameDecoder(lambda path: Extraction("f", "ffmpeg", 0.1, 1_300_000))
+    result = decoder.decode(["a"])["a"]
+    assert (result.frame, result.bytes_read, result.backend) == ("f", 1_300_000, "ffmpeg")
+    assert latency_report({"a": result._replace(seconds=0.212)}, {"a": "cam0"}) \
+        == "cam0 212ms 1.3MB ffmpeg"
+
+
+def test_latency_report_names_each_camera():
+    report = latency_report({
+        "/v/a.avi": Decoded("f", 0.4123),
+        "/v/b.avi": Decoded(None, None, timed_out=True),
+        "/v/c.avi": Decoded(None, 0.01),
+    }, {"/v/a.avi": "cam0", "/v/b.avi": "cam1", "/v/c.avi": "cam2"})
+    assert report == "cam0 412ms, cam1 timed out, cam2 10ms (no frame)"
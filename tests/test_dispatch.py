@@ -0,0 +1,196 @@
+"""Tests for the multi-config dispatcher, with threads standing in for lane processes."""
+import os
+import threading
+import time
+from concurrent.futures import BrokenExecutor, ThreadPoolExecutor
+
+from src.dispatch import Dispatcher, default_workers, group_lanes, process_lane, sharing_lanes
+from src.schedule import Ticker
+
+INTERVAL = 0.05
+
+
+def thread_lane(number):
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"lane{number}")
+
+
+def until(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    return lambda: predicate() or time.monotonic() > deadline
+
+
+class Recorder:
+    def __init__(self, fail=()):
+        self.calls = []
+        self.running = set()
+        self.overlaps = 0
+        self.fail = dict(fail)          # label -> exception to raise that many times
+        self.lock = threading.Lock()
+
+    def __call__(self, label, tick):
+        with self.lock:
+            if label in self.running:
+                self.overlaps += 1
+            self.running.add(label)
+            self.calls.append((label, threading.current_thread().name, time.monotonic()))
+            error = self.fail.get(label)
+            if error is not None and error[1] > 0:
+                self.fail[label] = (error[0], error[1] - 1)
+        time.sleep(0.01)
+        with self.lock:
+            self.running.discard(label)
+        if error is not None and error[1] > 0:
+            raise error[0]
+
+    def count(self, label):
+        return sum(1 for c in self.calls if c[0] == label)
+
+
+def test_every_config_ticks_on_its_own_lane():
+    job = Recorder()
+    dispatcher = Dispatcher(job, workers=2, make_lane=thread_lane)
+    for label in ("a", "b", "c"):
+        dispatcher.add(label, Ticker(INTERVAL), label)
+    dispatcher.run(stop=until(lambda: min(job.count(x) for x in "abc") >= 3))
+    dispatcher.close()
+    assert min(job.count(x) for x in "abc") >= 3
+    lanes = {label: {name.rsplit("_", 1)[0] for lbl, name, _ in job.calls if lbl == label} for label in "abc"}
+    assert lanes == {"a": {"lane0"}, "b": {"lane1"}, "c": {"lane0"}}
+    assert job.overlaps == 0
+
+
+def test_a_failing_config_backs_off_and_recovers():
+    job = Recorder(fail={"bad": (RuntimeError("boom"), 2)})
+    dispatcher = Dispatcher(job, workers=1, make_lane=thread_lane, backoff_seconds=0.1)
+    dispatcher.add("bad", Ticker(0.01), "bad")
+    dispatcher.run(stop=until(lambda: job.count("bad") >= 4))
+    dispatcher.close()
+    times = [t for _, _, t in job.calls]
+    assert dispatcher.failed == 2
+    assert times[1] - times[0] >= 0.1 - 0.02          # first back-off
+    assert times[2] - times[1] >= 0.2 - 0.02          # doubled
+
+
+def test_a_broken_lane_is_replaced():
+    job = Recorder(fail={"a": (BrokenExecutor("worker died"), 1)})
+    made = []
+
+    def make_lane(number):
+        made.append(number)
+        return thread_lane(number)
+
+    dispatcher = Dispatcher(job, workers=1, make_lane=make_lane, backoff_seconds=0.01)
+    dispatcher.add("a", Ticker(0.01), "a")
+    dispatcher.run(stop=until(lambda: job.count("a") >= 2))
+    dispatcher.close()
+    assert dispatcher.restarts == 1 and made == [0, 0]
+
+
+def hang_on_the_first_tick(log, tick):
+    """A job for a real lane process: notes its pid in `log`, then never returns
+    the first time."""
+    first = not os.path.exists(log)
+    with open(log, "a") as f:
+        f.write(f"{os.getpid()}\n")
+    if first:
+        time.sleep(3600)
+
+
+def test_a_tick_that_never_returns_is_killed_with_its_lane(tmp_path):
+    log = str(tmp_path / "pids")
+    pids = lambda: open(log).read().split() if os.path.exists(log) else []
+    dispatcher = Dispatcher(hang_on_the_first_tick, workers=1, make_lane=process_lane,
+                            backoff_seconds=0, tick_timeout=1)
+    dispatcher.add("hung", Ticker(INTERVAL), log)
+    dispatcher.run(stop=until(lambda: len(pids()) >= 3, timeout=60))
+    dispatcher.close()
+    hung, *after = pids()
+    assert dispatcher.timed_out == dispatcher.failed == dispatcher.restarts == 1
+    assert len(after) >= 2 and hung not in after
+
+
+def test_ticks_queued_behind_a_hung_one_move_to_the_new_lane():
+    release = threading.Event()
+    ran = []
+
+    def job(label, tick):
+        if label == "hung" and not ran:
+            ran.append(label)
+            release.wait(30)
+        else:
+            ran.append(label)
+
+    dispatcher = Dispatcher(job, workers=1, make_lane=thread_lane, backoff_seconds=0.01,
+                            tick_timeout=0.2)
+    dispatcher.add("hung", Ticker(INTERVAL), "hung")
+    dispatcher.add("waiting", Ticker(INTERVAL), "waiting")
+    dispatcher.run(stop=until(lambda: ran.count("waiting") >= 2 and ran.count("hung") >= 2))
+    dispatcher.close()
+    release.set()
+    assert ran.count("waiting") >= 2 and ran.count("hung") >= 2
+    assert dispatcher.timed_out == dispatcher.failed == dispatcher.restarts == 1
+
+
+def test_a_prepare_that_never_returns_is_reported_and_the_others_carry_on():
+    release = threading.Event()
+    prepared, ran = [], []
+
+    def prepare(label, tick):
+        first = label not in prepared
+        prepared.append(label)
+        if label == "stuck" and first:
+            release.wait(30)
+        return label
+
+    dispatcher = Dispatcher(lambda label, tick, videos: ran.append(label), workers=1,
+                            make_lane=thread_lane, prepare=prepare, prepare_workers=1,
+                            backoff_seconds=0.01, tick_timeout=0.2)
+    dispatcher.add("stuck", Ticker(INTERVAL), "stuck")
+    dispatcher.add("other", Ticker(INTERVAL), "other")
+    dispatcher.run(stop=until(lambda: ran.count("stuck") >= 1 and ran.count("other") >= 3))
+    dispatcher.close()
+    release.set()
+    assert ran.count("stuck") >= 1 and ran.count("other") >= 3
+    assert dispatcher.timed_out == dispatcher.failed == 1 and dispatcher.restarts == 0
+
+
+def test_default_workers():
+    assert default_workers(1) == 1
+    assert 1 <= default_workers(1000) <= 1000
+
+
+def test_prepare_runs_in_the_launcher_and_its_result_is_passed_on():
+    seen = []
+    prepared_on = []
+
+    def prepare(label, tick):
+        prepared_on.append(threading.current_thread().name)
+        if len(prepared_on) == 1:
+            raise OSError("stale mount")
+        return f"videos of {label}"
+
+    dispatcher = Dispatcher(lambda label, tick, videos: seen.append(videos), workers=1,
+                            make_lane=thread_lane, prepare=prepare, backoff_seconds=0.01)
+    dispatcher.add("a", Ticker(0.01), "a")
+    dispatcher.run(stop=until(lambda: len(seen) >= 2))
+    dispatcher.close()
+    assert seen[:2] == ["videos of a"] * 2
+    assert dispatcher.failed == 1
+    assert all(name.startswith("prepare") for name in prepared_on)
+
+
+def test_configs_sharing_a_camera_share_a_lane():
+    keys = [{"hive/cam0", "hive/cam1"}, {"feeder/cam0"}, {"hive/cam1", "hive/cam2"},
+            {"exit/cam0"}, {"hive/cam2"}]
+    lanes = group_lanes(keys, workers=2)
+    assert lanes[0] == lanes[2] == lanes[4]
+    assert lanes[1] == lanes[3] != lanes[0]      # the two singles balance the group of three
+    assert group_lanes([{"a"}, {"b"}, {"c"}], workers=3) == [0, 1, 2]
+
+
+def test_an_overview_of_every_camera_does_not_pull_all_configs_onto_its_lane():
+    keys = [{f"cam{i}"} for i in range(8)] + [{f"cam{i}" for i in range(8)}]
+    lanes = group_lanes(keys, workers=4)
+    assert max(lanes.count(n) for n in range(4)) == 3
+    assert lanes.count(lanes[8]) == 3           # the overview and two of its cameras
+    assert sharing_lanes(keys, lanes) == {lanes[8]}
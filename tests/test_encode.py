@@ -0,0 +1,86 @@
+"""Tests for encoding the composite in memory."""
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+from src.encode import AdaptiveEncoder, encode_image  # noqa: E402
+
+
+def _composite():
+    rng = np.random.default_rng(1)
+    noise = rng.integers(0, 40, (240, 320, 3), dtype=np.uint8)
+    return cv2.GaussianBlur(noise, (5, 5), 0) + 100
+
+
+def test_png_is_what_imwrite_would_have_written(tmp_path):
+    image = _composite()
+    data, extension, mime = encode_image(image)
+    assert (extension, mime) == (".png", "image/png")
+    decoded = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED)
+    assert np.array_equal(decoded, image)
+
+
+@pytest.mark.parametrize("image_format", ["jpeg", "webp"])
+def test_lossy_formats_are_smaller_and_close(image_format):
+    image = _composite()
+    png, _, _ = encode_image(image, "png")
+    data, _, _ = encode_image(image, image_format, quality=80)
+    assert len(data) < len(png)
+    decoded = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    assert np.abs(decoded.astype(int) - image.astype(int)).mean() < 5
+
+
+def test_a_grey_image_stays_single_channel():
+    image = np.full((48, 64), 80, np.uint8)
+    data, _, _ = encode_image(image, "png")
+    assert cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED).shape == (48, 64)
+
+
+def test_an_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        encode_image(_composite(), "gif")
+
+
+def _noisy(height=480, width=640, seed=2):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 255, (height, width), dtype=np.uint8)
+
+
+def test_adaptive_encoding_fits_the_budget_and_remembers_it():
+    encoder = AdaptiveEncoder("jpeg")
+    image = _noisy()
+    full, _, _ = encode_image(image, "jpeg", 95)
+    budget = len(full) // 2
+    data, extension, _ = encoder.encode(image, budget)
+    assert extension == ".jpg" and len(data) <= budget
+    assert encoder.min_quality <= encoder.quality < 95 and encoder.scale == 1.0
+    encodes = encoder.encodes
+    assert len(encoder.encode(_noisy(seed=3), budget)[0]) <= budget
+    assert encoder.encodes == encodes + 1 and encoder.searches == 1
+
+
+def test_adaptive_encoding_shrinks_when_quality_is_not_enough():
+    encoder = AdaptiveEncoder("jpeg")
+    image = _noisy()
+    smallest, _, _ = encode_image(image, "jpeg", encoder.min_quality)
+    data, _, _ = encoder.encode(image, len(smallest) // 3)
+    assert len(data) <= len(smallest) // 3 and encoder.scale < 1.0
+
+
+def test_adaptive_png_only_changes_resolution():
+    encoder = AdaptiveEncoder("png")
+    image = _noisy()
+    data, extension, _ = encoder.encode(image, len(encode_image(image)[0]) // 2)
+    assert extension == ".png" and encoder.quality is None and encoder.scale < 1.0
+    decoded = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED)
+    assert decoded.shape[1] == int(640 * encoder.scale)
+
+
+def test_a_roomy_budget_goes_back_to_full_quality():
+    encoder = AdaptiveEncoder("jpeg")
+    image = _noisy()
+    encoder.encode(image, len(encode_image(image, "jpeg", 95)[0]) // 3)
+    assert encoder.scale < 1.0 or encoder.quality < 95
+    encoder.encode(image, 10_000_000)
+    assert (encoder.quality, encoder.scale) == (95, 1.0)
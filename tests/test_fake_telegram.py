@@ -0,0 +1,147 @@
+"""The real src/mon.py send path, end to end against the local fake Bot API.
+
+conftest.py replaces `src.mon` with a stub for the system-check tests, so the real
+module is loaded here under another name.
+"""
+import importlib.util
+import os
+import time
+import types
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+pytest.importorskip("requests")
+
+from src import notifier  # noqa: E402
+from src.fake_telegram import FakeTelegram  # noqa: E402
+from src.telegram import TelegramClient  # noqa: E402
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="module")
+def mon():
+    spec = importlib.util.spec_from_file_location("real_mon", os.path.join(REPO_ROOT, "src", "mon.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def server():
+    with FakeTelegram() as server:
+        yield server
+
+
+@pytest.fixture
+def config(server, monkeypatch):
+    # A notifier of its own per test, so one test's spool or queue cannot leak.
+    monkeypatch.setattr(notifier, "_shared", notifier.Notifier(backoff_seconds=0.05))
+    return types.SimpleNamespace(
+        monitor_bot_name="Hive X", telegram_bot_token="TOKEN", telegram_chat_id="42",
+        telegram_api_url=server.url, telegram_retries=0, telegram_read_timeout_seconds=5,
+    )
+
+
+def test_send_message(mon, server, config):
+    assert mon.send_message(config, "hello") is True
+    (received,) = server.received
+    assert (received.token, received.method) == ("TOKEN", "sendMessage")
+    assert received.fields == {"chat_id": "42", "text": "Hive X:  hello"}
+
+
+def test_a_long_message_arrives_in_pieces(mon, server, config):
+    text = "\n".join(f"- finding {i:04d}" for i in range(600))
+    assert mon.send_message(config, text) is True
+    assert len(server.received) > 1
+    assert all(len(r.fields["text"]) <= 4096 for r in server.received)
+
+
+def test_process_image_and_send_uploads_the_encoded_image(mon, server, config):
+    image = np.full((60, 80), 90, np.uint8)
+    config.image_format = "jpeg"
+    assert mon.process_image_and_send(config, image) is True
+    (received,) = server.received
+    assert received.method == "sendPhoto" and received.fields["chat_id"] == "42"
+    decoded = cv2.imdecode(np.frombuffer(received.photo, np.uint8), cv2.IMREAD_UNCHANGED)
+    assert decoded.shape == (60, 80)
+
+
+def test_send_photo_from_a_file(mon, server, config, tmp_path):
+    path = tmp_path / "frame.png"
+    cv2.imwrite(str(path), np.zeros((8, 8, 3), np.uint8))
+    assert mon.send_photo(config, str(path))["ok"] is True
+    assert server.received[0].photo == path.read_bytes()
+
+
+def test_a_rate_limited_send_is_retried(mon, server, config):
+    server.rate_limit(count=1, retry_after=0.05)
+    assert mon.send_message(config, "hi") is True
+    assert server.requests == 2 and len(server.received) == 1
+
+
+def test_a_server_error_is_not_confirmed(mon, server, config):
+    server.fail(count=1)
+    assert mon.send_message(config, "hi") is False
+
+
+def test_the_pooled_client_keeps_one_connection(server):
+    client = TelegramClient(server.url)
+    for _ in range(5):
+        assert client.call("TOKEN", "sendMessage", data={"chat_id": 1, "text": "x"})["ok"]
+    assert server.connections == 1
+
+
+def test_get_updates(server):
+    server.push_update("/status")
+    client = TelegramClient(server.url)
+    updates = client.call("TOKEN", "getUpdates", data={"offset": 1})["result"]
+    assert [u["message"]["text"] for u in updates] == ["/status"]
+    assert client.call("TOKEN", "getUpdates", data={"offset": 2})["result"] == []
+
+
+def test_a_byte_budget_caps_the_upload(mon, server, config):
+    rng = np.random.default_rng(0)
+    image = rng.integers(0, 255, (300, 400), dtype=np.uint8)
+    config.image_format, config.image_max_bytes = "jpeg", 30_000
+    assert mon.process_image_and_send(config, image) is True
+    assert len(server.received[0].photo) <= 30_000
+
+
+def test_a_late_reply_fails_the_send_and_is_not_spooled(mon, server, config, monkeypatch, tmp_path):
+    requests = pytest.importorskip("requests")
+    from src.spool import Spool
+    monkeypatch.setattr(notifier, "_shared", notifier.Notifier(spool=Spool(tmp_path), backoff_seconds=0.05))
+    config.telegram_read_timeout_seconds = 0.2
+    server.latency = 0.5            # the request arrives, the reply comes too late
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        mon.send_message_async(config, "All systems OK").result(timeout=5)
+    server.latency = 0
+    assert len(notifier.shared().spool) == 0
+    assert mon.send_message(config, "next") is True
+    time.sleep(0.5)                 # until the late request has been answered
+    assert sorted(r.fields["text"] for r in server.received) == ["Hive X:  All systems OK", "Hive X:  next"]
+
+
+def test_a_connection_dropped_after_the_request_is_not_spooled(mon, server, config, monkeypatch, tmp_path):
+    requests = pytest.importorskip("requests")
+    from src.spool import Spool
+    from src.telegram import unreached
+    monkeypatch.setattr(notifier, "_shared", notifier.Notifier(spool=Spool(tmp_path), backoff_seconds=0.05))
+    server.drop(1)                  # the request is read, then the connection closed
+    with pytest.raises(requests.exceptions.ConnectionError) as e:
+        mon.send_message_async(config, "All systems OK").result(timeout=5)
+    assert server.requests == 1 and not unreached(e.value)
+    assert len(notifier.shared().spool) == 0
+
+
+def test_a_refused_connection_never_reached_telegram(server):
+    requests = pytest.importorskip("requests")
+    from src.telegram import unreached
+    url = server.url
+    server.stop()
+    with pytest.raises(requests.exceptions.ConnectionError) as e:
+        TelegramClient(url, retries=0).call("TOKEN", "getMe", connect_timeout=2)
+    assert unreached(e.value)
@@ -0,0 +1,83 @@
+"""Tests for the first-frame backends: every backend must produce the same frame as
+cv2.VideoCapture, or fall back to it."""
+import shutil
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+from src.first_frame import is_grey, read_first_frame, to_grayscale  # noqa: E402
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = str(tmp_path / "cam0_2026-07-10-12-00-00.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 5, (64, 48))
+    for value in (50, 150, 250):
+        writer.write(np.full((48, 64, 3), value, np.uint8))
+    writer.release()
+    return path
+
+
+def test_opencv_reads_the_first_frame_and_counts_bytes(video):
+    result = read_first_frame(video, backend="opencv")
+    assert result.frame.shape == (48, 64, 3)
+    assert abs(int(result.frame.mean()) - 50) < 5
+    assert result.backend == "opencv"
+    if result.bytes_read is not None:       # Linux only
+        assert result.bytes_read > 0
+
+
+def test_an_unreadable_file_gives_no_frame(tmp_path):
+    path = tmp_path / "broken.avi"
+    path.write_bytes(b"not a video")
+    assert read_first_frame(str(path)).frame is None
+
+
+def test_ffmpeg_falls_back_to_opencv_when_it_cannot_help(video, monkeypatch):
+    monkeypatch.setattr(shutil, "which", lambda name: None)
+    result = read_first_frame(video, backend="ffmpeg")
+    assert result.backend == "ffmpeg->opencv"
+    assert result.frame.shape == (48, 64, 3)
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_ffmpeg_matches_opencv(video):
+    fast = read_first_frame(video, backend="ffmpeg")
+    assert fast.backend == "ffmpeg"
+    assert fast.frame.shape == (48, 64, 3)
+    assert abs(int(fast.frame.mean()) - 50) < 5
+
+
+def test_an_unknown_backend_is_rejected(video):
+    with pytest.raises(ValueError):
+        read_first_frame(video, backend="gstreamer")
+
+
+def test_grayscale_auto_keeps_a_grey_frame_as_one_channel(video):
+    result = read_first_frame(video, grayscale="auto")
+    assert result.frame.shape == (48, 64)
+    assert abs(int(result.frame.mean()) - 50) < 5
+
+
+def test_grayscale_auto_leaves_colour_alone():
+    frame = np.zeros((48, 64, 3), np.uint8)
+    frame[:, :, 2] = 200
+    assert to_grayscale(frame, "auto") is frame
+    assert to_grayscale(frame, "always").shape == (48, 64)
+    assert to_grayscale(frame, "never") is frame
+    assert to_grayscale(None, "always") is None
+
+
+def test_grayscale_auto_tolerates_chroma_noise():
+    frame = np.full((48, 64, 3), 100, np.uint8)
+    frame[::3, ::5, 1] = 101
+    assert is_grey(frame)
+    frame[40, 60, 0] = 120           # one colour pixel the sample does not see
+    assert not is_grey(frame)
+
+
+def test_an_unknown_grayscale_mode_is_rejected(video):
+    with pytest.raises(ValueError):
+        read_first_frame(video, grayscale="sepia")
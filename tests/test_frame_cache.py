@@ -0,0 +1,110 @@
+"""Tests for the process-wide cache of decoded first frames."""
+import threading
+import time
+import types
+
+import numpy as np
+import pytest
+
+from src import frame_cache
+from src.decode import Extraction
+from src.frame_cache import FrameCache
+
+MB = 2**20
+
+
+def extraction(value, nbytes=MB):
+    return Extraction(np.full(nbytes, value, np.uint8), "opencv", 0.1, bytes_read=5000)
+
+
+def test_a_hit_is_served_without_decoding():
+    cache = FrameCache(10 * MB)
+    loads = []
+    first = cache.get("k", lambda: loads.append(1) or extraction(1))
+    again = cache.get("k", lambda: loads.append(1) or extraction(2))
+    assert loads == [1]
+    assert again.frame is first.frame and again.backend == "cache" and again.bytes_read == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_cached_frames_are_read_only():
+    cache = FrameCache(10 * MB)
+    frame = cache.get("k", lambda: extraction(1)).frame
+    with pytest.raises(ValueError):
+        frame[0] = 2
+
+
+def test_least_recently_used_frames_are_evicted_at_the_cap():
+    cache = FrameCache(3 * MB)
+    for key in "abc":
+        cache.get(key, lambda: extraction(1))
+    cache.get("a", lambda: extraction(1))           # a is now the most recent
+    cache.get("d", lambda: extraction(1))
+    assert cache.evictions == 1 and cache.nbytes == 3 * MB
+    loads = []
+    cache.get("a", lambda: loads.append("a") or extraction(1))
+    cache.get("b", lambda: loads.append("b") or extraction(1))
+    assert loads == ["b"]
+
+
+def test_failures_and_oversized_frames_are_not_cached():
+    cache = FrameCache(MB)
+    cache.get("none", lambda: Extraction(None, "opencv", 0.1))
+    cache.get("big", lambda: extraction(1, 2 * MB))
+    with pytest.raises(OSError):
+        cache.get("error", lambda: (_ for _ in ()).throw(OSError("gone")))
+    assert len(cache) == 0 and cache.nbytes == 0
+
+
+def test_concurrent_requests_share_one_decode():
+    cache = FrameCache(10 * MB)
+    started = threading.Event()
+    loads = []
+
+    def slow():
+        loads.append(1)
+        started.set()
+        time.sleep(0.1)
+        return extraction(7)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("k", slow))) for _ in range(4)]
+    threads[0].start()
+    started.wait(5)
+    for t in threads[1:]:
+        t.start()
+    for t in threads:
+        t.join()
+    assert loads == [1] and cache.waits == 3
+    assert all(r.frame[0] == 7 for r in results)
+
+
+def test_wrap_keys_by_file_version_and_options(tmp_path):
+    video = tmp_path / "a.avi"
+    video.write_bytes(b"x")
+    cache = FrameCache(10 * MB)
+    loads = []
+
+    def extract(path):
+        loads.append(path)
+        return extraction(len(loads))
+
+    grey, colour = cache.wrap(extract, variant=("grey",)), cache.wrap(extract, variant=("colour",))
+    grey(str(video))
+    grey(str(video))
+    colour(str(video))
+    assert len(loads) == 2
+    video.write_bytes(b"xy")            # the video grew
+    grey(str(video))
+    assert len(loads) == 3
+    assert "1 hits, 3 misses" in cache.report()
+
+
+def test_the_shared_cache_is_off_unless_configs_share_a_camera(monkeypatch):
+    monkeypatch.setattr(frame_cache, "_shared", None)
+    monkeypatch.setattr(frame_cache, "_default_mb", 0)
+    config = types.SimpleNamespace(frame_cache_mb=None)
+    assert frame_cache.shared(config) is None
+    frame_cache.share_by_default(1)
+    assert frame_cache.shared(config).max_bytes == 2**20
+    assert frame_cache.shared(types.SimpleNamespace(frame_cache_mb=0)) is None     # off for this one
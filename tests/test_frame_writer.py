@@ -0,0 +1,90 @@
+"""Tests for the background writer of save_images frames."""
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from src import frame_writer
+from src.frame_writer import FrameWriter, frame_hash
+
+
+def frame(value, shape=(48, 64)):
+    return np.full(shape, value, np.uint8)
+
+
+def test_frames_are_written_in_the_chosen_format(tmp_path):
+    writer = FrameWriter("jpeg", quality=80)
+    writer.save("cam0", str(tmp_path / "cam0"), "video_1", frame(100))
+    assert writer.flush(10)
+    path = tmp_path / "cam0" / "video_1.jpg"
+    assert cv2.imread(str(path), cv2.IMREAD_GRAYSCALE).shape == (48, 64)
+    assert writer.written == 1
+    assert not [n for n in os.listdir(tmp_path / "cam0") if n.endswith(".tmp")]
+
+
+def test_identical_frames_are_not_written_again(tmp_path):
+    writer = FrameWriter()
+    writer.save("cam0", str(tmp_path), "a", frame(1))
+    writer.save("cam0", str(tmp_path), "b", frame(1))
+    writer.save("cam1", str(tmp_path), "c", frame(1))     # another camera's
+    writer.save("cam0", str(tmp_path), "d", frame(2))
+    assert writer.flush(10)
+    assert sorted(os.listdir(tmp_path)) == ["a.png", "c.png", "d.png"]
+    assert writer.duplicates == 1 and writer.written == 3
+
+
+def test_directories_are_made_once(tmp_path, monkeypatch):
+    made = []
+    real = os.makedirs
+    monkeypatch.setattr(frame_writer.os, "makedirs", lambda p, **kw: (made.append(p), real(p, **kw)))
+    writer = FrameWriter(workers=1)
+    for i in range(3):
+        writer.save("cam0", str(tmp_path / "cam0"), f"v{i}", frame(i))
+    assert writer.flush(10)
+    assert made == [str(tmp_path / "cam0")]
+
+
+def test_a_full_queue_drops_the_oldest_frame(tmp_path, monkeypatch):
+    release = threading.Event()
+    real = frame_writer.encode_image
+
+    def slow_encode(*args):
+        release.wait(10)
+        return real(*args)
+
+    monkeypatch.setattr(frame_writer, "encode_image", slow_encode)
+    writer = FrameWriter(workers=1, queue_size=2)
+    writer.save("cam0", str(tmp_path), "busy", frame(0))
+    while not writer._busy_slots:       # the thread has taken "busy"
+        time.sleep(0.001)
+    for i in range(1, 4):
+        writer.save("cam0", str(tmp_path), f"v{i}", frame(i))
+    release.set()
+    assert writer.flush(10)
+    assert writer.dropped == 1
+    assert sorted(os.listdir(tmp_path)) == ["busy.png", "v2.png", "v3.png"]
+
+
+def test_a_failed_write_is_counted_and_the_writer_goes_on(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("not a directory")
+    writer = FrameWriter()
+    writer.save("cam0", str(blocker / "cam0"), "a", frame(1))
+    writer.save("cam1", str(tmp_path / "cam1"), "b", frame(1))
+    assert writer.flush(10)
+    assert writer.failed == 1 and writer.written == 1
+
+
+def test_hash_depends_on_shape_and_pixels():
+    assert frame_hash(frame(1)) == frame_hash(frame(1))
+    assert frame_hash(frame(1)) != frame_hash(frame(2))
+    assert frame_hash(frame(1, (64, 48))) != frame_hash(frame(1))
+    assert frame_hash(frame(1)[:, ::2]) == frame_hash(frame(1, (48, 32)))   # not contiguous
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError):
+        FrameWriter("tiff")
@@ -0,0 +1,96 @@
+"""Tests for the background notifier: order, coalescing, 429 back-off, and the
+Futures callers wait on."""
+import threading
+
+from src.notifier import Notifier
+from src.telegram import ApiCall, retry_after, split_text
+
+
+def _call(reply):
+    """An ApiCall that a Notifier(perform=_run) answers by calling `reply`."""
+    return ApiCall({}, "sendMessage", {"reply": reply})
+
+
+def _run(call):
+    return call.data["reply"]()
+
+
+def _ok(log, name):
+    def reply():
+        log.append(name)
+        return {"ok": True}
+    return _call(reply)
+
+
+def test_sends_go_out_in_order_and_resolve_their_futures():
+    log = []
+    notifier = Notifier(perform=_run)
+    futures = [notifier.submit([_ok(log, n)]) for n in "abc"]
+    assert [f.result(timeout=5) for f in futures] == [True, True, True]
+    assert log == ["a", "b", "c"]
+    assert notifier.flush(timeout=5) and notifier.pending == 0
+
+
+def test_a_queued_composite_is_replaced_by_a_newer_one():
+    log, gate = [], threading.Event()
+    notifier = Notifier(perform=_run)
+
+    def blocked():
+        gate.wait(5)
+        return {"ok": True}
+
+    first = notifier.submit([_call(blocked)])                  # in flight
+    notifier.flush(timeout=0.05)
+    old = notifier.submit([_ok(log, "old")], coalesce_key="hive")
+    new = notifier.submit([_ok(log, "new")], coalesce_key="hive")
+    assert old.result(timeout=5) is False               # replaced before it went out
+    gate.set()
+    assert first.result(timeout=5) and new.result(timeout=5)
+    assert log == ["new"] and notifier.replaced == 1
+
+
+def test_a_429_is_retried_after_retry_after():
+    waits, replies = [], [{"ok": False, "error_code": 429, "parameters": {"retry_after": 7}},
+                          {"ok": True}]
+    notifier = Notifier(perform=_run, sleep=waits.append)
+    assert notifier.submit([_call(lambda: replies.pop(0))]).result(timeout=5) is True
+    assert waits == [7]
+
+
+def test_a_failed_or_raising_send_is_not_confirmed():
+    notifier = Notifier(perform=_run)
+    assert notifier.submit([_call(lambda: {"ok": False})]).result(timeout=5) is False
+
+    def boom():
+        raise ValueError("not JSON")
+
+    future = notifier.submit([_call(boom)])
+    assert isinstance(future.exception(timeout=5), ValueError)
+    assert notifier.failed == 2
+
+
+def test_a_full_queue_drops_the_oldest_send():
+    gate = threading.Event()
+    notifier = Notifier(queue_size=2, perform=_run)
+    notifier.submit([_call(lambda: gate.wait(5) and {"ok": True})])
+    notifier.flush(timeout=0.05)
+    oldest = notifier.submit([_call(lambda: {"ok": True})])
+    notifier.submit([_call(lambda: {"ok": True})])
+    newest = notifier.submit([_call(lambda: {"ok": True})])
+    assert oldest.result(timeout=5) is False and notifier.dropped == 1
+    gate.set()
+    assert newest.result(timeout=5) is True
+
+
+def test_split_text_respects_the_limit_and_line_breaks():
+    text = "\n".join(f"- finding {i}" for i in range(100))
+    parts = split_text(text, limit=100)
+    assert all(len(p) <= 100 for p in parts)
+    assert "\n".join(parts) == text
+    assert split_text("x" * 250, limit=100) == ["x" * 100, "x" * 100, "x" * 50]
+    assert split_text("") == [""]
+
+
+def test_retry_after_reads_telegrams_429():
+    assert retry_after({"ok": False, "error_code": 429, "parameters": {"retry_after": 3}}) == 3
+    assert retry_after({"ok": True}) is None
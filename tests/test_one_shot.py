@@ -0,0 +1,65 @@
+"""The one-shot BB_MONITOR_ONCE send, in a fresh interpreter as the system check runs it."""
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+np = pytest.importorskip("numpy")
+pytest.importorskip("requests")
+
+from src.fake_telegram import FakeTelegram  # noqa: E402
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Not needed to send one composite; `import bb_monitor` must not pull them in.
+LOOP_ONLY = ("requests", "multiprocessing", "smtplib", "socket", "src.worker",
+             "src.archive", "src.frame_writer", "src.control")
+
+
+class OrderedTelegram(FakeTelegram):
+    """The fake API, noting the method of every request answered, in order."""
+
+    def __init__(self):
+        super().__init__()
+        self.methods = []
+
+    def answer(self, token, method, fields, files):
+        self.methods.append(method)
+        return super().answer(token, method, fields, files)
+
+
+def test_importing_the_monitor_loads_no_config_and_no_loop_only_modules():
+    probe = ("import sys, bb_monitor; "
+             f"print(sorted(m for m in {LOOP_ONLY!r} if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", probe, "/nonexistent/config.py"], cwd=REPO_ROOT,
+                         capture_output=True, text=True, check=True).stdout
+    assert "Failed to import CLI config" not in out     # no config loaded at import
+    assert out.strip().splitlines()[-1] == "[]"
+
+
+def test_one_shot_connects_early_and_sends_the_composite(tmp_path):
+    day = datetime.now().strftime("%Y-%m-%d")
+    for camera in ("cam0", "cam1"):
+        directory = tmp_path / "videos" / day / camera
+        directory.mkdir(parents=True)
+        writer = cv2.VideoWriter(str(directory / f"{camera}_{day}-12-00-00.avi"),
+                                 cv2.VideoWriter_fourcc(*"MJPG"), 3, (320, 240))
+        writer.write(np.full((240, 320, 3), 100, np.uint8))
+        writer.release()
+    config = tmp_path / "config.py"
+    with OrderedTelegram() as server:
+        config.write_text(
+            "from default_config import *\n"
+            f"input_basedir = {str(tmp_path / 'videos')!r}\n"
+            "input_subdir_names = ['cam0', 'cam1']\nfile_type = 'avi'\n"
+            "monitor_bot_name = 'once'\ntelegram_bot_token = 'token'\ntelegram_chat_id = 1\n"
+            "notify_spool_dir = None\n"
+            f"telegram_api_url = {server.url!r}\nisolate_scan_decode = True\n")
+        subprocess.run([sys.executable, "bb_monitor.py", str(config)], cwd=REPO_ROOT, timeout=60,
+                       env={**os.environ, "BB_MONITOR_ONCE": "1", "PYTHONPATH": REPO_ROOT},
+                       check=True, capture_output=True)
+    assert [r.method for r in server.received] == ["sendPhoto"]
+    assert server.methods == ["getMe", "sendPhoto"]     # connected before the photo was ready
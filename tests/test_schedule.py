@@ -0,0 +1,175 @@
+"""Tests for the monitor's tick schedule, on a fake clock."""
+import pytest
+
+from src.schedule import Tick, Ticker, tick_report
+
+DAY = 86400.0
+
+
+class FakeClock:
+    """A monotonic and a wall clock that advance together, unless the wall is stepped."""
+
+    def __init__(self, wall):
+        self.mono = 1000.0
+        self.offset = wall - self.mono
+        self.sleeps = []
+
+    def clock(self):
+        return self.mono
+
+    def wall(self):
+        return self.mono + self.offset
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.mono += seconds
+
+    def work(self, seconds):
+        self.mono += seconds
+
+    def ticker(self, interval, **kwargs):
+        return Ticker(interval, clock=self.clock, wall=self.wall, sleep=self.sleep,
+                      midnight=lambda w: w - w % DAY, **kwargs)
+
+
+def take(ticker, count, work=0.0, clock=None):
+    ticks = []
+    for tick in ticker:
+        ticks.append(tick)
+        if len(ticks) == count:
+            return ticks
+        clock.work(work)
+
+
+def test_first_tick_runs_at_once_then_ticks_land_on_boundaries():
+    clock = FakeClock(wall=10 * DAY + 12 * 3600 + 4 * 60 + 37)     # 12:04:37
+    ticks = take(clock.ticker(60), 4, work=1.5, clock=clock)
+    assert ticks[0].lag == 0 and ticks[0].index == 12 * 60 + 4
+    assert [t.due % DAY for t in ticks[1:]] == [12 * 3600 + 5 * 60, 12 * 3600 + 6 * 60, 12 * 3600 + 7 * 60]
+    assert [t.index for t in ticks[1:]] == [12 * 60 + 5, 12 * 60 + 6, 12 * 60 + 7]
+    assert all(t.lag == 0 for t in ticks)
+    assert clock.sleeps[1:] == [58.5, 58.5]     # the work time is not added to the cadence
+
+
+def test_waiting_for_the_first_boundary():
+    clock = FakeClock(wall=10 * DAY + 90)
+    tick = next(clock.ticker(60, run_first_now=False))
+    assert tick.index == 2 and tick.due == 10 * DAY + 120 and clock.wall() == tick.due
+
+
+def test_index_is_counted_from_midnight_not_from_the_start():
+    # The composite goes out on index % multiplier == 0: at :00, :15, :30, :45.
+    for start in (10 * DAY + 3 * 60, 10 * DAY + 11 * 60):
+        clock = FakeClock(wall=start)
+        ticks = take(clock.ticker(60), 20, clock=clock)
+        assert [t.due % DAY for t in ticks[1:] if t.index % 15 == 0][0] == 15 * 60
+
+
+def test_skip_drops_the_ticks_an_overrun_missed():
+    clock = FakeClock(wall=10 * DAY)
+    ticker = clock.ticker(60)
+    next(ticker)
+    clock.work(150)                 # ran through the ticks due at 60 and 120
+    tick = next(ticker)
+    assert tick.skipped == 1 and tick.due == 10 * DAY + 120
+    assert tick.lag == pytest.approx(30) and ticker.last_duration == pytest.approx(150)
+    tick = next(ticker)
+    assert tick.due == 10 * DAY + 180 and tick.lag == 0 and tick.skipped == 0
+
+
+def test_catch_up_runs_every_missed_tick():
+    clock = FakeClock(wall=10 * DAY)
+    ticker = clock.ticker(60, policy="catch_up")
+    next(ticker)
+    clock.work(150)
+    late = [next(ticker), next(ticker), next(ticker)]
+    assert [t.due - 10 * DAY for t in late] == [60, 120, 180]
+    assert [t.lag for t in late[:2]] == [pytest.approx(90), pytest.approx(30)]
+    assert late[2].lag == 0 and not any(t.skipped for t in late)
+
+
+def test_a_stepped_wall_clock_resyncs_the_schedule():
+    clock = FakeClock(wall=10 * DAY)
+    ticker = clock.ticker(60)
+    next(ticker)
+    clock.work(10)
+    clock.offset += 25              # NTP steps the wall clock 25 s forward
+    tick = next(ticker)
+    assert ticker.resyncs == 1
+    assert tick.due == 10 * DAY + 60 and clock.wall() == pytest.approx(tick.due)
+
+
+def test_a_step_during_the_wait_runs_the_passed_tick_late():
+    clock = FakeClock(wall=10 * DAY)
+    ticker = Ticker(60, clock=clock.clock, wall=clock.wall, midnight=lambda w: w - w % DAY,
+                    sleep=lambda s: (clock.sleep(s), setattr(clock, "offset", clock.offset + 25)))
+    next(ticker)
+    tick = next(ticker)             # woke at 01:25 by the wall clock
+    assert ticker.resyncs == 1 and tick.due == 10 * DAY + 60
+    assert next(ticker).due == 10 * DAY + 120
+
+
+def test_a_backward_step_does_not_repeat_the_tick_just_run():
+    clock = FakeClock(wall=10 * DAY + 30)
+    ticker = clock.ticker(60)
+    assert next(ticker).index == 0
+    clock.offset -= 20
+    tick = next(ticker)
+    assert ticker.resyncs == 1 and tick.index == 1 and clock.wall() == pytest.approx(tick.due)
+
+
+def test_small_wall_clock_slews_are_tolerated():
+    clock = FakeClock(wall=10 * DAY)
+    ticker = clock.ticker(60)
+    next(ticker)
+    clock.offset += 0.5
+    next(ticker)
+    assert ticker.resyncs == 0
+
+
+def test_the_index_starts_again_at_midnight():
+    clock = FakeClock(wall=11 * DAY - 150)          # 23:57:30
+    ticks = take(clock.ticker(60), 5, clock=clock)
+    assert [t.index for t in ticks] == [1437, 1438, 1439, 0, 1]
+    assert ticks[3].due == 11 * DAY
+
+
+def test_a_day_that_is_not_a_multiple_of_the_interval():
+    clock = FakeClock(wall=11 * DAY - 100)
+    ticks = take(clock.ticker(7 * 60), 3, clock=clock)
+    # the last boundary of the day is 23:55:00; the next tick is midnight, not 00:02
+    assert [t.due % DAY for t in ticks[1:]] == [0, 7 * 60]
+    assert [t.index for t in ticks[1:]] == [0, 1]
+
+
+def test_poll_never_sleeps():
+    clock = FakeClock(wall=10 * DAY + 30)
+    ticker = clock.ticker(60)
+    assert ticker.poll().index == 0
+    clock.work(5)
+    ticker.done()
+    assert ticker.poll() is None and ticker.last_duration == 5
+    assert ticker.next_due == pytest.approx(clock.mono + 25)
+    clock.work(25)
+    assert ticker.poll().index == 1
+    assert clock.sleeps == []
+
+
+def test_bad_arguments():
+    with pytest.raises(ValueError):
+        Ticker(0)
+    with pytest.raises(ValueError):
+        Ticker(60, policy="sometimes")
+
+
+def test_report():
+    text = tick_report(Tick(3, 0.0, 1.234, skipped=2), 61.5)
+    assert "1.23s late" in text and "took 61.50s" in text and "(2 skipped)" in text
+
+
+def test_a_skipped_nth_tick_is_made_up_by_the_next_one():
+    assert Tick(index=6, due=0.0, lag=0.0).every(3)
+    assert not Tick(index=7, due=0.0, lag=0.0).every(3)
+    assert Tick(index=7, due=0.0, lag=0.0, skipped=1).every(3)       # 6 was skipped
+    assert not Tick(index=8, due=0.0, lag=0.0, skipped=1).every(3)   # only 7 was
+    assert Tick(index=1, due=0.0, lag=0.0, skipped=2).every(60)      # back past midnight
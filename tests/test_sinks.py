@@ -0,0 +1,161 @@
+"""Tests for the notification sinks and fanning one payload out to all of them."""
+import email
+import json
+import socketserver
+import threading
+import time
+import types
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("requests")
+
+from src import notifier, sinks  # noqa: E402
+from src.fake_telegram import FakeTelegram, parse_form  # noqa: E402
+
+
+def _config(**kwargs):
+    return types.SimpleNamespace(monitor_bot_name="Hive X", telegram_bot_token="T",
+                                 telegram_chat_id="1", **kwargs)
+
+
+class _Webhook(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.posts.append((self.headers["Content-Type"], body))
+        self.send_response(self.server.status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def webhook():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Webhook)
+    server.daemon_threads, server.posts, server.status = True, [], 200
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class _Smtp(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib.send_message."""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.reply("220 fake ESMTP")
+        while True:
+            line = self.rfile.readline().decode().strip()
+            verb = line[:4].upper()
+            if not line or verb == "QUIT":
+                self.reply("221 bye")
+                return
+            if verb == "DATA":
+                self.reply("354 go ahead")
+                data = b""
+                while (chunk := self.rfile.readline()) != b".\r\n":
+                    data += chunk
+                self.server.mails.append(email.message_from_bytes(data))
+            self.reply("250 ok")
+
+
+@pytest.fixture
+def smtp():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _Smtp)
+    server.daemon_threads, server.mails = True, []
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_directory_sink_replaces_latest_and_logs_messages(tmp_path):
+    sink = sinks.DirectorySink(str(tmp_path), history=True)
+    config = _config()
+    assert sink.image(config, b"one", "x.jpg", "image/jpeg").result(timeout=5)
+    assert sink.image(config, b"two", "x.jpg", "image/jpeg").result(timeout=5)
+    assert sink.message(config, "Error: 12:00").result(timeout=5)
+    assert (tmp_path / "Hive_X-latest.jpg").read_bytes() == b"two"
+    assert "Error: 12:00" in (tmp_path / "Hive_X-messages.log").read_text()
+    assert len(list(tmp_path.glob("Hive_X-2*.jpg"))) >= 1
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_webhook_sink_posts_json_and_multipart(webhook):
+    sink = sinks.WebhookSink(f"http://127.0.0.1:{webhook.server_address[1]}/hook")
+    assert sink.message(_config(), "hello").result(timeout=5)
+    assert sink.image(_config(), b"\xff\xd8", "x.jpg", "image/jpeg").result(timeout=5)
+    (kind, body), (form_type, form) = webhook.posts
+    assert json.loads(body) == {"monitor": "Hive X", "text": "hello"}
+    fields, files = parse_form(form_type, form)
+    assert fields == {"monitor": "Hive X"} and files["image"] == ("x.jpg", b"\xff\xd8")
+
+
+def test_smtp_sink_mails_text_and_attachments(smtp):
+    sink = sinks.SmtpSink("127.0.0.1", port=smtp.server_address[1], to=["a@example.org"])
+    assert sink.message(_config(), "Issues found:\n- cam0").result(timeout=5)
+    assert sink.image(_config(), b"PNGDATA", "x.png", "image/png").result(timeout=5)
+    text, image = smtp.mails
+    assert text["Subject"] == "[Hive X] Issues found:" and text["To"] == "a@example.org"
+    (attachment,) = [p for p in image.walk() if p.get_filename() == "x.png"]
+    assert attachment.get_payload(decode=True) == b"PNGDATA"
+
+
+def test_unknown_sinks_and_missing_recipients_are_rejected():
+    with pytest.raises(ValueError):
+        sinks.make_sink({"type": "pigeon"})
+    with pytest.raises(ValueError):
+        sinks.make_sink({"type": "smtp", "host": "localhost"})
+
+
+class _Slow(sinks.ThreadedSink):
+    name = "slow"
+
+    def deliver_message(self, config, text):
+        time.sleep(0.3)
+        return True
+
+
+class _Broken(sinks.ThreadedSink):
+    name = "broken"
+
+    def deliver_message(self, config, text):
+        raise OSError("disk full")
+
+
+def test_fan_out_runs_sinks_at_once_and_reports_failures(monkeypatch, capsys):
+    config = _config()
+    monkeypatch.setitem(sinks._sinks, id(config), [_Slow(), _Slow(), _Broken()])
+    t0 = time.monotonic()
+    combined = sinks.fan_out(config, lambda sink: sink.message(config, "hi"))
+    assert combined.result(timeout=5) is False
+    assert time.monotonic() - t0 < 0.55                 # not 0.6: side by side
+    assert "broken failed: disk full" in capsys.readouterr().out
+
+
+def test_a_single_sink_returns_its_own_future(monkeypatch):
+    config = _config()
+    future = Future()
+    future.set_result(True)
+    monkeypatch.setitem(sinks._sinks, id(config), [types.SimpleNamespace(message=lambda c, t: future)])
+    assert sinks.fan_out(config, lambda sink: sink.message(config, "hi")) is future
+
+
+def test_telegram_and_directory_get_the_same_image(monkeypatch, tmp_path):
+    monkeypatch.setattr(notifier, "_shared", notifier.Notifier())
+    with FakeTelegram() as server:
+        config = _config(telegram_api_url=server.url,
+                         sinks=["telegram", {"type": "directory", "path": str(tmp_path)}])
+        future = sinks.fan_out(config, lambda sink: sink.image(config, b"JPEG", "x.jpg", "image/jpeg"))
+        assert future.result(timeout=5) is True
+        assert server.received[0].photo == b"JPEG"
+        assert (tmp_path / "Hive_X-latest.jpg").read_bytes() == b"JPEG"
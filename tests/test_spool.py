@@ -0,0 +1,86 @@
+"""Tests for the on-disk spool, and the notifier delivering it once Telegram can be
+reached again."""
+import time
+
+import pytest
+
+from src.notifier import Notifier
+from src.spool import Spool, SpoolBusy
+from src.telegram import ApiCall
+
+
+def test_entries_come_back_in_order_and_survive_a_restart(tmp_path):
+    spool = Spool(tmp_path)
+    spool.append({"text": "a"})
+    spool.append({"text": "b"}, b"\x89PNG")
+    spool.close()
+
+    spool = Spool(tmp_path)
+    assert len(spool) == 2
+    seq, meta, payload = spool.oldest()
+    assert meta["text"] == "a" and payload is None
+    spool.remove(seq)
+    _, meta, payload = spool.oldest()
+    assert meta["text"] == "b" and payload == b"\x89PNG"
+
+
+def test_one_process_per_directory(tmp_path):
+    spool = Spool(tmp_path)
+    with pytest.raises(SpoolBusy):
+        Spool(tmp_path)
+    spool.close()
+    Spool(tmp_path).close()
+
+
+def test_old_and_oversized_entries_are_evicted(tmp_path):
+    now = [1000.0]
+    spool = Spool(tmp_path, max_bytes=3000, max_age_seconds=60, clock=lambda: now[0])
+    for i in range(3):
+        spool.append({"i": i}, bytes(1000))
+    assert len(spool) == 2 and spool.oldest()[1]["i"] == 1     # over the size cap
+    now[0] += 61
+    spool.append({"i": 3})
+    assert [spool.oldest()[1]["i"]] == [3] and len(spool) == 1  # the rest too old
+    assert spool.evicted == 3
+
+
+def test_an_interrupted_append_is_discarded(tmp_path):
+    (tmp_path / "000000000000.json.tmp").write_text("{")
+    spool = Spool(tmp_path)
+    assert len(spool) == 0 and not (tmp_path / "000000000000.json.tmp").exists()
+
+
+class _Uplink:
+    def __init__(self):
+        self.up = False
+        self.delivered = []
+
+    def perform(self, call):
+        if not self.up:
+            raise ConnectionError("Network is unreachable")
+        self.delivered.append(call.data["text"] if call.photo is None else call.photo[1])
+        return {"ok": True}
+
+
+def _message(text):
+    return ApiCall({"token": "T"}, "sendMessage", {"chat_id": 1, "text": text})
+
+
+def test_sends_during_an_outage_are_spooled_and_delivered_in_order(tmp_path):
+    uplink = _Uplink()
+    notifier = Notifier(spool=Spool(tmp_path), perform=uplink.perform,
+                        backoff_seconds=0.05, max_backoff_seconds=0.1)
+    first = notifier.submit([_message("issues")])
+    assert first.result(timeout=5) is False            # not confirmed, but kept
+    notifier.submit([ApiCall({}, "sendPhoto", {}, ("x.png", b"img", "image/png"))])
+    notifier.submit([_message("All systems OK")])
+    notifier.submit([_message("All systems OK")])      # the retry next tick
+    notifier.flush(timeout=5)
+    assert len(notifier.spool) == 3 and uplink.delivered == []
+
+    uplink.up = True
+    deadline = time.monotonic() + 5
+    while len(notifier.spool) and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert uplink.delivered == ["issues", b"img", "All systems OK"]
+    assert notifier.submit([_message("next")]).result(timeout=5) is True
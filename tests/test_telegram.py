@@ -0,0 +1,84 @@
+"""Tests for the pooled Telegram client, against a local HTTP server."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+requests = pytest.importorskip("requests")
+
+from src.telegram import ApiCall, TelegramClient, perform, upload_throughput  # noqa: E402
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"      # keep-alive
+    delay = 0
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.server.delay)
+        self.server.paths.append(self.path)
+        body = json.dumps({"ok": True}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.daemon_threads = True
+    httpd.connections, httpd.paths, httpd.delay = 0, [], 0
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _url(httpd):
+    return f"http://127.0.0.1:{httpd.server_address[1]}"
+
+
+def test_calls_reuse_one_connection(server):
+    client = TelegramClient(_url(server))
+    for _ in range(3):
+        assert client.call("TOKEN", "sendMessage", data={"text": "hi"}) == {"ok": True}
+    assert server.paths == ["/botTOKEN/sendMessage"] * 3
+    assert server.connections == 1
+    client.close()
+
+
+def test_a_stalled_reply_times_out(server):
+    server.delay = 1.0
+    client = TelegramClient(_url(server), retries=0)
+    t0 = time.monotonic()
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        client.call("TOKEN", "sendMessage", read_timeout=0.2)
+    assert time.monotonic() - t0 < 0.9
+    time.sleep(1.0)
+    assert len(server.paths) == 1      # not re-sent
+
+
+def test_connection_failures_are_retried_then_raised():
+    client = TelegramClient("http://127.0.0.1:9", retries=2, backoff_seconds=0)
+    with pytest.raises(requests.exceptions.ConnectionError) as e:
+        client.call("TOKEN", "sendMessage", connect_timeout=0.5)
+    assert "Max retries exceeded" in str(e.value)
+
+
+def test_photo_uploads_feed_the_throughput_estimate(server):
+    settings = {"api_url": _url(server), "retries": 0, "token": "T",
+                "connect_timeout": 5, "read_timeout": 5}
+    assert upload_throughput(_url(server)) is None
+    perform(ApiCall(settings, "sendPhoto", {"chat_id": 1}, ("a.jpg", b"x" * 100_000, "image/jpeg")))
+    assert upload_throughput(_url(server)) > 0
@@ -0,0 +1,84 @@
+"""Tests for the per-camera tile cache: a camera is only re-decoded when its latest
+video is a different file, or the same file has changed."""
+import os
+
+from src.tiles import FileStamp, StampLog, TileCache, file_stamp, newest_mtime
+
+
+def test_file_stamp_of_a_missing_file_is_none(tmp_path):
+    assert file_stamp(None) is None
+    assert file_stamp(str(tmp_path / "gone.avi")) is None
+
+
+def test_file_stamp_changes_when_the_file_grows(tmp_path):
+    path = tmp_path / "a.avi"
+    path.write_bytes(b"x")
+    before = file_stamp(str(path))
+    path.write_bytes(b"xx")
+    assert file_stamp(str(path)) != before
+
+
+def test_an_unchanged_video_reuses_its_tile():
+    cache = TileCache()
+    stamp = FileStamp("/v/a.avi", 10, 1)
+    assert cache.get("cam0", stamp) is None
+    cache.put("cam0", stamp, "tile")
+    assert cache.get("cam0", FileStamp("/v/a.avi", 10, 1)) == "tile"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_a_new_video_or_a_changed_recipe_rebuilds():
+    cache = TileCache()
+    cache.put("cam0", FileStamp("/v/a.avi", 10, 1), "old", recipe=(90, 1024))
+    assert cache.get("cam0", FileStamp("/v/b.avi", 10, 1), recipe=(90, 1024)) is None
+    assert cache.get("cam0", FileStamp("/v/a.avi", 11, 2), recipe=(90, 1024)) is None
+    assert cache.get("cam0", FileStamp("/v/a.avi", 10, 1), recipe=(0, 1024)) is None
+    assert cache.get("cam0", FileStamp("/v/a.avi", 10, 1), recipe=(90, 1024)) == "old"
+
+
+def test_a_failed_decode_drops_the_old_tile():
+    cache = TileCache()
+    cache.put("cam0", FileStamp("/v/a.avi", 10, 1), "tile")
+    cache.put("cam0", FileStamp("/v/b.avi", 10, 1), None)
+    assert cache.last("cam0") is None
+
+
+def test_last_ignores_the_stamp():
+    cache = TileCache()
+    cache.put("cam0", FileStamp("/v/a.avi", 10, 1), "tile")
+    assert cache.last("cam0") == "tile"
+    assert cache.last("cam1") is None
+
+
+def test_slots_are_independent():
+    cache = TileCache()
+    stamp = FileStamp(os.path.join("/v", "a.avi"), 10, 1)
+    cache.put("cam0", stamp, "zero")
+    assert cache.get("cam1", stamp) is None
+
+
+def test_stamp_log_sees_new_videos_only():
+    log = StampLog()
+    a, b = FileStamp("/v/a.avi", 10, 1), FileStamp("/v/b.avi", 10, 2)
+    assert log.changed("cam0", a)
+    log.update("cam0", a)
+    assert not log.changed("cam0", a)
+    assert log.changed("cam0", b)
+    assert not log.changed("cam1", None)      # no video is nothing new
+    log.update("cam0", None)                  # e.g. its decode timed out
+    assert log.changed("cam0", a)
+
+
+def test_stamp_log_unchanged_needs_at_least_one_video():
+    log = StampLog()
+    a = FileStamp("/v/a.avi", 10, 1)
+    assert not log.unchanged({"cam0": None, "cam1": None})
+    assert not log.unchanged({"cam0": a, "cam1": None})
+    log.update("cam0", a)
+    assert log.unchanged({"cam0": a, "cam1": None})
+    assert not log.unchanged({"cam0": a, "cam1": FileStamp("/v/c.avi", 1, 1)})
+
+
+def test_newest_mtime():
+    assert newest_mtime([None, FileStamp("a", 1, 2_000_000_000), FileStamp("b", 1, 5_000_000_000)]) == 5.0
+    assert newest_mtime([None]) is None
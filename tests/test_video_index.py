@@ -0,0 +1,311 @@
+"""Tests for the incremental latest-video index.
+
+The index must give the same answer as the old full rescan — newest file per camera
+in the latest date directory — while touching only what changed.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from src.video_index import (
+    Inotify,
+    VideoIndex,
+    latest_date_dir,
+    parse_video_name,
+    scan_latest,
+    shared_index,
+)
+
+YEAR = datetime.now().year
+TODAY = f"{YEAR}-07-10"
+TOMORROW = f"{YEAR}-07-11"
+
+
+def video(base, day, cam, name, age=0):
+    """Create base/day/cam/name with an mtime `age` seconds in the past."""
+    path = os.path.join(base, day, cam, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb"):
+        pass
+    t = time.time() - age
+    os.utime(path, (t, t))
+    return path
+
+
+def settle(*dirs):
+    """Backdate directory mtimes past MTIME_SETTLE_SECONDS so poll mode trusts them."""
+    t = time.time() - 60
+    for d in dirs:
+        os.utime(d, (t, t))
+
+
+class FakeClock:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+MODES = ["poll"] + (["inotify"] if Inotify.available() else [])
+
+
+@pytest.fixture(params=MODES)
+def mode(request):
+    return request.param
+
+
+def test_latest_date_dir_ignores_other_years_and_files(tmp_path):
+    (tmp_path / f"{YEAR - 1}-12-31").mkdir()
+    (tmp_path / TODAY).mkdir()
+    (tmp_path / f"{YEAR}-99-notes.txt").write_text("")
+    assert latest_date_dir(str(tmp_path)) == str(tmp_path / TODAY)
+
+
+def test_no_date_directory_yields_none_per_camera(tmp_path, mode):
+    index = VideoIndex(str(tmp_path), ["cam0", "cam1"], "avi", mode=mode)
+    assert index.latest() == [None, None]
+
+
+def test_newest_file_per_camera_by_mtime(tmp_path, mode):
+    base = str(tmp_path)
+    video(base, TODAY, "cam0", "a.avi", age=30)
+    newest = video(base, TODAY, "cam0", "b.avi", age=10)
+    video(base, TODAY, "cam0", "c.txt", age=0)          # wrong file type
+    video(base, TODAY, "cam0", ".d.avi", age=0)         # glob would skip a dotfile
+    index = VideoIndex(base, ["cam0", "cam1"], "avi", mode=mode)
+    assert index.latest() == [newest, None]
+
+
+def test_a_new_video_is_picked_up(tmp_path, mode):
+    base = str(tmp_path)
+    video(base, TODAY, "cam0", "a.avi", age=30)
+    index = VideoIndex(base, ["cam0"], "avi", mode=mode)
+    index.latest()
+    newer = video(base, TODAY, "cam0", "b.avi")
+    assert index.latest() == [newer]
+
+
+def test_deleting_the_newest_falls_back_to_the_next(tmp_path, mode):
+    base = str(tmp_path)
+    older = video(base, TODAY, "cam0", "a.avi", age=30)
+    newest = video(base, TODAY, "cam0", "b.avi", age=10)
+    index = VideoIndex(base, ["cam0"], "avi", mode=mode)
+    assert index.latest() == [newest]
+    os.remove(newest)
+    assert index.latest() == [older]
+
+
+def test_a_new_date_directory_at_midnight_is_followed(tmp_path, mode):
+    base = str(tmp_path)
+    video(base, TODAY, "cam0", "a.avi", age=30)
+    index = VideoIndex(base, ["cam0", "cam1"], "avi", mode=mode)
+    index.latest()
+    first = video(base, TOMORROW, "cam0", "b.avi")
+    assert index.latest() == [first, None]
+    second = video(base, TOMORROW, "cam1", "c.avi")
+    assert index.latest() == [first, second]
+
+
+def test_poll_mode_lists_nothing_when_nothing_changed(tmp_path):
+    base = str(tmp_path)
+    newest = video(base, TODAY, "cam0", "a.avi", age=30)
+    settle(os.path.join(base, TODAY, "cam0"), os.path.join(base, TODAY), base)
+    index = VideoIndex(base, ["cam0"], "avi", mode="poll")
+    index.latest()
+    scans = index.scans
+    assert index.latest() == [newest]
+    assert index.scans == scans
+
+
+def test_poll_mode_stats_only_new_names(tmp_path, monkeypatch):
+    base = str(tmp_path)
+    for i in range(5):
+        video(base, TODAY, "cam0", f"{i}.avi", age=100 - i)
+    index = VideoIndex(base, ["cam0"], "avi", mode="poll")
+    index.latest()
+
+    keyed = []
+    real_sort_key = index._sort_key
+    monkeypatch.setattr(index, "_sort_key", lambda p: keyed.append(p) or real_sort_key(p))
+    newest = video(base, TODAY, "cam0", "5.avi")
+    assert index.latest() == [newest]
+    assert keyed == [newest]
+
+
+def test_a_periodic_full_rescan_catches_a_missed_change(tmp_path):
+    base = str(tmp_path)
+    camdir = os.path.join(base, TODAY, "cam0")
+    video(base, TODAY, "cam0", "a.avi", age=30)
+    settle(camdir, os.path.join(base, TODAY), base)
+    clock = FakeClock()
+    index = VideoIndex(base, ["cam0"], "avi", mode="poll", full_rescan_seconds=60, clock=clock)
+    index.latest()
+
+    # A change the directory mtime does not reveal (e.g. hidden by an NFS attribute cache).
+    newer = video(base, TODAY, "cam0", "b.avi")
+    settle(camdir)
+    index._cameras["cam0"].dir_mtime_ns = os.stat(camdir).st_mtime_ns
+    assert index.latest() != [newer]
+    clock.t += 61
+    assert index.latest() == [newer]
+
+
+@pytest.mark.skipif(not Inotify.available(), reason="inotify not available")
+def test_inotify_mode_does_not_relist_on_a_new_file(tmp_path):
+    base = str(tmp_path)
+    video(base, TODAY, "cam0", "a.avi", age=30)
+    index = VideoIndex(base, ["cam0"], "avi", mode="inotify")
+    index.latest()
+    scans = index.scans
+    newer = video(base, TODAY, "cam0", "b.avi")
+    assert index.latest() == [newer]
+    assert index.scans == scans
+    index.close()
+
+
+# ---------- filename order ----------
+
+def test_pi_names_parse_to_camera_and_local_start():
+    parsed = parse_video_name("/x/feedercama_2026-07-10-12-34-56.h264")
+    assert parsed.camera == "feedercama"
+    assert parsed.start == datetime(2026, 7, 10, 12, 34, 56)
+    assert not parsed.utc
+
+
+def test_an_unparseable_name_is_none():
+    assert parse_video_name("notes.avi") is None
+
+
+@pytest.mark.parametrize("index_mode", MODES + ["rescan"])
+def test_filename_order_ignores_touched_mtimes(tmp_path, index_mode):
+    """rsync has made the older recording look newest."""
+    base = str(tmp_path)
+    video(base, TODAY, "cam0", f"cam0_{YEAR}-07-10-12-00-00.h264", age=0)
+    newest = video(base, TODAY, "cam0", f"cam0_{YEAR}-07-10-12-01-00.h264", age=500)
+    if index_mode == "rescan":
+        assert scan_latest(base, ["cam0"], "h264", order="filename") == [newest]
+    else:
+        index = VideoIndex(base, ["cam0"], "h264", mode=index_mode, order="filename")
+        assert index.latest() == [newest]
+
+
+def test_filename_order_stats_no_file(tmp_path, monkeypatch):
+    base = str(tmp_path)
+    for minute in range(10):
+        video(base, TODAY, "cam0", f"cam0_{YEAR}-07-10-12-{minute:02d}-00.h264")
+    stats = []
+    real_stat = os.stat
+    monkeypatch.setattr(os, "stat", lambda p, *a, **k: stats.append(p) or real_stat(p, *a, **k))
+    newest = scan_latest(base, ["cam0"], "h264", order="filename")
+    assert newest[0].endswith("12-09-00.h264")
+    assert not [p for p in stats if str(p).endswith(".h264")]
+
+
+def test_videos_vanishing_between_listing_and_stat_are_none(tmp_path, monkeypatch):
+    base = str(tmp_path)
+    video(base, TODAY, "cam0", "a.avi")
+    video(base, TODAY, "cam0", "b.avi")
+    from src import video_index
+    monkeypatch.setattr(video_index, "sort_key", lambda path, order="mtime": None)
+    assert scan_latest(base, ["cam0"], "avi") == [None]
+
+
+def test_an_unparseable_name_falls_back_to_its_mtime(tmp_path):
+    base = str(tmp_path)
+    video(base, TODAY, "cam0", "cam0_1999-01-01-00-00-00.h264", age=0)
+    stray = video(base, TODAY, "cam0", "manual_copy.h264", age=0)
+    assert scan_latest(base, ["cam0"], "h264", order="filename") == [stray]
+
+
+def test_configs_share_one_index_per_base_directory(tmp_path):
+    base = str(tmp_path)
+    a = video(base, TODAY, "cam0", "a.avi")
+    b = video(base, TODAY, "cam1", "b.avi")
+    index = shared_index(base, "avi", mode="poll")
+    assert shared_index(base + os.sep, "avi", mode="poll") is index
+    assert shared_index(base, "avi", mode="poll", order="filename") is not index
+    assert shared_index(base, "avi", mode="rescan") is None
+    assert index.latest(["cam0"]) == [a]
+    assert index.latest(["cam1", "cam0"]) == [b, a]       # cam1 is added on the way
+    assert index.sub_directories == ["cam0", "cam1"]
+
+
+def test_queries_within_the_refresh_interval_do_not_touch_the_disk(tmp_path, monkeypatch):
+    base = str(tmp_path)
+    a = video(base, TODAY, "cam0", "a.avi", age=30)
+    settle(os.path.join(base, TODAY, "cam0"), os.path.join(base, TODAY), base)
+    clock = FakeClock()
+    index = VideoIndex(base, [], "avi", mode="poll", refresh_seconds=10, clock=clock)
+    assert index.latest(["cam0"]) == [a]
+
+    from src import video_index
+    stats = []
+    real = video_index._dir_stamp
+    monkeypatch.setattr(video_index, "_dir_stamp", lambda p: stats.append(p) or real(p))
+    newer = video(base, TODAY, "cam0", "b.avi")
+    clock.t += 5
+    assert index.latest(["cam0"]) == [a] and stats == []
+    clock.t += 5
+    assert index.latest(["cam0"]) == [newer] and stats
+
+
+def test_the_index_can_be_queried_from_several_threads(tmp_path):
+    base = str(tmp_path)
+    videos = [video(base, TODAY, f"cam{i}", f"{i}.avi") for i in range(8)]
+    index = VideoIndex(base, [], "avi", mode="poll")
+    results = []
+
+    def query(i):
+        results.append(index.latest([f"cam{i}", f"cam{(i + 1) % 8}"]) ==
+                       [videos[i], videos[(i + 1) % 8]])
+
+    threads = [threading.Thread(target=query, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [True] * 8 and sorted(index.sub_directories) == [f"cam{i}" for i in range(8)]
+
+
+def test_a_hung_refresh_holds_up_other_callers_only_for_a_while(tmp_path, monkeypatch):
+    base = str(tmp_path)
+    a = video(base, TODAY, "cam0", "a.avi")
+    b = video(base, TODAY, "cam1", "b.avi")
+    index = VideoIndex(base, [], "avi", mode="poll", refresh_seconds=0, refresh_wait_seconds=0.2)
+    assert index.latest(["cam0", "cam1"]) == [a, b]
+
+    entered, release = threading.Event(), threading.Event()
+    real = index._refresh_base
+    monkeypatch.setattr(index, "_refresh_base",
+                        lambda now: entered.set() or release.wait(10) and real(now))
+    stuck = threading.Thread(target=index.latest, args=(["cam0"],))
+    stuck.start()
+    assert entered.wait(5)
+    t0 = time.monotonic()
+    assert index.latest(["cam1"]) == [b] and index.latest() == [a, b]
+    assert 0.2 <= time.monotonic() - t0 < 1.5 and stuck.is_alive()
+    release.set()
+    stuck.join(5)
+
+
+def test_callers_during_a_slow_refresh_wait_for_its_answer(tmp_path, monkeypatch):
+    base = str(tmp_path)
+    video(base, TODAY, "cam0", f"cam0_{YEAR}-07-10-12-00-00.avi", age=60)
+    index = VideoIndex(base, [], "avi", mode="poll", refresh_seconds=0)
+    index.latest(["cam0"])
+    newer = video(base, TODAY, "cam0", f"cam0_{YEAR}-07-10-12-01-00.avi")
+
+    real = index._refresh_base
+    monkeypatch.setattr(index, "_refresh_base", lambda now: time.sleep(0.3) or real(now))
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(index.latest(["cam0"])))
+               for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert results == [[newer], [newer]]
@@ -0,0 +1,79 @@
+"""Tests for the supervised scan/decode worker process.
+
+The worker's job is to turn a hang into an exception: a scan or decode that never
+returns must cost one deadline, not the monitor thread.
+"""
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from src.worker import ScanDecodeWorker, WorkerUnavailable
+
+EXTRACT = f"{__name__}:fake_extract"
+
+
+def fake_extract(path):
+    """Stands in for cv2 in the child. File names say what to do."""
+    name = os.path.basename(path)
+    if name.startswith("hang"):
+        time.sleep(3600)
+    if name.startswith("none"):
+        return None
+    side = int(name.split(".")[0].split("_")[-1])
+    return np.full((side, side, 3), side % 256, np.uint8)
+
+
+@pytest.fixture
+def worker():
+    w = ScanDecodeWorker("test", timeout_seconds=20, extract=EXTRACT)
+    yield w
+    w.close()
+
+
+def test_frames_come_back_through_shared_memory(worker):
+    results = worker.decode({"/v/cam0_8.avi": "cam0", "/v/none.avi": "cam1"})
+    frame = results["/v/cam0_8.avi"].frame
+    assert frame.shape == (8, 8, 3) and frame[0, 0, 0] == 8
+    assert results["/v/none.avi"].frame is None
+
+
+def test_a_larger_frame_grows_its_segment(worker):
+    worker.decode({"/v/cam0_8.avi": "cam0"})
+    frame = worker.decode({"/v/cam0_300.avi": "cam0"})["/v/cam0_300.avi"].frame
+    assert frame.shape == (300, 300, 3)
+    assert worker._segments["cam0"].size >= frame.nbytes
+
+
+def test_returned_frames_do_not_alias_the_segment(worker):
+    first = worker.decode({"/v/cam0_8.avi": "cam0"})["/v/cam0_8.avi"].frame
+    worker.decode({"/v/cam0_9.avi": "cam0"})
+    assert first[0, 0, 0] == 8
+
+
+def test_scan_runs_in_the_child(worker, tmp_path):
+    day = tmp_path / f"{datetime.now().year}-07-10" / "cam0"
+    day.mkdir(parents=True)
+    (day / "a.avi").write_bytes(b"")
+    assert worker.scan(str(tmp_path), ["cam0", "cam1"], "avi") == [str(day / "a.avi"), None]
+
+
+def test_a_hung_decode_is_killed_and_the_next_request_gets_a_fresh_worker(worker):
+    worker.decode({"/v/cam0_8.avi": "cam0"})      # pay the child's start-up first
+    worker.timeout_seconds = 1
+    t0 = time.monotonic()
+    with pytest.raises(WorkerUnavailable):
+        worker.decode({"/v/hang.avi": "cam0"})
+    assert time.monotonic() - t0 < 5
+    assert worker.restarts == 1
+    worker.timeout_seconds = 20
+    assert worker.decode({"/v/cam0_8.avi": "cam0"})["/v/cam0_8.avi"].frame is not None
+
+
+def test_close_unlinks_the_segments(worker):
+    worker.decode({"/v/cam0_8.avi": "cam0"})
+    name = worker._segments["cam0"].name
+    worker.close()
+    assert not os.path.exists(f"/dev/shm/{name}")